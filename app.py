@@ -1,23 +1,53 @@
 import os
 import pickle
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timezone
 from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
-from flask import (Flask, flash, jsonify, redirect, render_template, request,
+from flask import (Flask, flash, g, jsonify, redirect, render_template, request,
                    url_for, Response, send_from_directory)
 from flask_login import (LoginManager, UserMixin, current_user, login_required,
                          login_user, logout_user)
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import check_password_hash, generate_password_hash
-import requests, re
+import re
 import json
+import threading
+
+from recsys.ann import IVFIndex
+from recsys.artifacts import ArtifactBundle, active_version, bundle_dir
+from recsys.cache import RecommendationCache, make_backend
+from recsys.catalog import CatalogIndex
+from recsys.cf_engine import SVDScorer
+from recsys.content_index import DEFAULT_K, NeighbourIndex
+from recsys.database import (configure_sqlite, dedupe_last, engine_options, ensure_unique_key, has_unique_key,
+                             upsert)
+from recsys.feeds import Feed
+from recsys.foldin import UserFoldIn
+from recsys.metrics import MetricsRegistry, MultiprocessMetrics, SamplingProfiler, Tracer, labelled
+from recsys.omdb import OMDbClient
+from recsys.pipeline import CandidatePipeline, genre_matrix, server_timing, top_candidates
+from recsys.precomputed import APP_SCOPE, PrecomputedStore, likes_fingerprint
+from recsys.ratings import RatingsCSR
+from recsys.resources import ResourceRegistry, ResourceSwitcher
+from recsys.serialization import MovieFragments, dumps, encode_object
+from recsys.topn import top_n_indices
 
 app = Flask(__name__, static_folder='frontend-react/dist', static_url_path='/')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_secret_key')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+    DATABASE_URL,
+    pool_size=int(os.environ.get('DB_POOL_SIZE', 10)),
+    max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    busy_timeout=SQLITE_BUSY_TIMEOUT,
+)
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -49,7 +79,11 @@ class Like(db.Model):
     value = db.Column(db.Integer, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'tmdb_id', name='unique_user_movie_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'tmdb_id', name='unique_user_movie_like'),
+        # Статистика профиля: число лайков и дизлайков пользователя без чтения чужих строк.
+        db.Index('ix_like_user_value', 'user_id', 'value'),
+    )
 
 
 class UserSettings(db.Model):
@@ -64,17 +98,49 @@ class UserSettings(db.Model):
     user = db.relationship('User', backref=db.backref('settings', uselist=False))
 
 
+def migrate_database():
+    # create_all не добавляет индексы и ограничения в уже существующие таблицы.
+    for index in Like.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    ensure_unique_key(db.engine, Like.__table__, ('user_id', 'tmdb_id'), 'uq_like_user_movie')
+
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Удаляет повторы оценок и создаёт индексы в базе, созданной до них."""
+    migrate_database()
+    print("[INFO] Схема базы обновлена")
+
+
 with app.app_context():
+    configure_sqlite(db.engine, SQLITE_BUSY_TIMEOUT, wal=os.environ.get('SQLITE_WAL', '1') != '0')
     db.create_all()
+    # Импорт ничего не удаляет: старую базу переводит явная миграция.
+    if not has_unique_key(db.engine, Like.__tablename__, ('user_id', 'tmdb_id')):
+        print("[WARN] В таблице like нет уникального ключа (user_id, tmdb_id), оценки не сохранятся. "
+              "Запустите: flask --app app migrate-db")
 
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, int(user_id))
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "streamlit_data")
+DATA_DIR = os.environ.get('RECSYS_DATA_DIR', os.path.join(BASE_DIR, "streamlit_data"))
 MOVIES_DATA_PATH = os.path.join(DATA_DIR, "movies_data.pkl")
 CONTENT_SIMILARITY_PATH = os.path.join(DATA_DIR, "content_similarity_matrix.pkl")
+CONTENT_NEIGHBOURS_PATH = os.path.join(DATA_DIR, "content_neighbours.npz")
+CONTENT_NEIGHBOURS_K = int(os.environ.get('CONTENT_NEIGHBOURS_K', DEFAULT_K))
+CONTENT_SEED_REDUCER = os.environ.get('CONTENT_SEED_REDUCER', 'max')
+CF_FOLDIN_REG = float(os.environ.get('CF_FOLDIN_REG', '0.1'))
+# Число просматриваемых кластеров ANN-индексов (0 — точный перебор всех фильмов).
+CF_ANN_NPROBE = int(os.environ.get('CF_ANN_NPROBE', 0))
+CONTENT_ANN_NPROBE = int(os.environ.get('CONTENT_ANN_NPROBE', 0))
+CANDIDATE_POOL_SIZE = int(os.environ.get('CANDIDATE_POOL_SIZE', 300))
+RERANK_DIVERSITY = float(os.environ.get('RERANK_DIVERSITY', 0.1))
+SMART_RECS_COUNT = 20
+LIKES_BATCH_MAX = 500
+SCORING_THREADS = int(os.environ.get('SCORING_THREADS', 0))
+PROFILE_TOP_GENRES = 3
 CB_INDICES_PATH = os.path.join(DATA_DIR, "cb_movie_indices.pkl")
 SVD_MODEL_PATH = os.path.join(DATA_DIR, "svd_model.pkl")
 RATINGS_DATA_PATH = os.path.join(DATA_DIR, "ratings_data_filtered.pkl")
@@ -82,6 +148,21 @@ POPULAR_MOVIES_PATH = os.path.join(DATA_DIR, "popular_movies.pkl")
 MOVIES_CB_DF_PATH = os.path.join(DATA_DIR, "movies_cb_df.pkl")
 SVD_EVAL_METRICS_PATH = os.path.join(DATA_DIR, "svd_evaluation_metrics.pkl")
 NEW_ITEMS_COLD_START_PATH = os.path.join(DATA_DIR, "new_items_for_cold_start.pkl")
+LINKS_ENRICHED_PATH = os.path.join(DATA_DIR, "links_with_posters.parquet")
+# Вариант постера по умолчанию из scripts/build_poster_thumbs.py (остальные ширины идут в srcset).
+POSTER_FORMAT = os.environ.get('POSTER_FORMAT', 'webp')
+POSTER_WIDTH = int(os.environ.get('POSTER_WIDTH', 342))
+# Имена вида tt0114709.3f9c0a1b2d4e5f60.webp: содержимое по такому адресу не меняется.
+CONTENT_HASHED_STATIC_RE = re.compile(r"\.[0-9a-f]{16}\.(webp|jpg)$")
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ARTIFACTS_DIR = os.path.join(DATA_DIR, "artifacts")
+PRECOMPUTED_RECS_PATH = os.environ.get('PRECOMPUTED_RECS_PATH', os.path.join(DATA_DIR, "precomputed_recs.sqlite"))
+ARTIFACTS_WATCH_INTERVAL = float(os.environ.get('ARTIFACTS_WATCH_INTERVAL', 10))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+NEW_FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+FEED_MAX_AGE = int(os.environ.get('FEED_MAX_AGE', 300))
 
 GENRE_EMOJIS = {
     "Action": "💥", "Adventure": "🗺️", "Animation": "🎨", "Comedy": "😂",
@@ -102,134 +183,387 @@ def load_data_from_pickle(path):
             return pickle.load(f)
 
 
-def load_all_resources():
-    global movies_df, cosine_sim_content, cb_indices, svd_model, ratings_df_processed
-    global popular_movies_df, movies_cb_df_for_recs, svd_eval_metrics, new_items_cold_start_df
+def load_content_neighbours():
+    if os.path.exists(CONTENT_NEIGHBOURS_PATH):
+        return NeighbourIndex.load(CONTENT_NEIGHBOURS_PATH)
+    print(f"[WARN] {CONTENT_NEIGHBOURS_PATH} не найден, индекс строится из плотной матрицы. "
+          f"Запустите scripts/build_content_index.py, чтобы не загружать её при старте.")
+    return NeighbourIndex.from_dense(load_data_from_pickle(CONTENT_SIMILARITY_PATH), k=CONTENT_NEIGHBOURS_K)
 
-    movies_df = load_data_from_pickle(MOVIES_DATA_PATH)
-    LINKS_ENRICHED_PATH = os.path.join(DATA_DIR, "links_with_posters.parquet")
-    if os.path.exists(LINKS_ENRICHED_PATH):
-        try:
-            links_enriched = pd.read_parquet(LINKS_ENRICHED_PATH)
-            links_enriched["tmdbId"] = pd.to_numeric(links_enriched["tmdbId"], errors="coerce").astype("Int64")
-            movies_df = movies_df.merge(
-                links_enriched[["tmdbId", "imdbId", "local_poster"]].rename(columns={"tmdbId": "tmdb_id"}),
-                on="tmdb_id",
-                how="left"
-            )
-        except Exception as merge_err:
-            print(f"[WARN] Не удалось объединить links_with_posters.parquet: {merge_err}")
-    cosine_sim_content = load_data_from_pickle(CONTENT_SIMILARITY_PATH)
-    cb_indices = load_data_from_pickle(CB_INDICES_PATH)
-    svd_model = load_data_from_pickle(SVD_MODEL_PATH)
-    ratings_df_original = load_data_from_pickle(RATINGS_DATA_PATH)
-    popular_movies_df = load_data_from_pickle(POPULAR_MOVIES_PATH)
-    movies_cb_df_for_recs = load_data_from_pickle(MOVIES_CB_DF_PATH)
-
-    svd_eval_metrics = load_data_from_pickle(SVD_EVAL_METRICS_PATH)
-    new_items_cold_start_df = load_data_from_pickle(NEW_ITEMS_COLD_START_PATH)
-
-    movies_df['tmdb_id'] = pd.to_numeric(movies_df['tmdb_id'], errors='coerce').astype('Int64')
-    if 'movieId_ml' in movies_df.columns:
-        movies_df['movieId_ml'] = pd.to_numeric(movies_df['movieId_ml'], errors='coerce').astype('Int64')
-
-    ratings_df_processed = ratings_df_original.copy()
-    if 'movieId_ml' in ratings_df_processed.columns:
-        ratings_df_processed['movieId_ml'] = pd.to_numeric(ratings_df_processed['movieId_ml'], errors='coerce').astype('Int64')
-    if 'userId' in ratings_df_processed.columns:
-        ratings_df_processed['userId'] = pd.to_numeric(ratings_df_processed['userId'], errors='coerce').astype('Int64')
-
-
-try:
-    load_all_resources()
-except Exception as e:
-    print(f"[ERROR] Failed to load resources: {e}")
-    raise
 
-def get_content_recommendations(title: str, top_n: int = 10) -> pd.DataFrame:
-    if title not in cb_indices:
-        return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
+def merge_local_posters(movies: pd.DataFrame) -> pd.DataFrame:
+    if not os.path.exists(LINKS_ENRICHED_PATH):
+        return movies
+    try:
+        links_enriched = pd.read_parquet(LINKS_ENRICHED_PATH)
+        links_enriched["tmdbId"] = pd.to_numeric(links_enriched["tmdbId"], errors="coerce").astype("Int64")
+        poster_columns = [c for c in ("local_poster", "poster_variants") if c in links_enriched.columns]
+        return movies.merge(
+            links_enriched[["tmdbId", "imdbId", *poster_columns]].rename(columns={"tmdbId": "tmdb_id"}),
+            on="tmdb_id",
+            how="left"
+        )
+    except Exception as merge_err:
+        print(f"[WARN] Не удалось объединить links_with_posters.parquet: {merge_err}")
+        return movies
+
+
+def build_resource_registry() -> ResourceRegistry:
+    bundle = ArtifactBundle.open(ARTIFACTS_DIR) if bundle_dir(ARTIFACTS_DIR) else None
+    pickle_mtimes = [os.path.getmtime(path) for path in (MOVIES_DATA_PATH, SVD_MODEL_PATH) if os.path.exists(path)]
+    if bundle and pickle_mtimes and max(pickle_mtimes) > bundle.created_at.timestamp() + 1:
+        print(f"[WARN] Пикли в {DATA_DIR} новее выгрузки {bundle.version}, а приложение читает выгрузку. "
+              f"Запустите scripts/export_artifacts.py, чтобы опубликовать новые данные.")
+    # Аренду версии берёт первый обслуженный ею запрос, а не импорт: тесты и скрипты ничего не пишут
+    # в каталог артефактов. Пока реестр не освобождён, ArtifactWriter не удалит файлы этой версии.
+    registry = ResourceRegistry(version=bundle.version if bundle else 'pickle',
+                                on_release=bundle.release_lease if bundle else None,
+                                on_use=bundle.acquire_lease if bundle else None)
+
+    def load_movies():
+        movies = bundle.frame('movies') if bundle else load_data_from_pickle(MOVIES_DATA_PATH)
+        movies = merge_local_posters(movies).reset_index(drop=True)
+        movies['tmdb_id'] = pd.to_numeric(movies['tmdb_id'], errors='coerce').astype('Int64')
+        if 'movieId_ml' in movies.columns:
+            movies['movieId_ml'] = pd.to_numeric(movies['movieId_ml'], errors='coerce').astype('Int64')
+        return movies
+
+    def load_cb_indices():
+        if not bundle:
+            return load_data_from_pickle(CB_INDICES_PATH)
+        cb_titles = bundle.frame('cb_indices')
+        return pd.Series(cb_titles['cb_index'].to_numpy(), index=cb_titles['title'])
+
+    def load_ratings():
+        if bundle:
+            return RatingsCSR.from_bundle(bundle)
+        return RatingsCSR.from_frame(load_data_from_pickle(RATINGS_DATA_PATH))
+
+    def load_cf_engine():
+        if bundle:
+            return SVDScorer.from_bundle(bundle)
+        return SVDScorer.from_surprise(load_data_from_pickle(SVD_MODEL_PATH))
+
+    def load_cf_item_rows():
+        cf_item_rows = registry.get('catalog').rows_for_ml_ids(registry.get('cf_engine').item_ids)
+        return cf_item_rows, cf_item_rows >= 0
+
+    def load_cf_row_positions():
+        cf_item_rows, cf_candidate_mask = registry.get('cf_item_rows')
+        row_positions = np.full(registry.get('catalog').n_rows, -1, dtype=np.int64)
+        row_positions[cf_item_rows[cf_candidate_mask]] = np.flatnonzero(cf_candidate_mask)
+        return row_positions
+
+    def ranking_scores(frame: pd.DataFrame) -> np.ndarray:
+        # Популярность строки: weighted_rating, если он посчитан, иначе число голосов.
+        column = 'weighted_rating' if 'weighted_rating' in frame.columns else 'vote_count'
+        if column not in frame.columns:
+            return -np.arange(len(frame), dtype=np.float64)
+        return pd.to_numeric(frame[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    def load_candidate_pipeline():
+        movies = registry.get('movies')
+        fallback_rows = np.argsort(-ranking_scores(movies), kind='stable')
+        return CandidatePipeline(genre_matrix(movies['genres'].tolist())[0], fallback_rows,
+                                 pool_size=CANDIDATE_POOL_SIZE, diversity=RERANK_DIVERSITY)
+
+    def load_popular_candidates():
+        popular_movies = registry.get('popular_movies')
+        rows = registry.get('catalog').rows_for_tmdb_ids(popular_movies['tmdb_id'].tolist())
+        scores = ranking_scores(popular_movies)
+        return rows[rows >= 0], scores[rows >= 0]
+
+    def load_new_candidates():
+        new_items = registry.get('new_items')
+        rows = registry.get('catalog').rows_for_tmdb_ids(new_items['tmdb_id'].tolist())
+        release_dates = pd.to_datetime(new_items['release_date'], errors='coerce')
+        scores = -release_dates.rank(ascending=False, method='first').fillna(len(new_items)).to_numpy(dtype=np.float64)
+        return rows[rows >= 0], scores[rows >= 0]
+
+    def feed_last_modified(pickle_path: str) -> datetime:
+        # Время создания данных, а не загрузки: валидаторы не меняются от перезапуска к перезапуску.
+        if bundle:
+            return bundle.created_at
+        return datetime.fromtimestamp(int(os.path.getmtime(pickle_path)), timezone.utc)
+
+    def load_popular_feed():
+        popular_movies = registry.get('popular_movies')
+        return Feed('popular', np.arange(len(popular_movies)), registry.get('popular_fragments'),
+                    popular_movies['genres'].to_numpy() if 'genres' in popular_movies.columns else [None] * len(popular_movies),
+                    last_modified=feed_last_modified(POPULAR_MOVIES_PATH))
+
+    def load_new_feed():
+        movies = registry.get('movies')
+        release_dates = pd.to_datetime(movies['release_date'], errors='coerce')
+        newest_rows = release_dates.dropna().sort_values(ascending=False, kind='stable').index.to_numpy()
+        return Feed('new', newest_rows, registry.get('movie_fragments'), movies['genres'].to_numpy(),
+                    default_limit=NEW_FEED_DEFAULT_LIMIT, last_modified=feed_last_modified(MOVIES_DATA_PATH))
+
+    registry.register('popular_movies', lambda: bundle.frame('popular_movies') if bundle else load_data_from_pickle(POPULAR_MOVIES_PATH))
+    registry.register('movies', load_movies)
+    registry.register('new_items', lambda: bundle.frame('new_items') if bundle else load_data_from_pickle(NEW_ITEMS_COLD_START_PATH))
+    registry.register('movies_cb', lambda: bundle.frame('movies_cb') if bundle else load_data_from_pickle(MOVIES_CB_DF_PATH))
+    registry.register('cb_indices', load_cb_indices)
+    registry.register('catalog', lambda: CatalogIndex(registry.get('movies'), registry.get('movies_cb'), registry.get('cb_indices')))
+    registry.register('content_neighbours', lambda: NeighbourIndex.from_bundle(bundle) if bundle else load_content_neighbours())
+    registry.register('ratings', load_ratings)
+    registry.register('cf_ann', lambda: IVFIndex.from_bundle(bundle, 'cf_ann') if bundle else None)
+    registry.register('content_ann', lambda: IVFIndex.from_bundle(bundle, 'content_ann') if bundle else None)
+    registry.register('cf_engine', load_cf_engine)
+    registry.register('cf_item_rows', load_cf_item_rows)
+    registry.register('cf_row_positions', load_cf_row_positions)
+    registry.register('cf_foldin', lambda: UserFoldIn(registry.get('cf_engine'), reg=CF_FOLDIN_REG))
+    registry.register('candidate_pipeline', load_candidate_pipeline)
+    registry.register('popular_candidates', load_popular_candidates)
+    registry.register('new_candidates', load_new_candidates)
+    registry.register('popular_fragments', lambda: MovieFragments.from_frame(registry.get('popular_movies'), get_poster_url))
+    registry.register('movie_fragments', lambda: MovieFragments.from_frame(registry.get('movies'), get_poster_url, get_poster_srcset))
+    registry.register('popular_feed', load_popular_feed)
+    registry.register('new_feed', load_new_feed)
+    registry.register('svd_eval_metrics', lambda: bundle.metadata.get('svd_eval_metrics', {}) if bundle else load_data_from_pickle(SVD_EVAL_METRICS_PATH))
+    return registry
+
+
+# Порядок фоновой загрузки: сначала то, что нужно лёгким эндпоинтам (/api/popular, /api/new).
+RESOURCE_LOAD_ORDER = [
+    'popular_movies', 'popular_fragments', 'popular_feed', 'movies', 'movie_fragments', 'new_feed', 'new_items',
+    'movies_cb', 'cb_indices', 'catalog', 'content_neighbours', 'content_ann',
+    'ratings', 'cf_engine', 'cf_ann', 'cf_item_rows', 'cf_row_positions', 'cf_foldin',
+    'candidate_pipeline', 'popular_candidates', 'new_candidates', 'svd_eval_metrics',
+]
+RESOURCE_LOADING = os.environ.get('RESOURCE_LOADING', 'background')
+
+# Активная версия артефактов; новая выгрузка подхватывается без перезапуска (см. ResourceSwitcher).
+resources = ResourceSwitcher(build_resource_registry, RESOURCE_LOAD_ORDER)
 
-    idx = cb_indices[title]
-    sim_scores = list(enumerate(cosine_sim_content[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
-    movie_indices = [i[0] for i in sim_scores]
 
-    recommended_cb_info = movies_cb_df_for_recs.iloc[movie_indices].copy()
-    recommended_cb_info['tmdb_id'] = pd.to_numeric(recommended_cb_info['tmdb_id'], errors='coerce').astype('Int64')
+def load_all_resources():
+    resources.load_all(RESOURCE_LOAD_ORDER)
+
+
+# Top-N SVD, посчитанные scripts/precompute_recs.py; при несовпадении версии или лайков считаем на лету.
+precomputed_recs = PrecomputedStore(PRECOMPUTED_RECS_PATH)
+
+# Ограничитель параллельности расчёта рекомендаций: сколько бы потоков ни обслуживало запросы,
+# считают одновременно не больше SCORING_THREADS, остальные ждут слота. Расчёт идёт в потоке
+# запроса, и поток занят до ответа. 0 — без ограничения.
+scoring_slots = threading.BoundedSemaphore(SCORING_THREADS) if SCORING_THREADS > 0 else None
+
+
+def run_scoring(fn, *args, **kwargs):
+    if scoring_slots is None:
+        return fn(*args, **kwargs)
+    with scoring_slots:
+        return fn(*args, **kwargs)
+
+
+omdb_client = OMDbClient(
+    None if os.environ.get('OMDB_API_KEY', 'YOUR_OMDB_KEY') == 'YOUR_OMDB_KEY' else os.environ['OMDB_API_KEY'],
+    os.environ.get('OMDB_CACHE_PATH', os.path.join(DATA_DIR, "omdb_cache.sqlite")),
+    base_url=os.environ.get('OMDB_URL', 'http://www.omdbapi.com/'),
+    ttl=float(os.environ.get('OMDB_CACHE_TTL', 30 * 24 * 3600)),
+    negative_ttl=float(os.environ.get('OMDB_NEGATIVE_TTL', 24 * 3600)),
+)
+
+recommendation_cache = RecommendationCache(
+    make_backend(os.environ.get('RECS_CACHE_BACKEND', 'memory'),
+                 url=os.environ.get('RECS_CACHE_URL'),
+                 max_entries=int(os.environ.get('RECS_CACHE_MAX_ENTRIES', 10000))),
+    ttl=float(os.environ.get('RECS_CACHE_TTL', 600)),
+)
+
+
+# Метрики процесса (/metrics): этапы запросов, кэши, время загрузки ресурсов.
+metrics = MetricsRegistry()
+tracer = Tracer(metrics)
+request_errors = metrics.counter('recsys_errors_total', 'Requests answered by an error handler or fallback',
+                                 ('endpoint',))
+
+
+def cache_stats() -> dict:
+    omdb_stats = omdb_client.stats()
+    lookups = omdb_stats['hits'] + omdb_stats['misses']
+    return {
+        'recommendations': recommendation_cache.stats(),
+        'omdb': {**omdb_stats, 'hit_ratio': omdb_stats['hits'] / lookups if lookups else 0.0},
+    }
+
+
+def cache_metric(field: str):
+    return lambda: [({'cache': name}, stats[field]) for name, stats in cache_stats().items()]
+
+
+metrics.gauge('recsys_cache_hits_total', 'Cache hits', cache_metric('hits'), ('cache',), kind='counter')
+metrics.gauge('recsys_cache_misses_total', 'Cache misses', cache_metric('misses'), ('cache',), kind='counter')
+metrics.gauge('recsys_cache_hit_ratio', 'Cache hit ratio since start', cache_metric('hit_ratio'), ('cache',))
+metrics.gauge('recsys_cache_entries', 'Entries held by the cache', cache_metric('entries'), ('cache',))
+metrics.gauge('recsys_resource_load_seconds', 'Time spent loading a resource of the active version',
+              lambda: labelled({name: status['load_seconds'] for name, status in resources.status().items()}, 'resource'),
+              ('resource',))
+metrics.gauge('recsys_resource_bytes', 'Estimated memory held by a resource',
+              lambda: labelled({name: status['bytes'] for name, status in resources.status().items()}, 'resource'),
+              ('resource',))
+metrics.gauge('recsys_resources_ready', '1 when every resource of the active version is loaded',
+              lambda: int(resources.ready))
+metrics.gauge('recsys_resource_reload_seconds', 'Duration of the last artifact version switch',
+              lambda: resources.last_reload.get('seconds'))
+
+# Под serve.py у каждого процесса свой реестр: /metrics складывает снимки всех процессов из METRICS_MULTIPROC_DIR.
+metrics_files = MultiprocessMetrics(metrics, os.environ['METRICS_MULTIPROC_DIR'],
+                                    interval=float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))) \
+    if os.environ.get('METRICS_MULTIPROC_DIR') else None
+
+
+def flush_metrics():
+    if metrics_files is not None:
+        metrics_files.write()
+
+# Выборочное профилирование: каждый PROFILE_SAMPLE_EVERY-й запрос, хранятся PROFILE_KEEP самых медленных.
+profiler = SamplingProfiler(
+    int(os.environ.get('PROFILE_SAMPLE_EVERY', 0)),
+    os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, "profiles")),
+    keep=int(os.environ.get('PROFILE_KEEP', 20)),
+    engine=os.environ.get('PROFILE_ENGINE', 'cprofile'),
+)
+
+
+@app.before_request
+def start_request_trace():
+    if metrics_files is not None:
+        metrics_files.start()
+    g.trace_token = tracer.start(request.url_rule.rule if request.url_rule else 'unmatched')
+    g.profile = profiler.start()
+
+
+def finish_request_trace(status: int):
+    token = g.pop('trace_token', None)
+    if token is None:
+        return None
+    trace = tracer.finish(token, request.method, status)
+    profiler.stop(g.pop('profile', None), trace.tags['seconds'], f"{request.method}_{trace.endpoint}")
+    return trace
 
-    full_recommendations = pd.merge(
-        recommended_cb_info[['title', 'tmdb_id']],
-        movies_df[['tmdb_id', 'poster_path', 'overview', 'genres']],
-        on='tmdb_id', how='left'
-    ).drop_duplicates(subset=['tmdb_id'])
 
-    ordered_tmdb_ids = recommended_cb_info['tmdb_id']
-    if not ordered_tmdb_ids.empty:
-        full_recommendations = full_recommendations.set_index('tmdb_id').loc[ordered_tmdb_ids].reset_index()
+@app.after_request
+def record_request_trace(response):
+    trace = finish_request_trace(response.status_code)
+    if trace is not None and trace.spans and 'Server-Timing' not in response.headers:
+        response.headers['Server-Timing'] = server_timing(trace.timings())
+    return response
 
-    return full_recommendations[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']]
 
+@app.teardown_request
+def discard_request_trace(exc=None):
+    # after_request не вызывается при необработанном исключении.
+    finish_request_trace(500)
 
-def get_collaborative_recommendations(user_id: int, top_n: int = 10) -> pd.DataFrame:
-    user_rated_movies_ml = ratings_df_processed[ratings_df_processed['userId'] == user_id]['movieId_ml'].unique()
-    all_movies_ml_with_metadata = movies_df.loc[
-        movies_df['movieId_ml'].notna() & movies_df['movieId_ml'].isin(ratings_df_processed['movieId_ml'].unique()),
-        'movieId_ml'
-    ].unique()
-    movies_to_predict_ml = [mid for mid in all_movies_ml_with_metadata if mid not in user_rated_movies_ml]
 
-    if not movies_to_predict_ml:
-        return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
+def start_resource_watcher():
+    resources.watch(lambda: active_version(ARTIFACTS_DIR), ARTIFACTS_WATCH_INTERVAL)
 
-    predictions = []
-    for movie_id_ml in movies_to_predict_ml:
-        try:
-            pred = svd_model.predict(uid=int(user_id), iid=float(movie_id_ml))
-            predictions.append(pred)
-        except Exception:
-            continue
 
-    predictions.sort(key=lambda x: x.est, reverse=True)
-    recommended_movie_ids_ml = [pred.iid for pred in predictions[:top_n]]
-
-    recommended_movies_info = movies_df[movies_df['movieId_ml'].isin(recommended_movie_ids_ml)].copy()
-    if recommended_movies_info.empty:
-        return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
+@app.before_request
+def start_resource_loading():
+    if RESOURCE_LOADING == 'background':
+        resources.start_background_load(RESOURCE_LOAD_ORDER)
+    start_resource_watcher()
+    # Запрос целиком обслуживается одной версией артефактов, даже если во время него она сменится.
+    g.resources_token = resources.acquire()
 
-    present_ids = [mid for mid in recommended_movie_ids_ml if mid in recommended_movies_info['movieId_ml'].values]
-    if present_ids:
-        recommended_movies_info_sorted = recommended_movies_info.set_index('movieId_ml').loc[present_ids].reset_index()
-        return recommended_movies_info_sorted[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']]
-    return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
 
+@app.teardown_request
+def release_resources(exc=None):
+    resources.release(g.pop('resources_token', None))
 
-def get_hybrid_recommendations(user_id: int, liked_movie_title: str, top_n: int = 10, cb_weight: float = 0.6, cf_weight: float = 0.4) -> pd.DataFrame:
-    cb_recs = get_content_recommendations(liked_movie_title, top_n=top_n * 2)
-    cb_scores_df = cb_recs[['tmdb_id']].copy()
-    if not cb_scores_df.empty:
-        cb_scores_df['score_cb'] = np.linspace(1, 0.1, len(cb_scores_df))
 
-    cf_recs = get_collaborative_recommendations(user_id, top_n=top_n * 2)
-    cf_scores_df = cf_recs[['tmdb_id']].copy()
-    if not cf_scores_df.empty:
-        cf_scores_df['score_cf'] = np.linspace(1, 0.1, len(cf_scores_df))
-
-    if cb_scores_df.empty and cf_scores_df.empty:
+def get_content_recommendations(title: str, top_n: int = 10) -> pd.DataFrame:
+    catalog = resources.get('catalog')
+    idx = catalog.cb_index_for_title(title)
+    if idx is None:
         return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
 
-    hybrid_df = pd.merge(cb_scores_df, cf_scores_df, on='tmdb_id', how='outer')
-    hybrid_df['score_cb'] = hybrid_df.get('score_cb', 0).fillna(0)
-    hybrid_df['score_cf'] = hybrid_df.get('score_cf', 0).fillna(0)
-    hybrid_df['score_hybrid'] = hybrid_df['score_cb'] * cb_weight + hybrid_df['score_cf'] * cf_weight
-    hybrid_df.sort_values('score_hybrid', ascending=False, inplace=True)
+    content_ann = resources.get('content_ann')
+    # ANN ищет по tf-idf, сжатому TruncatedSVD: даже при просмотре всех кластеров это приближение
+    # косинуса tf-idf, который точно хранит content_neighbours (полноту печатает build_artifacts.py --ann-check).
+    if CONTENT_ANN_NPROBE > 0 and content_ann is not None:
+        neighbour_indices, _ = content_ann.search(content_ann.vectors[idx], top_n=top_n, nprobe=CONTENT_ANN_NPROBE,
+                                                  exclude=np.array([idx]))
+    else:
+        neighbour_indices, _ = resources.get('content_neighbours').neighbours(idx)
+    rows = catalog.cb_rows[neighbour_indices[:top_n]]
+    rows = pd.unique(rows[rows >= 0])
+
+    recommended = resources.get('movies').take(rows)
+    return recommended[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']].reset_index(drop=True)
+
+
+def get_batch_content_scores(seed_tmdb_ids: list, seed_weights: list, reducer: str = None) -> Optional[np.ndarray]:
+    # Единственная точка батчевого content-based расчёта: близость всех фильмов (по позициям cb)
+    # ко всем лайкам и дизлайкам пользователя разом. None — ни одного известного лайка.
+    catalog = resources.get('catalog')
+    seed_rows = catalog.rows_for_tmdb_ids(seed_tmdb_ids)
+    seed_cb = np.where(seed_rows >= 0, catalog.row_to_cb[seed_rows], -1)
+    seed_weights = np.asarray(seed_weights, dtype=np.float64)
+    known_seeds = seed_cb >= 0
+    if not (known_seeds & (seed_weights > 0)).any():
+        return None
+    return resources.get('content_neighbours').aggregate(
+        seed_cb[known_seeds], seed_weights[known_seeds], reducer=reducer or CONTENT_SEED_REDUCER)
+
+
+def cf_positions_for_tmdb_ids(tmdb_ids: list) -> np.ndarray:
+    rows = resources.get('catalog').rows_for_tmdb_ids(tmdb_ids)
+    return np.where(rows >= 0, resources.get('cf_row_positions')[rows], -1)
+
+
+def get_user_factors(user_id: int, user_likes: list = None):
+    # Вектор пользователя приложения для SVD; строится из лайков при первом обращении
+    # и дальше обновляется в api_like/api_unlike. Состояние сверяется с переданными
+    # лайками: при нескольких процессах лайк мог обработать другой worker.
+    foldin = resources.get('cf_foldin')
+    generation = foldin.generation(user_id)
+    if user_likes is None:
+        user_likes = Like.query.filter_by(user_id=user_id).all()
+    positions = cf_positions_for_tmdb_ids([like.tmdb_id for like in user_likes])
+    values = np.array([like.value for like in user_likes], dtype=np.int64)
+    known = positions >= 0
+    factors = foldin.factors(user_id, dict(zip(positions[known].tolist(), values[known].tolist())))
+    if factors is None:
+        factors = foldin.build(user_id, positions[known], values[known], generation)
+    return factors
+
+
+def get_collaborative_scores(user_id: int, user_likes: list = None) -> np.ndarray:
+    # user_likes передаётся для пользователей приложения (fold-in по лайкам),
+    # без него user_id считается userId из MovieLens.
+    cf_engine = resources.get('cf_engine')
+    cf_item_rows, cf_candidate_mask = resources.get('cf_item_rows')
+    if user_likes is not None:
+        user_factors = get_user_factors(user_id, user_likes)
+        rated_positions = cf_positions_for_tmdb_ids([like.tmdb_id for like in user_likes])
+        rated_positions = rated_positions[rated_positions >= 0]
+    else:
+        user_factors = None
+        rated_positions = cf_engine.item_positions(resources.get('ratings').user_items(int(user_id)))
+
+    # С ANN-индексом точный прогноз считается только для кандидатов из nprobe кластеров.
+    positions = None
+    cf_ann = resources.get('cf_ann')
+    if CF_ANN_NPROBE > 0 and cf_ann is not None:
+        positions = cf_ann.candidates(cf_engine.query_vector(int(user_id), user_factors), nprobe=CF_ANN_NPROBE)
+    return cf_engine.masked_scores(int(user_id), exclude=rated_positions, candidates=cf_candidate_mask,
+                                   user_factors=user_factors, positions=positions)
+
+
+def get_collaborative_recommendations(user_id: int, top_n: int = 10, user_likes: list = None) -> pd.DataFrame:
+    cf_item_rows, _ = resources.get('cf_item_rows')
+    top_positions = top_n_indices(get_collaborative_scores(user_id, user_likes), top_n)
+    if top_positions.size == 0:
+        return pd.DataFrame(columns=['title', 'tmdb_id', 'poster_path', 'overview', 'genres'])
 
-    top_n_hybrid_df = hybrid_df.head(top_n)
-    final_recs = pd.merge(top_n_hybrid_df[['tmdb_id', 'score_hybrid']],
-                          movies_df[['tmdb_id', 'title', 'poster_path', 'overview', 'genres']],
-                          on='tmdb_id', how='left').sort_values('score_hybrid', ascending=False)
+    recommended_movies_info = resources.get('movies').take(cf_item_rows[top_positions])
+    return recommended_movies_info[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']].reset_index(drop=True)
 
-    return final_recs[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']]
 
 @app.route('/api/register', methods=['POST'])
 def api_register():
@@ -273,21 +607,45 @@ def api_check_auth():
 @app.route('/api/profile')
 @login_required
 def api_profile():
-    likes_count = Like.query.filter_by(user_id=current_user.id).count()
-    print(f"User {current_user.id} ({current_user.username}) has {likes_count} likes")
-    
-    all_likes = Like.query.all()
-    print(f"Total likes in database: {len(all_likes)}")
-    for like in all_likes:
-        print(f"Like: user_id={like.user_id}, tmdb_id={like.tmdb_id}, value={like.value}")
-    
+    # Один агрегат по индексу ix_like_user_value: число оценок каждого знака и время последней.
+    counts = {}
+    last_activity = None
+    for value, count, last_timestamp in db.session.query(
+            Like.value, db.func.count(), db.func.max(Like.timestamp)).filter(
+            Like.user_id == current_user.id).group_by(Like.value):
+        counts[value] = count
+        if last_timestamp is not None and (last_activity is None or last_timestamp > last_activity):
+            last_activity = last_timestamp
+
     return jsonify({
         'username': current_user.username,
         'email': current_user.email,
         'date_joined': current_user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-        'likes_count': likes_count
+        'likes_count': sum(counts.values()),
+        'liked_count': counts.get(1, 0),
+        'disliked_count': counts.get(-1, 0),
+        'last_activity': last_activity.strftime('%Y-%m-%d %H:%M:%S') if last_activity else None,
+        'top_genres': top_liked_genres(current_user.id) if counts.get(1) else [],
     })
 
+
+def top_liked_genres(user_id: int, top_n: int = PROFILE_TOP_GENRES) -> list:
+    # Жанры лайкнутых фильмов по каталогу в памяти; пока каталог не загружен — пусто, чтобы профиль не ждал.
+    if not resources.is_loaded('catalog'):
+        return []
+    liked_ids = [tmdb_id for (tmdb_id,) in db.session.query(Like.tmdb_id).filter(
+        Like.user_id == user_id, Like.value == 1)]
+    rows = resources.get('catalog').rows_for_tmdb_ids(liked_ids)
+    genres = resources.get('movies')['genres'].to_numpy()[rows[rows >= 0]]
+    counter = Counter()
+    for value in genres:
+        if isinstance(value, str):
+            value = value.split(',')
+        elif not isinstance(value, (list, tuple, np.ndarray)):
+            continue
+        counter.update(genre.strip() for genre in value if genre.strip())
+    return [{'genre': genre, 'count': count} for genre, count in counter.most_common(top_n)]
+
 @app.route('/api/logout', methods=['POST'])
 @login_required
 def api_logout():
@@ -304,17 +662,64 @@ def api_like():
     if not tmdb_id or value not in [1, -1]:
         return jsonify({'status': 'error', 'message': 'Неверный запрос'}), 400
 
-    like = Like.query.filter_by(user_id=current_user.id, tmdb_id=tmdb_id).first()
-    if like:
-        like.value = value
-    else:
-        like = Like(user_id=current_user.id, tmdb_id=tmdb_id, value=value)
-        db.session.add(like)
-    
-    db.session.commit()
+    # id берётся до commit: после него current_user перечитывается из БД.
+    user_id = current_user.id
+    with tracer.span('db_like_upsert'):
+        upsert_likes(user_id, [{'tmdb_id': tmdb_id, 'value': value}])
+        db.session.commit()
+    recommendation_cache.invalidate(user_id)
+    update_user_factors(user_id, {tmdb_id: value})
     return jsonify({'status': 'success'})
 
 
+def upsert_likes(user_id: int, likes: list):
+    # Один INSERT ... ON CONFLICT DO UPDATE вместо SELECT и отдельной вставки или обновления.
+    timestamp = datetime.utcnow()
+    rows = [{'user_id': user_id, 'tmdb_id': like['tmdb_id'], 'value': like['value'], 'timestamp': timestamp}
+            for like in likes]
+    db.session.execute(upsert(Like.__table__, rows, ('user_id', 'tmdb_id'), ('value', 'timestamp'),
+                              db.engine.dialect.name))
+
+
+@app.route('/api/likes/batch', methods=['POST'])
+@login_required
+def api_likes_batch():
+    # Пакет оценок одной транзакцией: value 1 / -1 — поставить, 0 — удалить.
+    items = (request.json or {}).get('likes')
+    if not isinstance(items, list) or not items or len(items) > LIKES_BATCH_MAX:
+        return jsonify({'status': 'error', 'message': f'Нужен список likes (до {LIKES_BATCH_MAX} оценок)'}), 400
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('tmdb_id'), int) or item.get('value') not in (1, -1, 0):
+            return jsonify({'status': 'error', 'message': 'Неверный запрос', 'item': item}), 400
+
+    items = dedupe_last(items, ('tmdb_id',))
+    upserts = [item for item in items if item['value'] != 0]
+    removed_ids = [item['tmdb_id'] for item in items if item['value'] == 0]
+    user_id = current_user.id
+    removed = 0
+    with tracer.span('db_like_batch', count=len(items)):
+        if upserts:
+            upsert_likes(user_id, upserts)
+        if removed_ids:
+            removed = Like.query.filter(Like.user_id == user_id,
+                                        Like.tmdb_id.in_(removed_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    recommendation_cache.invalidate(user_id)
+    update_user_factors(user_id, {item['tmdb_id']: item['value'] or None for item in items})
+    return jsonify({'status': 'success', 'updated': len(upserts), 'removed': removed})
+
+
+def update_user_factors(user_id: int, changes: dict):
+    # changes: tmdb_id -> новая оценка (None — удалена).
+    # Пока SVD не загружена, векторов ещё нет — их построят из лайков при первом запросе.
+    if not resources.is_loaded('cf_foldin'):
+        return
+    foldin = resources.get('cf_foldin')
+    positions = cf_positions_for_tmdb_ids(list(changes))
+    for position, value in zip(positions, changes.values()):
+        foldin.update(user_id, int(position) if position >= 0 else None, value)
+
+
 @app.route('/api/unlike', methods=['POST'])
 @login_required
 def api_unlike():
@@ -324,11 +729,13 @@ def api_unlike():
     if not tmdb_id:
         return jsonify({'status': 'error', 'message': 'ID фильма не указан'}), 400
     
-    like = Like.query.filter_by(user_id=current_user.id, tmdb_id=tmdb_id).first()
-    
-    if like:
-        db.session.delete(like)
-        db.session.commit()
+    user_id = current_user.id
+    deleted = Like.query.filter_by(user_id=user_id, tmdb_id=tmdb_id).delete(synchronize_session=False)
+    db.session.commit()
+
+    if deleted:
+        recommendation_cache.invalidate(user_id)
+        update_user_factors(user_id, {tmdb_id: None})
         return jsonify({'status': 'success', 'message': 'Оценка удалена'})
     else:
         return jsonify({'status': 'error', 'message': 'Оценка не найдена'}), 404
@@ -381,187 +788,222 @@ def api_update_user_settings():
     
     settings.updated_at = datetime.utcnow()
     db.session.commit()
+    recommendation_cache.invalidate(current_user.id)
     
     return jsonify({'status': 'success', 'message': 'Настройки сохранены'})
 
 
+def load_settings_and_likes(user_id: int):
+    # Настройки и оценки пользователя одним запросом (LEFT JOIN от User);
+    # оценки — строки с полями tmdb_id и value.
+    rows = db.session.query(UserSettings, Like.tmdb_id, Like.value).select_from(User).outerjoin(
+        UserSettings, UserSettings.user_id == User.id).outerjoin(
+        Like, Like.user_id == User.id).filter(User.id == user_id).all()
+    settings = rows[0][0] if rows else None
+    likes = [row for row in rows if row.tmdb_id is not None]
+    if settings is None:
+        settings = UserSettings(user_id=user_id)
+        db.session.add(settings)
+        db.session.commit()
+    return settings, likes
+
+
+def candidate_generators(user_id: int, user_likes: list) -> dict:
+    # Источники кандидатов для CandidatePipeline: каждый по глубине возвращает строки каталога и оценки.
+    catalog = resources.get('catalog')
+
+    def collaborative(depth):
+        stored = precomputed_recs.get(APP_SCOPE, user_id)
+        if stored is not None and stored.version == resources.version and \
+                stored.fingerprint == likes_fingerprint((like.tmdb_id, like.value) for like in user_likes):
+            rows = catalog.rows_for_tmdb_ids(stored.tmdb_ids)
+            return rows[rows >= 0][:depth], stored.scores[rows >= 0][:depth]
+        cf_item_rows, _ = resources.get('cf_item_rows')
+        return top_candidates(get_collaborative_scores(user_id, user_likes), cf_item_rows, depth)
+
+    def content(depth):
+        cb_scores = get_batch_content_scores([like.tmdb_id for like in user_likes],
+                                             [like.value for like in user_likes])
+        if cb_scores is None:
+            return np.empty(0, np.int64), np.empty(0)
+        return top_candidates(cb_scores, catalog.cb_rows, depth)
+
+    def precomputed(name):
+        def generator(depth):
+            rows, scores = resources.get(name)
+            return rows[:depth], scores[:depth]
+        return generator
+
+    def traced(name, generator):
+        def run(depth):
+            with tracer.span(f"candidates_{name}") as span:
+                rows, scores = generator(depth)
+                span.count = len(rows)
+            return rows, scores
+        return run
+
+    return {
+        'collaborative': traced('collaborative', collaborative),
+        'content': traced('content', content),
+        'popular': traced('popular', precomputed('popular_candidates')),
+        'new': traced('new', precomputed('new_candidates')),
+    }
+
+
+def smart_recommendation_weights(algorithm: str, settings) -> dict:
+    # Популярное и новинки подмешиваются с малым весом: при пустом основном источнике выдача из них и состоит.
+    background = {'popular': 0.05, 'new': 0.02}
+    if algorithm == 'content':
+        return {'content': 1.0, **background}
+    if algorithm == 'collaborative':
+        return {'collaborative': 1.0, **background}
+    if algorithm == 'hybrid':
+        return {'content': settings.content_weight or 0.0, 'collaborative': settings.collaborative_weight or 0.0,
+                **background}
+    return {'popular': 1.0}
+
+
 @app.route('/api/smart-recommendations')
 @login_required
 def api_smart_recommendations():
     try:
-        settings = UserSettings.query.filter_by(user_id=current_user.id).first()
-        if not settings:
-            settings = UserSettings(user_id=current_user.id)
-            db.session.add(settings)
-            db.session.commit()
+        catalog = resources.get('catalog')
+        with tracer.span('db_user_state') as span:
+            settings, user_likes = load_settings_and_likes(current_user.id)
+            span.count = len(user_likes)
         
         algorithm = settings.recommendation_algorithm
         user_id = current_user.id
+        tracer.tag(algorithm=algorithm)
+
+        with tracer.span('cache_lookup') as span:
+            # Отпечаток лайков в ключе: кэш другого процесса не отдаст список до последнего лайка.
+            cache_key = recommendation_cache.key_for(
+                user_id, algorithm, (settings.content_weight, settings.collaborative_weight),
+                namespace=f"{resources.version}:{likes_fingerprint((like.tmdb_id, like.value) for like in user_likes)}")
+            cached_response = recommendation_cache.get(cache_key)
+            span.count = int(cached_response is not None)
+        if cached_response is not None:
+            return json_response(cached_response)
         
-        liked_movies = Like.query.filter_by(user_id=user_id, value=1).all()
-        
-        recommendations = pd.DataFrame()
-        
-        if algorithm == 'content' and liked_movies:
-            all_content_recs = pd.DataFrame()
-            for like in liked_movies[:3]:
-                movie_info = movies_df[movies_df['tmdb_id'] == like.tmdb_id]
-                if not movie_info.empty:
-                    movie_title = movie_info.iloc[0]['title']
-                    content_recs = get_content_recommendations(movie_title, top_n=10)
-                    if not content_recs.empty:
-                        all_content_recs = pd.concat([all_content_recs, content_recs], ignore_index=True)
-            
-            if not all_content_recs.empty:
-                recommendations = all_content_recs.drop_duplicates(subset=['tmdb_id']).head(20)
-        
-        elif algorithm == 'collaborative':
-            recommendations = get_collaborative_recommendations(user_id, top_n=20)
-        
-        elif algorithm == 'hybrid' and liked_movies:
-            all_hybrid_recs = pd.DataFrame()
-            for like in liked_movies[:2]:
-                movie_info = movies_df[movies_df['tmdb_id'] == like.tmdb_id]
-                if not movie_info.empty:
-                    movie_title = movie_info.iloc[0]['title']
-                    hybrid_recs = get_hybrid_recommendations(
-                        user_id, 
-                        movie_title, 
-                        top_n=15,
-                        cb_weight=settings.content_weight,
-                        cf_weight=settings.collaborative_weight
-                    )
-                    if not hybrid_recs.empty:
-                        all_hybrid_recs = pd.concat([all_hybrid_recs, hybrid_recs], ignore_index=True)
-            
-            if not all_hybrid_recs.empty:
-                recommendations = all_hybrid_recs.drop_duplicates(subset=['tmdb_id']).head(20)
-        
-        if recommendations.empty or algorithm == 'popular':
-            recommendations = popular_movies_df.head(20).copy()
-        
-        user_rated_movies = [like.tmdb_id for like in Like.query.filter_by(user_id=user_id).all()]
-        recommendations = recommendations[~recommendations['tmdb_id'].isin(user_rated_movies)]
-        
-        recommendations['poster_url'] = recommendations.apply(get_poster_url, axis=1)
-        
-        for col in recommendations.columns:
-            if recommendations[col].dtype == 'datetime64[ns]':
-                recommendations[col] = recommendations[col].astype(str)
-        
-        movies_list = recommendations.head(20).to_dict('records')
-        
-        return jsonify({
-            'movies': movies_list,
-            'algorithm_used': algorithm,
-            'total_count': len(movies_list)
-        })
-        
-    except Exception as e:
-        print(f"Error in smart recommendations: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        user_rated_movies = [like.tmdb_id for like in user_likes]
+
+        exclude_rows = catalog.rows_for_tmdb_ids(user_rated_movies)
+        rows, timings = run_scoring(
+            resources.get('candidate_pipeline').run,
+            candidate_generators(user_id, user_likes),
+            smart_recommendation_weights(algorithm, settings),
+            top_n=SMART_RECS_COUNT,
+            exclude_rows=exclude_rows[exclude_rows >= 0],
+        )
+        tracer.record('rerank', timings['rerank'] / 1000, count=len(rows))
+
+        # Постеры разрешаются при загрузке movie_fragments (см. recsys_resource_load_seconds), здесь — только сборка JSON.
+        with tracer.span('serialize', count=len(rows)):
+            response_data = encode_object({
+                'movies': resources.get('movie_fragments').array(rows),
+                'algorithm_used': dumps(algorithm),
+                'total_count': dumps(len(rows)),
+            })
+        recommendation_cache.set(cache_key, response_data)
+        return json_response(response_data)
         
+    except Exception:
+        request_errors.inc(endpoint='smart_recommendations')
+        app.logger.exception("Error in smart recommendations")
+
         try:
-            fallback_movies = popular_movies_df.head(20).copy()
-            fallback_movies['poster_url'] = fallback_movies.apply(get_poster_url, axis=1)
-            
-            for col in fallback_movies.columns:
-                if fallback_movies[col].dtype == 'datetime64[ns]':
-                    fallback_movies[col] = fallback_movies[col].astype(str)
-            
-            movies_list = fallback_movies.to_dict('records')
-            
-            return jsonify({
-                'movies': movies_list,
-                'algorithm_used': 'popular',
-                'total_count': len(movies_list),
-                'error': 'Использованы популярные фильмы из-за ошибки в алгоритме'
-            })
-        except Exception as fallback_error:
-            print(f"Fallback error: {str(fallback_error)}")
+            popular_fragments = resources.get('popular_fragments')
+            fallback_count = min(20, len(popular_fragments))
+
+            return json_response(encode_object({
+                'movies': popular_fragments.array(range(fallback_count)),
+                'algorithm_used': dumps('popular'),
+                'total_count': dumps(fallback_count),
+                'error': dumps('Использованы популярные фильмы из-за ошибки в алгоритме'),
+            }))
+        except Exception:
+            request_errors.inc(endpoint='smart_recommendations_fallback')
+            app.logger.exception("Error in smart recommendations fallback")
             return jsonify({'error': 'Ошибка получения рекомендаций'}), 500
 
 
+def feed_response(feed: Feed) -> Response:
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = min(limit, FEED_MAX_LIMIT)
+    with tracer.span(f"feed_{feed.name}"):
+        payload, etag = feed.page(request.args.get('offset', 0, type=int), limit, request.args.get('genre'))
+
+    response = json_response(payload)
+    response.set_etag(etag)
+    response.last_modified = feed.last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = FEED_MAX_AGE
+    return response.make_conditional(request)
+
+
 @app.route('/api/popular')
 def api_popular():
     try:
-        popular_movies_df_copy = popular_movies_df.copy()
-        
-        available_columns = popular_movies_df_copy.columns.tolist()
-        print(f"Available columns in popular_movies_df: {available_columns}")
-        
-        popular_movies_df_copy['poster_url'] = popular_movies_df_copy.apply(get_poster_url, axis=1)
-
-        if 'release_date' in popular_movies_df_copy.columns:
-            popular_movies_df_copy['release_date'] = popular_movies_df_copy['release_date'].astype(str).replace('NaT', None)
-
-        required_columns = ['title', 'poster_url', 'overview', 'genres', 'release_date', 'vote_average', 'vote_count', 'tmdb_id']
-        available_required_columns = [col for col in required_columns if col in popular_movies_df_copy.columns]
-        
-        for col in required_columns:
-            if col not in popular_movies_df_copy.columns:
-                if col == 'overview':
-                    popular_movies_df_copy[col] = ''
-                elif col == 'genres':
-                    popular_movies_df_copy[col] = 'Unknown'
-                elif col == 'vote_average':
-                    popular_movies_df_copy[col] = 0.0
-                elif col == 'vote_count':
-                    popular_movies_df_copy[col] = 0
-                else:
-                    popular_movies_df_copy[col] = None
-
-        movies_list = popular_movies_df_copy[required_columns].to_dict('records')
-        
-        return jsonify(movies_list)
+        return feed_response(resources.get('popular_feed'))
         
     except Exception as e:
-        print(f"Error in api_popular: {e}")
+        request_errors.inc(endpoint='popular')
+        app.logger.exception("Error in api_popular")
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/new')
 def api_new():
     try:
-        movies_df_copy = movies_df.copy()
-        movies_df_copy['release_date_dt'] = pd.to_datetime(movies_df_copy['release_date'], errors='coerce')
-        
-        new_movies_df = movies_df_copy.dropna(subset=['release_date_dt']).sort_values(by='release_date_dt', ascending=False).head(20)
-        
-        new_movies_df = new_movies_df.copy()
-        new_movies_df['poster_url'] = new_movies_df.apply(get_poster_url, axis=1)
-
-        if 'release_date' in new_movies_df.columns:
-            new_movies_df['release_date'] = new_movies_df['release_date'].astype(str).replace('NaT', None)
-
-        required_columns = ['title', 'poster_url', 'overview', 'genres', 'release_date', 'vote_average', 'vote_count', 'tmdb_id']
-        
-        for col in required_columns:
-            if col not in new_movies_df.columns:
-                if col == 'overview':
-                    new_movies_df[col] = ''
-                elif col == 'genres':
-                    new_movies_df[col] = 'Unknown'
-                elif col == 'vote_average':
-                    new_movies_df[col] = 0.0
-                elif col == 'vote_count':
-                    new_movies_df[col] = 0
-                else:
-                    new_movies_df[col] = None
-
-        movies_list = new_movies_df[required_columns].to_dict('records')
-
-        return jsonify(movies_list)
+        return feed_response(resources.get('new_feed'))
         
     except Exception as e:
-        print(f"Error in api_new: {e}")
+        request_errors.inc(endpoint='new')
+        app.logger.exception("Error in api_new")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    ready = resources.ready
+    return jsonify({
+        'ready': ready,
+        'version': resources.version,
+        'resources': resources.status(),
+        'caches': cache_stats(),
+    }), 200 if ready else 503
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    body = metrics_files.render() if metrics_files is not None else metrics.render()
+    return Response(body, content_type=MetricsRegistry.CONTENT_TYPE)
+
+
+@app.route('/admin/bundle', methods=['GET', 'POST'])
+def admin_bundle():
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    if request.method == 'POST':
+        started = resources.reload()
+        return jsonify({'status': 'reloading' if started else 'busy', **resources.versions()}), 202
+    return jsonify({'on_disk': active_version(ARTIFACTS_DIR), **resources.versions()})
+
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     static_dir = os.path.join(app.root_path, 'static')
-    return send_from_directory(static_dir, filename)
+    content_hashed = CONTENT_HASHED_STATIC_RE.search(filename) is not None
+    response = send_from_directory(static_dir, filename,
+                                   max_age=STATIC_IMMUTABLE_MAX_AGE if content_hashed else None)
+    response.cache_control.immutable = content_hashed or None
+    return response
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -571,7 +1013,31 @@ def serve(path):
     else:
         return send_from_directory(app.static_folder, 'index.html')
 
+def json_response(payload: bytes) -> Response:
+    return Response(payload, mimetype='application/json')
+
+
+def poster_variants(movie_dict: dict) -> list:
+    # Варианты нужного формата, по возрастанию ширины.
+    variants = movie_dict.get('poster_variants')
+    if not isinstance(variants, str):
+        return []
+    return sorted((v for v in json.loads(variants) if v['format'] == POSTER_FORMAT), key=lambda v: v['width'])
+
+
+def get_poster_srcset(movie_dict: dict) -> Optional[str]:
+    variants = poster_variants(movie_dict)
+    if not variants:
+        return None
+    return ", ".join(f"/static/{v['path']} {v['width']}w" for v in variants)
+
+
 def get_poster_url(movie_dict: dict) -> str:
+    variants = poster_variants(movie_dict)
+    if variants:
+        variant = next((v for v in variants if v['width'] >= POSTER_WIDTH), variants[-1])
+        return f"/static/{variant['path']}"
+
     if 'local_poster' in movie_dict and pd.notna(movie_dict['local_poster']):
         return f"/static/{movie_dict['local_poster']}"
 
@@ -590,26 +1056,21 @@ def get_poster_url(movie_dict: dict) -> str:
 
 
 def fetch_imdb_poster(imdb_id: str) -> Optional[str]:
-    if not imdb_id or pd.isna(imdb_id) or not re.match(r"tt\d+", imdb_id):
-        return None
-    api_key = os.environ.get("OMDB_API_KEY", "YOUR_OMDB_KEY")
-    if api_key == "YOUR_OMDB_KEY":
-        return None
-    
-    url = f"http://www.omdbapi.com/?i={imdb_id}&apikey={api_key}"
-    try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        if data.get("Response") == "True" and "Poster" in data and data["Poster"] != "N/A":
-            return data["Poster"]
-    except requests.RequestException as e:
-        print(f"[ERROR] Failed to fetch poster for {imdb_id}: {e}")
-    return None
+    # Блокирующий запрос (с кэшем); на пути запроса используйте get_imdb_poster_cached.
+    return omdb_client.get(imdb_id, wait=True)
 
 
 def get_imdb_poster_cached(imdb_id: str) -> Optional[str]:
-    return fetch_imdb_poster(imdb_id)
+    # Не ждёт OMDb: при промахе кэш заполняется в фоне, а сейчас возвращается None.
+    return omdb_client.get(imdb_id)
+
+
+# В конце модуля: загрузчикам ресурсов нужны функции, объявленные выше (get_poster_url и др.).
+if RESOURCE_LOADING == 'eager':
+    load_all_resources()
 
 if __name__ == '__main__':
+    if RESOURCE_LOADING == 'background':
+        resources.start_background_load(RESOURCE_LOAD_ORDER)
+    start_resource_watcher()
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
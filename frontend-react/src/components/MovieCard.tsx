@@ -3,6 +3,7 @@ interface Movie {
   title: string
   poster_full?: string
   poster_url?: string
+  poster_srcset?: string | null
   user_like?: number
 }
 
@@ -30,6 +31,8 @@ function MovieCard({ movie, onLike, onUnlike }: MovieCardProps) {
       {posterUrl ? (
         <img 
           src={posterUrl} 
+          srcSet={movie.poster_srcset || undefined}
+          sizes="(max-width: 600px) 45vw, 240px"
           className="movie-poster" 
           alt={movie.title || 'Фильм'}
           onError={(e) => {
@@ -135,7 +135,13 @@ function Dashboard() {
                 Активность
               </h2>
               <div style={{ color: '#cbd5e1' }}>
-                <p><strong>Оценено фильмов:</strong> {user.likes_count || 0}</p>
+                <p><strong>Оценено фильмов:</strong> {user.likes_count || 0} (👍 {user.liked_count || 0} / 👎 {user.disliked_count || 0})</p>
+                {user.top_genres?.length > 0 && (
+                  <p><strong>Любимые жанры:</strong> {user.top_genres.map((g: any) => g.genre).join(', ')}</p>
+                )}
+                {user.last_activity && (
+                  <p><strong>Последняя оценка:</strong> {new Date(user.last_activity).toLocaleDateString('ru-RU')}</p>
+                )}
                 <p><strong>Просмотрено рекомендаций:</strong> {user.recommendations_viewed || 0}</p>
               </div>
             </div>
@@ -0,0 +1,5 @@
+"""Вычислительное ядро рекомендательной системы.
+
+Модули пакета не зависят от Flask и могут использоваться как из ``app.py``,
+так и из офлайн-скриптов в ``scripts/``.
+"""
@@ -0,0 +1,167 @@
+"""Приближённый поиск ближайших соседей (IVF) на NumPy.
+
+Векторы разбиваются сферическим k-means на ``nlist`` кластеров; для каждого
+кластера хранится список его элементов (CSR: ``list_indptr`` /
+``list_items``). Запрос сравнивается с центроидами, просматриваются только
+``nprobe`` ближайших кластеров, и кандидаты из них ранжируются точно по
+скалярному произведению. ``nprobe`` — ручка «полнота / задержка»:
+``nprobe = nlist`` даёт точный поиск.
+
+Для поиска по максимальному скалярному произведению (MIPS, факторы SVD)
+векторы дополняются координатой ``sqrt(M² - |x|²)``, после чего у всех
+векторов одинаковая норма и MIPS сводится к поиску по косинусу; запрос
+дополняется нулём, поэтому скалярные произведения не меняются.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from recsys.topn import top_n_indices
+
+DEFAULT_NPROBE = 8
+
+
+def _normalise_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mips_transform(vectors: np.ndarray) -> np.ndarray:
+    """Дополняет векторы так, что все нормы равны максимальной, а скалярные произведения с ``[q, 0]`` сохраняются."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    squared = np.einsum("ij,ij->i", vectors, vectors)
+    extra = np.sqrt(np.maximum(squared.max(initial=0.0) - squared, 0.0))
+    return np.hstack([vectors, extra[:, None]]).astype(np.float32)
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, n_iter: int = 10, seed: int = 0,
+                     batch_size: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """Центроиды (единичной нормы) и номер кластера каждого вектора."""
+    rng = np.random.default_rng(seed)
+    unit = _normalise_rows(vectors)
+    nlist = max(1, min(nlist, unit.shape[0]))
+    centroids = unit[rng.choice(unit.shape[0], nlist, replace=False)].copy()
+    assignment = np.zeros(unit.shape[0], dtype=np.int64)
+
+    for _ in range(n_iter):
+        for start in range(0, unit.shape[0], batch_size):
+            block = unit[start:start + batch_size]
+            assignment[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, unit)
+        counts = np.bincount(assignment, minlength=nlist)
+        empty = counts == 0
+        if empty.any():  # пустые кластеры заново инициализируются случайными точками
+            sums[empty] = unit[rng.choice(unit.shape[0], int(empty.sum()), replace=False)]
+        centroids = _normalise_rows(sums)
+    return centroids.astype(np.float32), assignment
+
+
+class IVFIndex:
+    """Инвертированный индекс по кластерам с точным доранжированием кандидатов.
+
+    ``vectors`` хранятся целиком (float32): поиск возвращает точные скалярные
+    произведения для просмотренных кандидатов.
+    """
+
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, list_indptr: np.ndarray,
+                 list_items: np.ndarray, mips: bool = False):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_items = list_items
+        self.mips = mips
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: Optional[int] = None, mips: bool = False,
+              n_iter: int = 10, seed: int = 0) -> "IVFIndex":
+        """Строит индекс; по умолчанию ``nlist ≈ 4·sqrt(N)``."""
+        vectors = mips_transform(vectors) if mips else np.asarray(vectors, dtype=np.float32)
+        if nlist is None:
+            nlist = int(4 * np.sqrt(vectors.shape[0]))
+        centroids, assignment = spherical_kmeans(vectors, nlist, n_iter=n_iter, seed=seed)
+        order = np.argsort(assignment, kind="stable")
+        list_indptr = np.zeros(centroids.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=centroids.shape[0]), out=list_indptr[1:])
+        return cls(np.ascontiguousarray(vectors), centroids, list_indptr, order.astype(np.int32), mips=mips)
+
+    @property
+    def n_items(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.vectors, self.centroids, self.list_indptr, self.list_items))
+
+    def _query(self, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        return np.append(query, np.float32(0.0)) if self.mips else query
+
+    def candidates(self, query: np.ndarray, nprobe: int = DEFAULT_NPROBE) -> np.ndarray:
+        """Элементы ``nprobe`` кластеров, ближайших к запросу."""
+        query = self._query(query)
+        probes = top_n_indices(self.centroids @ query, min(nprobe, self.nlist))
+        starts, ends = self.list_indptr[probes], self.list_indptr[probes + 1]
+        return np.concatenate([self.list_items[s:e] for s, e in zip(starts, ends)]).astype(np.int64)
+
+    def search(self, query: np.ndarray, top_n: int = 10, nprobe: int = DEFAULT_NPROBE,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """``top_n`` элементов с наибольшим скалярным произведением среди кандидатов."""
+        candidates = self.candidates(query, nprobe)
+        if exclude is not None and len(exclude):
+            candidates = candidates[~np.isin(candidates, exclude)]
+        scores = self.vectors[candidates] @ self._query(query)
+        top = top_n_indices(scores, top_n)
+        return candidates[top], scores[top]
+
+    def save_to(self, writer, prefix: str) -> None:
+        """Сохраняет индекс в каталог артефактов (см. ``recsys.artifacts``)."""
+        writer.add_array(f"{prefix}_vectors", self.vectors)
+        writer.add_array(f"{prefix}_centroids", self.centroids)
+        writer.add_array(f"{prefix}_list_indptr", self.list_indptr)
+        writer.add_array(f"{prefix}_list_items", self.list_items)
+        writer.metadata[prefix] = {"mips": self.mips, "nlist": self.nlist}
+
+    @classmethod
+    def from_bundle(cls, bundle, prefix: str) -> Optional["IVFIndex"]:
+        """Открывает индекс из каталога артефактов или возвращает ``None``, если его там нет."""
+        if f"{prefix}_centroids" not in bundle:
+            return None
+        return cls(bundle.array(f"{prefix}_vectors"), bundle.array(f"{prefix}_centroids"),
+                   bundle.array(f"{prefix}_list_indptr"), bundle.array(f"{prefix}_list_items"),
+                   mips=bool(bundle.metadata[prefix]["mips"]))
+
+
+def recall_report(index: IVFIndex, queries: np.ndarray, exact_top: Callable[[int], np.ndarray],
+                  nprobes: Iterable[int], top_n: int = 10,
+                  exclude: Optional[np.ndarray] = None) -> List[Dict[str, float]]:
+    """Полнота top-N и среднее время запроса для каждого значения ``nprobe``.
+
+    ``exact_top(i)`` возвращает эталонный top-N для ``queries[i]``; эталон
+    не обязан считаться по векторам индекса (например, для content-индекса
+    это косинус полных tf-idf векторов). ``exclude[i]`` — элемент, который
+    не возвращается на ``i``-й запрос (например, сам фильм).
+    """
+    truth = [set(exact_top(i).tolist()) for i in range(len(queries))]
+    report = []
+    for nprobe in nprobes:
+        hits, started = 0, time.perf_counter()
+        found = [index.search(query, top_n, nprobe, exclude=None if exclude is None else exclude[i:i + 1])[0]
+                 for i, query in enumerate(queries)]
+        elapsed = time.perf_counter() - started
+        for expected, ids in zip(truth, found):
+            hits += len(expected.intersection(ids.tolist()))
+        report.append({
+            "nprobe": nprobe,
+            "recall": hits / max(sum(len(expected) for expected in truth), 1),
+            "ms_per_query": 1000 * elapsed / max(len(queries), 1),
+        })
+    return report
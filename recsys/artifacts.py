@@ -0,0 +1,290 @@
+"""Формат артефактов модели, открываемый через memory mapping.
+
+Каждая выгрузка пишется в собственный каталог ``versions/<версия>`` с
+``manifest.json`` и набором файлов, а файл ``CURRENT`` в корне указывает на
+активную версию. Файлы опубликованной версии больше не меняются, поэтому
+новую версию можно выгружать, пока процессы читают старую.
+
+Файлы версии:
+
+* числовые массивы (факторы SVD, индекс соседей, оценки) — ``.npy``,
+  открываются через ``np.load(mmap_mode='r')`` без копирования в кучу;
+* таблицы (каталог фильмов, подборки) — Arrow IPC (Feather v2) без сжатия,
+  одним record batch; читаются через ``pyarrow`` с ``memory_map=True``.
+  Числовые колонки без пропусков становятся в ``DataFrame`` представлениями
+  отображённого файла (только для чтения), а строковые, списковые и колонки
+  с пропусками pandas материализует в куче процесса.
+
+Страницы отображённых файлов живут в page cache и разделяются всеми
+процессами, открывшими один и тот же каталог, а открытие занимает миллисекунды.
+
+Процесс, обслуживающий запросы версией, держит на неё аренду — файл в
+``<версия>/.leases`` (:meth:`ArtifactBundle.acquire_lease`); берёт её первый
+запрос, а не открытие каталога. :class:`ArtifactWriter` не удаляет
+старые версии с арендой живого процесса: реестр, загружающий ресурсы лениво
+или дорабатывающий запросы на старой версии, не потеряет её файлы.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+VERSIONS_DIR = "versions"
+LEASES_DIR = ".leases"
+FORMAT_VERSION = 1
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def bundle_dir(root: str) -> Optional[str]:
+    """Каталог активной версии: по ``CURRENT`` или (старый формат) сам ``root`` с манифестом."""
+    current_path = os.path.join(root, CURRENT_NAME)
+    if os.path.exists(current_path):
+        with open(current_path, encoding="utf-8") as f:
+            return os.path.join(root, VERSIONS_DIR, f.read().strip())
+    if os.path.exists(os.path.join(root, MANIFEST_NAME)):
+        return root
+    return None
+
+
+def active_version(root: str) -> Optional[str]:
+    """Версия, на которую указывает каталог артефактов, или ``None``, если выгрузки нет."""
+    path = bundle_dir(root)
+    if path is None:
+        return None
+    if path != root:
+        return os.path.basename(path)
+    with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f).get("version")
+
+
+def _lease_alive(path: str) -> bool:
+    """Жив ли процесс, взявший аренду; процессы других машин считаются живыми."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            owner = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if owner.get("host") != socket.gethostname():
+        return True
+    try:
+        os.kill(int(owner["pid"]), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def leased(version_dir: str) -> bool:
+    """Есть ли у версии аренда живого процесса; аренды умерших процессов удаляются."""
+    leases_dir = os.path.join(version_dir, LEASES_DIR)
+    if not os.path.isdir(leases_dir):
+        return False
+    alive = False
+    for name in os.listdir(leases_dir):
+        path = os.path.join(leases_dir, name)
+        if _lease_alive(path):
+            alive = True
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return alive
+
+
+class ArtifactWriter:
+    """Пишет массивы и таблицы новой версии и публикует её в :meth:`finish`.
+
+    ``keep`` — сколько последних версий оставлять на диске; более старые
+    удаляются после публикации, если ни один живой процесс не держит на них
+    аренду (см. :func:`leased`).
+    """
+
+    def __init__(self, root: str, version: Optional[str] = None, keep: int = 3):
+        self.root = root
+        self.version = version or datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        self.keep = keep
+        self.out_dir = os.path.join(root, VERSIONS_DIR, self.version)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.metadata: Dict[str, Any] = {}
+        os.makedirs(self.out_dir, exist_ok=False)
+
+    def add_array(self, name: str, array: np.ndarray) -> None:
+        filename = f"{name}.npy"
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(self.out_dir, filename), array, allow_pickle=False)
+        self.files[name] = {
+            "path": filename, "kind": "array",
+            "dtype": array.dtype.str, "shape": list(array.shape),
+            "bytes": int(array.nbytes),
+        }
+
+    def add_frame(self, name: str, frame: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        filename = f"{name}.arrow"
+        path = os.path.join(self.out_dir, filename)
+        table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+        # Один record batch: колонку из одного куска pandas может открыть без копирования.
+        feather.write_feather(table, path, compression="uncompressed", chunksize=max(1, table.num_rows))
+        self.files[name] = {
+            "path": filename, "kind": "frame",
+            "rows": int(table.num_rows), "columns": table.column_names,
+            "bytes": os.path.getsize(path),
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """Записывает манифест, затем атомарно переключает ``CURRENT`` на новую версию."""
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "version": self.version,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "files": self.files,
+            "metadata": self.metadata,
+        }
+        _write_atomic(os.path.join(self.out_dir, MANIFEST_NAME),
+                      json.dumps(manifest, ensure_ascii=False, indent=2))
+        _write_atomic(os.path.join(self.root, CURRENT_NAME), self.version)
+        self._prune()
+        return manifest
+
+    def _prune(self) -> None:
+        versions_root = os.path.join(self.root, VERSIONS_DIR)
+        versions = sorted(name for name in os.listdir(versions_root)
+                          if os.path.exists(os.path.join(versions_root, name, MANIFEST_NAME)))
+        for name in versions[:-self.keep] if self.keep > 0 else []:
+            path = os.path.join(versions_root, name)
+            if name == self.version:
+                continue
+            if leased(path):
+                print(f"[INFO] Версия {name} ещё используется, не удаляется")
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ArtifactBundle:
+    """Открытый для чтения каталог артефактов."""
+
+    def __init__(self, root: str, manifest: Dict[str, Any]):
+        self.root = root
+        self.manifest = manifest
+        self._lease: Optional[str] = None
+        self._lease_pid: Optional[int] = None
+        self._lease_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, root: str) -> "ArtifactBundle":
+        """Открывает активную версию каталога артефактов ``root``."""
+        path = bundle_dir(root)
+        manifest_path = os.path.join(path or root, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Artifact manifest not found: {manifest_path}")
+        root = path
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported artifact format: {manifest.get('format_version')}")
+        return cls(root, manifest)
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.manifest.get("metadata", {})
+
+    @property
+    def created_at(self) -> datetime:
+        """Время публикации версии (UTC): из манифеста или по времени изменения манифеста."""
+        created_at = self.manifest.get("created_at")
+        if created_at:
+            return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc)
+        mtime = os.path.getmtime(os.path.join(self.root, MANIFEST_NAME))
+        return datetime.fromtimestamp(int(mtime), timezone.utc)
+
+    def acquire_lease(self) -> None:
+        """Отмечает версию как используемую процессом, чтобы её не удалил :class:`ArtifactWriter`.
+
+        Повторный вызов в том же процессе ничего не делает; процесс, созданный
+        через fork, берёт собственную аренду.
+        """
+        if self._lease is not None and self._lease_pid == os.getpid():
+            return
+        with self._lease_lock:
+            if self._lease is not None and self._lease_pid == os.getpid():
+                return
+            leases_dir = os.path.join(self.root, LEASES_DIR)
+            path = os.path.join(leases_dir, uuid.uuid4().hex)
+            try:
+                os.makedirs(leases_dir, exist_ok=True)
+                _write_atomic(path, json.dumps({"host": socket.gethostname(), "pid": os.getpid()}))
+            except OSError as e:
+                print(f"[WARN] Не удалось записать аренду версии {self.version}: {e}")
+                return
+            self._lease, self._lease_pid = path, os.getpid()
+
+    def release_lease(self) -> None:
+        # Процесс, унаследовавший объект через fork, не снимает аренду родителя.
+        with self._lease_lock:
+            if self._lease is None or self._lease_pid != os.getpid():
+                return
+            try:
+                os.remove(self._lease)
+            except OSError:
+                pass
+            self._lease = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest["files"]
+
+    def _path(self, name: str, kind: str) -> str:
+        entry = self.manifest["files"].get(name)
+        if entry is None or entry["kind"] != kind:
+            raise KeyError(f"No {kind} artifact named {name!r} in {self.root}")
+        return os.path.join(self.root, entry["path"])
+
+    def array(self, name: str) -> np.ndarray:
+        """Массив только для чтения, отображённый в память."""
+        return np.load(self._path(name, "array"), mmap_mode="r", allow_pickle=False)
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """Таблица из Arrow IPC.
+
+        ``split_blocks=True`` оставляет каждую колонку отдельным блоком, поэтому
+        числовые колонки без пропусков не копируются и ссылаются на страницы
+        отображённого файла. Объектные колонки (строки, списки) копируются в кучу.
+        Выгрузки, записанные несколькими record batch, копируются целиком.
+        """
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = feather.read_table(self._path(name, "frame"), memory_map=True)
+        frame = table.to_pandas(split_blocks=True)
+        # Списки (например, genres) Arrow отдаёт как ndarray, а приложение ждёт list.
+        for field in table.schema:
+            if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+                frame[field.name] = [
+                    value.tolist() if isinstance(value, np.ndarray) else value
+                    for value in frame[field.name]
+                ]
+        return frame
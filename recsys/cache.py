@@ -0,0 +1,171 @@
+"""Кэш готовых списков рекомендаций пользователя.
+
+Ключ записи содержит id пользователя, алгоритм, веса, номер версии
+пользователя и версию артефактов модели. Любое изменение лайков или настроек увеличивает версию
+(:meth:`RecommendationCache.invalidate`), поэтому устаревшие записи больше не
+читаются и вытесняются по LRU/TTL.
+
+Хранилище подключаемое: по умолчанию словарь в памяти процесса, для
+нескольких воркеров — Redis-совместимый сервер (Redis, KeyDB, Valkey).
+"""
+from __future__ import annotations
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+class InProcessBackend:
+    """LRU-словарь с TTL, защищённый блокировкой.
+
+    Счётчики (:meth:`incr`) хранятся отдельно и не вытесняются: потеря версии
+    пользователя могла бы снова сделать видимыми устаревшие записи.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisBackend:
+    """Хранилище в Redis-совместимом сервере; вытеснением управляет сам сервер.
+
+    Значения хранятся сериализованными через ``pickle``, а счётчики — целыми
+    числами ``INCR`` и читаются :meth:`get_counter`. Числа записей нет:
+    ``DBSIZE`` считает всю базу, а обход ключей по префиксу слишком дорог
+    для каждого чтения ``/metrics``.
+    """
+
+    def __init__(self, url: str, prefix: str = "recsys:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(self.prefix + key))
+
+    def get_counter(self, key: str) -> int:
+        raw = self._client.get(self.prefix + key)
+        return 0 if raw is None else int(raw)
+
+
+def make_backend(kind: str = "memory", url: Optional[str] = None, max_entries: int = 10000):
+    if kind == "memory":
+        return InProcessBackend(max_entries=max_entries)
+    if kind == "redis":
+        if not url:
+            raise ValueError("Redis cache backend requires a URL")
+        return RedisBackend(url)
+    raise ValueError(f"Unknown cache backend: {kind!r}")
+
+
+class RecommendationCache:
+    """Кэш итоговых списков рекомендаций с инвалидацией по версии пользователя."""
+
+    def __init__(self, backend, ttl: Optional[float] = 600.0):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"ver:{user_id}"
+
+    def version(self, user_id: int) -> int:
+        return self.backend.get_counter(self._version_key(user_id))
+
+    def key_for(self, user_id: int, algorithm: str, weights: Sequence[float],
+                namespace: Optional[str] = None) -> str:
+        """Ключ записи для текущей версии пользователя.
+
+        Ключ берётся до расчёта рекомендаций: если лайки изменятся во время
+        расчёта, результат сохранится под старой версией и не будет прочитан.
+        ``namespace`` — версия артефактов, чтобы после их замены не отдавать
+        списки, посчитанные старой моделью.
+        """
+        weights_part = ",".join(str(w) for w in weights)
+        return f"recs:{user_id}:{self.version(user_id)}:{namespace or ''}:{algorithm}:{weights_part}"
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        self.backend.incr(self._version_key(user_id))
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend) if hasattr(self.backend, "__len__") else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,74 @@
+"""Индексы O(1) поверх каталога фильмов.
+
+Строятся один раз при загрузке и позволяют получать строки ``movies_df`` по
+``tmdb_id``, ``movieId_ml``, названию или позиции в content-based матрице
+без слияний и булевых масок по всему каталогу.
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _first_occurrence_index(keys: pd.Series) -> pd.Series:
+    """Отображение ключ -> позиция первой строки с этим ключом (пропуски отбрасываются)."""
+    present = keys.notna().to_numpy()
+    rows = pd.Series(np.flatnonzero(present), index=keys[present].to_numpy())
+    return rows[~rows.index.duplicated()]
+
+
+class CatalogIndex:
+    """Позиционные индексы каталога ``movies_df``.
+
+    ``cb_rows[i]`` — строка каталога для фильма с индексом ``i`` в
+    content-based данных (или ``-1``, если фильма нет в каталоге).
+    """
+
+    def __init__(self, movies: pd.DataFrame, movies_cb: pd.DataFrame, cb_indices: pd.Series):
+        self.n_rows = len(movies)
+        self.tmdb_ids = movies["tmdb_id"].to_numpy(dtype=np.float64, na_value=np.nan)
+        self.titles = movies["title"].to_numpy(dtype=object)
+
+        row_by_tmdb = _first_occurrence_index(movies["tmdb_id"])
+        self._tmdb_index = pd.Index(row_by_tmdb.index.astype(np.int64))
+        self._tmdb_rows = row_by_tmdb.to_numpy(dtype=np.int64)
+        self.row_by_tmdb_id = dict(zip(self._tmdb_index.tolist(), self._tmdb_rows.tolist()))
+
+        if "movieId_ml" in movies.columns:
+            row_by_ml = _first_occurrence_index(movies["movieId_ml"])
+        else:
+            row_by_ml = pd.Series([], dtype=np.int64)
+        self._ml_index = pd.Index(row_by_ml.index.astype(np.int64))
+        self._ml_rows = row_by_ml.to_numpy(dtype=np.int64)
+
+        self.cb_index_by_title = {title: int(idx) for title, idx in cb_indices.items()}
+        cb_tmdb_ids = pd.to_numeric(movies_cb["tmdb_id"], errors="coerce")
+        self.cb_tmdb_ids = cb_tmdb_ids.to_numpy(dtype=np.float64, na_value=np.nan)
+        self.cb_rows = self.rows_for_tmdb_ids(cb_tmdb_ids.fillna(-1).astype(np.int64).to_numpy())
+        cb_by_row = pd.Series(np.arange(self.cb_rows.size), index=self.cb_rows)
+        cb_by_row = cb_by_row[(cb_by_row.index >= 0) & ~cb_by_row.index.duplicated()]
+        self.row_to_cb = np.full(self.n_rows, -1, dtype=np.int64)
+        self.row_to_cb[cb_by_row.index.to_numpy()] = cb_by_row.to_numpy()
+
+    @staticmethod
+    def _lookup(index: pd.Index, rows: np.ndarray, keys: Sequence[int]) -> np.ndarray:
+        positions = index.get_indexer(np.asarray(keys, dtype=np.int64))
+        if rows.size == 0:
+            return np.full(positions.size, -1, dtype=np.int64)
+        return np.where(positions >= 0, rows[positions], -1)
+
+    def rows_for_tmdb_ids(self, tmdb_ids: Sequence[int]) -> np.ndarray:
+        """Строки каталога для ``tmdb_id`` (``-1`` — нет в каталоге)."""
+        return self._lookup(self._tmdb_index, self._tmdb_rows, tmdb_ids)
+
+    def rows_for_ml_ids(self, ml_ids: Sequence[int]) -> np.ndarray:
+        """Строки каталога для ``movieId_ml`` (``-1`` — нет в каталоге)."""
+        return self._lookup(self._ml_index, self._ml_rows, ml_ids)
+
+    def row_for_tmdb_id(self, tmdb_id: int) -> Optional[int]:
+        return self.row_by_tmdb_id.get(int(tmdb_id))
+
+    def cb_index_for_title(self, title: str) -> Optional[int]:
+        return self.cb_index_by_title.get(title)
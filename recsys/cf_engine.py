@@ -0,0 +1,168 @@
+"""Векторизованный скоринг коллаборативной SVD-модели.
+
+Факторы обученной модели ``surprise.SVD`` один раз выгружаются в непрерывные
+NumPy-массивы, после чего оценки всех фильмов для пользователя считаются
+одним матрично-векторным произведением вместо цикла по ``predict``.
+"""
+from __future__ import annotations
+
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recsys.topn import top_n_indices
+
+
+class SVDScorer:
+    """Оценки SVD для всех фильмов сразу.
+
+    Формула совпадает с ``surprise.SVD.predict`` для смещённой модели:
+    ``mu + bu[u] + bi[i] + qi[i] · pu[u]`` с обрезкой до шкалы рейтингов.
+    Для неизвестного пользователя остаётся ``mu + bi[i]``.
+    """
+
+    def __init__(self, pu: np.ndarray, qi: np.ndarray, bu: np.ndarray, bi: np.ndarray,
+                 global_mean: float, user_ids: Sequence[Hashable], item_ids: Sequence[int],
+                 rating_scale: Tuple[float, float] = (0.5, 5.0)):
+        self.pu = np.ascontiguousarray(pu, dtype=np.float64)
+        self.qi = np.ascontiguousarray(qi, dtype=np.float64)
+        self.bu = np.ascontiguousarray(bu, dtype=np.float64)
+        self.bi = np.ascontiguousarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.rating_scale = (float(rating_scale[0]), float(rating_scale[1]))
+
+        self.user_index: Dict[Hashable, int] = {uid: pos for pos, uid in enumerate(user_ids)}
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self._sorted_item_pos = np.argsort(self.item_ids, kind="stable")
+        self._sorted_item_ids = self.item_ids[self._sorted_item_pos]
+        # Слагаемые, не зависящие от пользователя, считаем один раз.
+        self._item_base = self.global_mean + self.bi
+
+    @classmethod
+    def from_surprise(cls, model) -> "SVDScorer":
+        """Извлекает факторы и словари идентификаторов из обученной ``surprise.SVD``."""
+        trainset = model.trainset
+        user_ids = [trainset.to_raw_uid(inner) for inner in range(trainset.n_users)]
+        item_ids = [int(trainset.to_raw_iid(inner)) for inner in range(trainset.n_items)]
+        lower, upper = trainset.rating_scale
+        return cls(
+            pu=model.pu, qi=model.qi, bu=model.bu, bi=model.bi,
+            global_mean=trainset.global_mean,
+            user_ids=user_ids, item_ids=item_ids,
+            rating_scale=(lower, upper),
+        )
+
+    def save_to(self, writer, prefix: str = "svd") -> None:
+        """Сохраняет факторы в каталог артефактов (см. ``recsys.artifacts``)."""
+        writer.add_array(f"{prefix}_pu", self.pu)
+        writer.add_array(f"{prefix}_qi", self.qi)
+        writer.add_array(f"{prefix}_bu", self.bu)
+        writer.add_array(f"{prefix}_bi", self.bi)
+        writer.add_array(f"{prefix}_user_ids", np.asarray(list(self.user_index), dtype=np.int64))
+        writer.add_array(f"{prefix}_item_ids", self.item_ids)
+        writer.metadata[prefix] = {
+            "global_mean": self.global_mean,
+            "rating_scale": list(self.rating_scale),
+        }
+
+    @classmethod
+    def from_bundle(cls, bundle, prefix: str = "svd") -> "SVDScorer":
+        """Открывает факторы из каталога артефактов без копирования массивов."""
+        meta = bundle.metadata[prefix]
+        return cls(
+            pu=bundle.array(f"{prefix}_pu"), qi=bundle.array(f"{prefix}_qi"),
+            bu=bundle.array(f"{prefix}_bu"), bi=bundle.array(f"{prefix}_bi"),
+            global_mean=meta["global_mean"],
+            user_ids=bundle.array(f"{prefix}_user_ids").tolist(),
+            item_ids=bundle.array(f"{prefix}_item_ids"),
+            rating_scale=tuple(meta["rating_scale"]),
+        )
+
+    @property
+    def n_items(self) -> int:
+        return self.item_ids.size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.pu, self.qi, self.bu, self.bi, self.item_ids))
+
+    def item_positions(self, item_ids: Sequence[int]) -> np.ndarray:
+        """Позиции фильмов (``movieId_ml``) в массивах модели; неизвестные отбрасываются."""
+        ids = np.asarray(item_ids, dtype=np.int64)
+        if ids.size == 0:
+            return np.empty(0, dtype=np.int64)
+        found = np.searchsorted(self._sorted_item_ids, ids)
+        found = np.minimum(found, self._sorted_item_ids.size - 1)
+        hit = self._sorted_item_ids[found] == ids
+        return self._sorted_item_pos[found[hit]]
+
+    def factors_for(self, user_id: Hashable,
+                    user_factors: Optional[Tuple[np.ndarray, float]] = None) -> Optional[Tuple[np.ndarray, float]]:
+        """``(pu, bu)`` пользователя: явно переданные, из обучающей выборки или ``None``."""
+        if user_factors is not None:
+            return user_factors
+        u = self.user_index.get(user_id)
+        return None if u is None else (self.pu[u], self.bu[u])
+
+    def item_vectors(self) -> np.ndarray:
+        """Векторы ``[qi, bi]``: их скалярное произведение с :meth:`query_vector` упорядочивает фильмы как прогноз."""
+        return np.hstack([self.qi, self.bi[:, None]])
+
+    def query_vector(self, user_id: Hashable,
+                     user_factors: Optional[Tuple[np.ndarray, float]] = None) -> np.ndarray:
+        factors = self.factors_for(user_id, user_factors)
+        pu = factors[0] if factors is not None else np.zeros(self.qi.shape[1])
+        return np.append(pu, 1.0)
+
+    def user_scores(self, user_id: Hashable,
+                    user_factors: Optional[Tuple[np.ndarray, float]] = None,
+                    positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Прогноз рейтинга пользователя для каждого фильма модели.
+
+        ``user_factors`` — пара ``(pu, bu)`` пользователя, которого нет в
+        обучающей выборке (см. ``recsys.foldin``); тогда ``user_id`` не используется.
+        ``positions`` — считать только эти фильмы (кандидаты ANN), остальные ``-inf``.
+        """
+        factors = self.factors_for(user_id, user_factors)
+        qi, item_base = self.qi, self._item_base
+        if positions is not None:
+            qi, item_base = qi[positions], item_base[positions]
+        if factors is None:
+            scores = item_base.copy()
+        else:
+            pu, bu = factors
+            scores = qi @ pu
+            scores += item_base
+            scores += bu
+        np.clip(scores, self.rating_scale[0], self.rating_scale[1], out=scores)
+        if positions is None:
+            return scores
+        full = np.full(self.n_items, -np.inf)
+        full[positions] = scores
+        return full
+
+    def masked_scores(self, user_id: Hashable, exclude: Optional[np.ndarray] = None,
+                      candidates: Optional[np.ndarray] = None,
+                      user_factors: Optional[Tuple[np.ndarray, float]] = None,
+                      positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Оценки всех фильмов, где исключённые и недопустимые фильмы равны ``-inf``.
+
+        ``exclude`` — позиции уже оценённых фильмов, ``candidates`` — булева
+        маска допустимых фильмов (например, только с метаданными).
+        """
+        scores = self.user_scores(user_id, user_factors, positions)
+        if candidates is not None:
+            scores[~candidates] = -np.inf
+        if exclude is not None and len(exclude):
+            scores[exclude] = -np.inf
+        return scores
+
+    def recommend(self, user_id: Hashable, top_n: int = 10,
+                  exclude: Optional[np.ndarray] = None,
+                  candidates: Optional[np.ndarray] = None,
+                  user_factors: Optional[Tuple[np.ndarray, float]] = None,
+                  positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Возвращает позиции и оценки ``top_n`` лучших фильмов (см. :meth:`masked_scores`)."""
+        scores = self.masked_scores(user_id, exclude, candidates, user_factors, positions)
+        top = top_n_indices(scores, top_n)
+        return top, scores[top]
@@ -0,0 +1,114 @@
+"""Настройка подключения к БД приложения и запросы, зависящие от диалекта.
+
+* :func:`engine_options` — параметры ``create_engine`` для
+  ``SQLALCHEMY_ENGINE_OPTIONS``: пул соединений (размер, переполнение,
+  пересоздание старых соединений, проверка перед выдачей) и время ожидания
+  блокировки SQLite.
+* :func:`configure_sqlite` — PRAGMA для каждого нового соединения SQLite:
+  WAL (чтение не ждёт записи), ``synchronous=NORMAL`` и ``busy_timeout``,
+  чтобы конкурентная запись ждала блокировку, а не падала с
+  ``database is locked``.
+* :func:`upsert` — атомарная вставка-или-обновление
+  (``INSERT ... ON CONFLICT DO UPDATE``) для SQLite и PostgreSQL.
+  Ему нужен уникальный индекс по ключу; :func:`ensure_unique_key` создаёт
+  его в базах, где таблица появилась раньше ограничения
+  (``flask --app app migrate-db``).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
+from sqlalchemy import Index, event, func, inspect, select
+from sqlalchemy.engine import Engine, make_url
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str, pool_size: int = 10, max_overflow: int = 20, pool_recycle: int = 1800,
+                   busy_timeout: float = 30.0) -> Dict[str, Any]:
+    if is_sqlite(url):
+        if make_url(url).database in (None, "", ":memory:"):
+            # Для базы в памяти Flask-SQLAlchemy сам выбирает StaticPool.
+            return {}
+        return {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "connect_args": {"timeout": busy_timeout, "check_same_thread": False},
+        }
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+
+def configure_sqlite(engine: Engine, busy_timeout: float = 30.0, wal: bool = True) -> None:
+    """Включает PRAGMA для соединений ``engine``; для других СУБД ничего не делает."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        cursor.close()
+
+
+def has_unique_key(engine: Engine, table_name: str, columns: Sequence[str]) -> bool:
+    """Есть ли в таблице уникальное ограничение или уникальный индекс ровно по ``columns``."""
+    inspector = inspect(engine)
+    existing = [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+    existing += [index["column_names"] for index in inspector.get_indexes(table_name) if index.get("unique")]
+    return list(columns) in existing
+
+
+def ensure_unique_key(engine: Engine, table, columns: Sequence[str], index_name: str) -> None:
+    """Создаёт уникальный индекс по ``columns``, если его нет ни в ограничениях, ни в индексах.
+
+    Перед созданием удаляются повторы ключа (остаётся строка с наибольшим
+    ``id``), поэтому вызывается явной миграцией, а не при импорте приложения.
+    """
+    wanted = list(columns)
+    if has_unique_key(engine, table.name, wanted):
+        return
+
+    keep = select(func.max(table.c.id)).group_by(*(table.c[column] for column in wanted))
+    with engine.begin() as connection:
+        removed = connection.execute(table.delete().where(table.c.id.not_in(keep))).rowcount
+        if removed:
+            print(f"[WARN] Удалено {removed} повторяющихся строк {table.name} перед созданием {index_name}")
+        Index(index_name, *(table.c[column] for column in wanted), unique=True).create(connection)
+
+
+def upsert(table, rows: Sequence[Mapping[str, Any]], index_elements: Iterable[str],
+           update_columns: Iterable[str], dialect: str):
+    """``INSERT ... ON CONFLICT (index_elements) DO UPDATE SET update_columns`` для ``rows``.
+
+    Строки ``rows`` не должны повторять ключ ``index_elements``: PostgreSQL
+    не обновляет одну строку дважды за запрос.
+    """
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert is not supported for dialect {dialect!r}")
+    statement = insert(table).values(list(rows))
+    return statement.on_conflict_do_update(
+        index_elements=list(index_elements),
+        set_={column: statement.excluded[column] for column in update_columns},
+    )
+
+
+def dedupe_last(rows: Iterable[Mapping[str, Any]], key: Sequence[str]) -> List[Mapping[str, Any]]:
+    """Оставляет для каждого ключа последнюю строку (порядок первых появлений сохраняется)."""
+    latest: Dict[tuple, Mapping[str, Any]] = {}
+    for row in rows:
+        latest[tuple(row[column] for column in key)] = row
+    return list(latest.values())
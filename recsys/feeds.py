@@ -0,0 +1,79 @@
+"""Неизменяемые подборки фильмов («Популярное», «Новинки»).
+
+Порядок подборки вычисляется один раз при загрузке артефактов и хранится
+как массив позиций в таблице фрагментов. Страницы (offset/limit) и фильтр по
+жанру берутся срезами заранее отсортированных массивов, а сами ответы
+собираются из готовых JSON-фрагментов и кэшируются вместе с ETag.
+
+Валидаторы зависят только от содержимого: ETag — хэш тела страницы,
+``Last-Modified`` — время создания выгрузки артефактов. Одинаковые подборки
+получают одинаковые валидаторы после перезапуска, горячей замены версии и
+на разных машинах, поэтому условные запросы и CDN не теряют кэш после выкладки.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recsys.serialization import MovieFragments
+
+
+def _genre_names(value) -> Iterable[str]:
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(genre) for genre in value]
+    if isinstance(value, str) and value:
+        return [genre.strip() for genre in value.split(',')]
+    return []
+
+
+class Feed:
+    """Заранее отсортированная подборка с постраничной выдачей."""
+
+    MAX_PAGE_CACHE = 256
+
+    def __init__(self, name: str, rows: np.ndarray, fragments: MovieFragments,
+                 genres: Sequence, default_limit: Optional[int] = None,
+                 last_modified: Optional[datetime] = None):
+        self.name = name
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.fragments = fragments
+        self.default_limit = default_limit if default_limit is not None else self.rows.size
+        self.last_modified = last_modified
+
+        by_genre: Dict[str, list] = {}
+        for row in self.rows.tolist():
+            for genre in _genre_names(genres[row]):
+                by_genre.setdefault(genre.lower(), []).append(row)
+        self.genre_rows = {genre: np.asarray(rows, dtype=np.int64) for genre, rows in by_genre.items()}
+
+        self._pages: Dict[Tuple[int, int, str], Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + sum(rows.nbytes for rows in self.genre_rows.values())
+
+    def select(self, offset: int = 0, limit: Optional[int] = None, genre: Optional[str] = None) -> np.ndarray:
+        rows = self.rows if not genre else self.genre_rows.get(genre.lower(), self.rows[:0])
+        limit = self.default_limit if limit is None else limit
+        offset = max(offset, 0)
+        return rows[offset:offset + max(limit, 0)]
+
+    def page(self, offset: int = 0, limit: Optional[int] = None,
+             genre: Optional[str] = None) -> Tuple[bytes, str]:
+        """JSON-массив страницы и её ETag; результат запоминается."""
+        key = (max(offset, 0), self.default_limit if limit is None else limit, (genre or '').lower())
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        payload = self.fragments.array(self.select(*key))
+        etag = hashlib.sha1(payload).hexdigest()
+        with self._lock:
+            if len(self._pages) >= self.MAX_PAGE_CACHE:
+                self._pages.clear()
+            self._pages[key] = (payload, etag)
+        return payload, etag
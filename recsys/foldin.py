@@ -0,0 +1,139 @@
+"""Дообучение SVD на лайках пользователей приложения (fold-in).
+
+Пользователи сайта не входят в обучающую выборку MovieLens, поэтому их
+вектор ``(pu, bu)`` находится отдельно: гребневой регрессией по лайкам при
+фиксированных ``qi`` и ``bi`` обученной модели. Для каждого пользователя
+хранятся нормальные уравнения ``A = λI + Σ x xᵀ`` и ``b = Σ x (r - mu - bi)``
+с ``x = [qi, 1]``, так что лайк или его отмена — это обновление ранга 1 и
+решение системы размера ``k + 1``. Состояние помнит текущие оценки
+пользователя, поэтому для обновления достаточно новой оценки: прежнюю не
+нужно читать из БД.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recsys.cf_engine import SVDScorer
+
+
+class _FoldInState:
+    __slots__ = ("a", "b", "values", "factors")
+
+    def __init__(self, a: np.ndarray, b: np.ndarray, values: Dict[int, int]):
+        self.a = a
+        self.b = b
+        # Позиция фильма в модели -> учтённая оценка (1 / -1).
+        self.values = values
+        self.factors: Optional[Tuple[np.ndarray, float]] = None
+
+    def solve(self) -> Tuple[np.ndarray, float]:
+        solution = np.linalg.solve(self.a, self.b)
+        self.factors = (solution[:-1], float(solution[-1]))
+        return self.factors
+
+
+class UserFoldIn:
+    """Векторы пользователей приложения в пространстве факторов ``SVDScorer``.
+
+    Лайк (``value = 1``) считается верхней оценкой шкалы, дизлайк (``-1``) —
+    нижней. Состояния хранятся в LRU на ``max_users`` пользователей; вытесненное
+    состояние заново строится из таблицы ``Like`` при следующем запросе.
+    """
+
+    def __init__(self, scorer: SVDScorer, reg: float = 0.1, max_users: int = 10000,
+                 like_ratings: Optional[Dict[int, float]] = None):
+        self.scorer = scorer
+        self.reg = reg
+        self.max_users = max_users
+        lower, upper = scorer.rating_scale
+        self.like_ratings = like_ratings or {1: upper, -1: lower}
+        self._states: "OrderedDict[int, _FoldInState]" = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _design(self, positions: np.ndarray) -> np.ndarray:
+        features = np.ones((positions.size, self.scorer.qi.shape[1] + 1))
+        features[:, :-1] = self.scorer.qi[positions]
+        return features
+
+    def _residuals(self, positions: np.ndarray, values: Sequence[int]) -> np.ndarray:
+        ratings = np.array([self.like_ratings[int(value)] for value in values], dtype=np.float64)
+        return ratings - self.scorer.global_mean - self.scorer.bi[positions]
+
+    def generation(self, user_id: int) -> int:
+        """Номер изменения лайков пользователя; берётся до чтения лайков из БД."""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def factors(self, user_id: int, values: Optional[Dict[int, int]] = None) -> Optional[Tuple[np.ndarray, float]]:
+        """Кэшированный вектор пользователя или ``None``, если его нужно построить.
+
+        ``values`` — текущие оценки пользователя (позиция -> оценка): если
+        состояние учитывает другие, оно устарело (лайк обработал другой
+        процесс) и вектор нужно построить заново.
+        """
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is None or (values is not None and state.values != values):
+                return None
+            self._states.move_to_end(user_id)
+            return state.factors
+
+    def build(self, user_id: int, positions: np.ndarray, values: Sequence[int],
+              generation: int) -> Tuple[np.ndarray, float]:
+        """Решает задачу по всем лайкам пользователя.
+
+        Результат сохраняется, только если лайки не менялись с момента
+        ``generation``: иначе в кэш попало бы состояние без последнего лайка.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        features = self._design(positions)
+        a = features.T @ features
+        a[np.diag_indices_from(a)] += self.reg
+        state = _FoldInState(a, features.T @ self._residuals(positions, values),
+                             {int(position): int(value) for position, value in zip(positions, values)})
+        factors = state.solve()
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._states[user_id] = state
+                self._states.move_to_end(user_id)
+                while len(self._states) > self.max_users:
+                    self._states.popitem(last=False)
+        return factors
+
+    def update(self, user_id: int, position: Optional[int], new_value: Optional[int]) -> None:
+        """Учитывает новую оценку фильма: ``None`` — оценка удалена.
+
+        ``position`` — позиция фильма в модели или ``None``, если фильма в ней нет.
+        """
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            state = self._states.get(user_id)
+            if state is None or position is None:
+                return
+            old_value = state.values.get(position)
+            if old_value == new_value:
+                return
+            if new_value is None:
+                del state.values[position]
+            else:
+                state.values[position] = new_value
+            positions = np.array([position], dtype=np.int64)
+            x = self._design(positions)[0]
+            for value, sign in ((old_value, -1.0), (new_value, 1.0)):
+                if value is None:
+                    continue
+                state.a += sign * np.outer(x, x)
+                state.b += sign * x * self._residuals(positions, [value])[0]
+            state.solve()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(state.a.nbytes + state.b.nbytes for state in list(self._states.values()))
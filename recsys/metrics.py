@@ -0,0 +1,523 @@
+"""Метрики запросов: этапы (spans), гистограммы и выборочное профилирование.
+
+* :class:`MetricsRegistry` хранит счётчики, гистограммы и вычисляемые
+  gauge-метрики и отдаёт их в текстовом формате Prometheus
+  (``/metrics``); сторонние пакеты не нужны. Под prefork-сервером
+  :class:`MultiprocessMetrics` объединяет метрики всех процессов.
+* :class:`Tracer` ведёт трассу текущего запроса (``contextvars``):
+  :meth:`Tracer.span` замеряет этап, к этапу можно приписать число
+  результатов. При завершении запроса этапы попадают в гистограммы
+  ``recsys_span_seconds`` и ``recsys_span_results`` с метками этапа и
+  алгоритма запроса, а их длительности — в заголовок ``Server-Timing``.
+  Этап вне запроса записывается в гистограммы сразу.
+* :class:`SamplingProfiler` профилирует каждый N-й запрос (cProfile или
+  pyinstrument) и хранит на диске профили ``keep`` самых медленных из них.
+"""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import json
+import math
+import numbers
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    kind = ""
+    # Значения разных процессов не складываются, а выводятся с меткой ``pid``.
+    per_process = False
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Mapping[str, Any]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def state(self) -> List[list]:
+        """Текущие значения ``[[метки, значение], ...]`` (сериализуются в JSON)."""
+        raise NotImplementedError
+
+    def _combine(self, left: Any, right: Any) -> Any:
+        return left + right
+
+    def merge(self, states: Iterable[List[list]]) -> List[Tuple[Labels, Any]]:
+        """Сумма значений нескольких :meth:`state` (например, разных процессов) по меткам."""
+        merged: Dict[Labels, Any] = {}
+        for state in states:
+            for labels, value in state:
+                key = tuple(labels)
+                merged[key] = self._combine(merged[key], value) if key in merged else value
+        return sorted(merged.items())
+
+    def format(self, items: Sequence[Tuple[Labels, Any]], labelnames: Optional[Sequence[str]] = None) -> List[str]:
+        names = self.labelnames if labelnames is None else tuple(labelnames)
+        return [f"{self.name}{_label_text(names, key)} {_format_value(value)}" for key, value in items]
+
+    def samples(self) -> List[str]:
+        return self.format(self.merge([self.state()]))
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def state(self) -> List[list]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> (счётчики по корзинам, сумма, число наблюдений).
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def state(self) -> List[list]:
+        with self._lock:
+            return [[list(key), [list(series[0]), series[1], series[2]]] for key, series in self._series.items()]
+
+    def _combine(self, left: Any, right: Any) -> Any:
+        return [[a + b for a, b in zip(left[0], right[0])], left[1] + right[1], left[2] + right[2]]
+
+    def format(self, items: Sequence[Tuple[Labels, Any]], labelnames: Optional[Sequence[str]] = None) -> List[str]:
+        names = self.labelnames if labelnames is None else tuple(labelnames)
+        lines = []
+        bucket_names = names + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(bucket_names, key + (_format_value(bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(bucket_names, key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_label_text(names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_text(names, key)} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Значения вычисляются при каждом чтении ``/metrics`` функцией ``callback``.
+
+    ``callback`` возвращает число (метрика без меток) или пары ``(метки, значение)``.
+    ``kind="counter"`` — для монотонных счётчиков, которые ведёт другой объект
+    (например, попадания в кэш); между процессами они складываются, а
+    обычные gauge-метрики выводятся для каждого процесса отдельно.
+    """
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], Any], labelnames: Sequence[str] = (),
+                 kind: str = "gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+        self.kind = kind
+        self.per_process = kind == "gauge"
+
+    def state(self) -> List[list]:
+        try:
+            result = self.callback()
+        except Exception as e:
+            print(f"[WARN] Metric {self.name} failed: {type(e).__name__}: {e}")
+            return []
+        if result is None:
+            return []
+        if isinstance(result, numbers.Real):
+            result = [({}, result)]
+        return [[list(self._key(labels)), float(value)] for labels, value in result if value is not None]
+
+
+class MetricsRegistry:
+    """Набор метрик процесса и их вывод в текстовом формате Prometheus."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name!r} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], Any], labelnames: Sequence[str] = (),
+              kind: str = "gauge") -> Gauge:
+        return self._add(Gauge(name, help_text, callback, labelnames, kind))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Значения всех метрик процесса для :class:`MultiprocessMetrics`."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {"pid": os.getpid(), "metrics": {metric.name: metric.state() for metric in metrics}}
+
+    def render(self, snapshots: Optional[Sequence[Mapping[str, Any]]] = None) -> str:
+        """Метрики процесса, а с ``snapshots`` — вместе со снимками других процессов.
+
+        Счётчики и гистограммы снимков складываются с текущими; per-process
+        gauge-метрики получают метку ``pid`` и берутся только из снимков с ``alive``.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            if snapshots is None:
+                lines.extend(metric.samples())
+            elif metric.per_process:
+                items = [(tuple(labels) + (str(os.getpid()),), value) for labels, value in metric.state()]
+                for snapshot in snapshots:
+                    if snapshot.get("alive", True):
+                        items += [(tuple(labels) + (str(snapshot["pid"]),), value)
+                                  for labels, value in snapshot["metrics"].get(metric.name, [])]
+                lines.extend(metric.format(sorted(items), metric.labelnames + ("pid",)))
+            else:
+                states = [metric.state()] + [snapshot["metrics"].get(metric.name, []) for snapshot in snapshots]
+                lines.extend(metric.format(metric.merge(states)))
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiprocessMetrics:
+    """Общие ``/metrics`` для всех процессов prefork-сервера (``serve.py``).
+
+    Каждый процесс раз в ``interval`` секунд (и при :meth:`write`) сохраняет
+    снимок своего реестра в ``<directory>/metrics-<pid>-<id>.json``. Любой
+    процесс отвечает на ``/metrics`` суммой своих значений и снимков
+    остальных, включая завершившиеся процессы, поэтому счётчики не убывают
+    при перезапуске процесса и не зависят от того, какой процесс ответил.
+    Снимки других процессов отстают не больше чем на ``interval``.
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: str, interval: float = 1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid: Optional[int] = None
+        self._name: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Запускает периодическую запись снимков в текущем процессе (после ``fork`` — заново)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._name = f"metrics-{self._pid}-{uuid.uuid4().hex[:8]}.json"
+            os.makedirs(self.directory, exist_ok=True)
+
+            def run():
+                while True:
+                    time.sleep(self.interval)
+                    self.write()
+
+            threading.Thread(target=run, name="metrics-writer", daemon=True).start()
+
+    def write(self) -> None:
+        if self._pid != os.getpid():
+            return
+        path = os.path.join(self.directory, self._name)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(path + ".tmp", path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[WARN] Не удалось записать метрики процесса: {e}")
+
+    def snapshots(self) -> List[Dict[str, Any]]:
+        """Снимки остальных процессов; ``alive`` — жив ли процесс."""
+        result = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return result
+        for name in names:
+            if not (name.startswith("metrics-") and name.endswith(".json")) or name == self._name:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshot["alive"] = _pid_alive(int(snapshot["pid"]))
+            result.append(snapshot)
+        return result
+
+    def render(self) -> str:
+        return self.registry.render(self.snapshots())
+
+
+# ---------------------------------------------------------------------------
+# Трассы запросов
+# ---------------------------------------------------------------------------
+
+class Span:
+    __slots__ = ("name", "seconds", "count", "tags")
+
+    def __init__(self, name: str, tags: Dict[str, Any]):
+        self.name = name
+        self.seconds = 0.0
+        # Число результатов этапа (фильмов, строк), если имеет смысл.
+        self.count: Optional[int] = tags.pop("count", None)
+        self.tags = tags
+
+
+class RequestTrace:
+    """Этапы одного запроса; ``tags`` (например, ``algorithm``) относятся ко всем этапам."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+        self.tags: Dict[str, Any] = {}
+
+    def timings(self) -> Dict[str, float]:
+        """Суммарная длительность этапов по именам, мс (для ``Server-Timing``)."""
+        result: Dict[str, float] = {}
+        for span in self.spans:
+            result[span.name] = result.get(span.name, 0.0) + 1000 * span.seconds
+        return result
+
+
+class Tracer:
+    """Этапы запросов и их запись в гистограммы ``registry``."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.requests = registry.histogram(
+            "recsys_request_seconds", "HTTP request latency", ("endpoint", "method", "status"))
+        self.span_seconds = registry.histogram(
+            "recsys_span_seconds", "Duration of a request stage", ("span", "algorithm"))
+        self.span_results = registry.histogram(
+            "recsys_span_results", "Number of results produced by a request stage", ("span", "algorithm"),
+            buckets=COUNT_BUCKETS)
+        self._current: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+
+    @property
+    def current(self) -> Optional[RequestTrace]:
+        return self._current.get()
+
+    def start(self, endpoint: str):
+        """Начинает трассу запроса; возвращает токен для :meth:`finish`."""
+        trace = RequestTrace(endpoint)
+        return trace, self._current.set(trace)
+
+    def tag(self, **tags) -> None:
+        trace = self.current
+        if trace is not None:
+            trace.tags.update(tags)
+
+    def _observe(self, span: Span, algorithm: Any) -> None:
+        algorithm = span.tags.get("algorithm", algorithm) or ""
+        self.span_seconds.observe(span.seconds, span=span.name, algorithm=algorithm)
+        if span.count is not None:
+            self.span_results.observe(span.count, span=span.name, algorithm=algorithm)
+
+    def _add(self, span: Span) -> None:
+        trace = self.current
+        if trace is None:
+            self._observe(span, None)
+        else:
+            trace.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, **tags) -> Iterator[Span]:
+        """Замеряет этап; внутри блока можно выставить ``span.count``."""
+        span = Span(name, tags)
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = time.perf_counter() - started
+            self._add(span)
+
+    def record(self, name: str, seconds: float, **tags) -> None:
+        """Этап, длительность которого уже измерена (например, из ``CandidatePipeline.run``)."""
+        span = Span(name, tags)
+        span.seconds = seconds
+        self._add(span)
+
+    def finish(self, token, method: str, status: int) -> RequestTrace:
+        """Завершает трассу: длительность запроса и его этапы записываются в гистограммы."""
+        trace, context_token = token
+        try:
+            self._current.reset(context_token)
+        except ValueError:  # токен из другого контекста
+            self._current.set(None)
+        seconds = time.perf_counter() - trace.started
+        self.requests.observe(seconds, endpoint=trace.endpoint, method=method, status=status)
+        algorithm = trace.tags.get("algorithm")
+        for span in trace.spans:
+            self._observe(span, algorithm)
+        trace.tags["seconds"] = seconds
+        return trace
+
+
+# ---------------------------------------------------------------------------
+# Профилирование
+# ---------------------------------------------------------------------------
+
+class SamplingProfiler:
+    """Профилирует каждый ``every``-й запрос и хранит профили ``keep`` самых медленных.
+
+    ``engine`` — ``"cprofile"`` (файлы ``.prof`` для ``pstats``/snakeviz) или
+    ``"pyinstrument"`` (отчёты ``.html``). При ``every <= 0`` ничего не делает.
+    """
+
+    def __init__(self, every: int, directory: str, keep: int = 20, engine: str = "cprofile"):
+        self.every = every
+        self.directory = directory
+        self.keep = keep
+        self.engine = engine
+        if every > 0 and engine == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                print("[WARN] pyinstrument не установлен, профилирование через cProfile")
+                self.engine = "cprofile"
+        self._counter = itertools.count(1)
+        self._slowest: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.every > 0
+
+    def start(self):
+        """Запускает профилировщик, если запрос попал в выборку; иначе ``None``."""
+        if not self.enabled or next(self._counter) % self.every:
+            return None
+        if self.engine == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+            return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # в потоке уже работает другой профилировщик
+            return None
+        return profiler
+
+    def stop(self, profiler, seconds: float, label: str) -> Optional[str]:
+        """Останавливает профилировщик; сохраняет профиль, если запрос среди ``keep`` самых медленных."""
+        if profiler is None:
+            return None
+        if self.engine == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return None
+            safe_label = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label).strip("_") or "root"
+            extension = "html" if self.engine == "pyinstrument" else "prof"
+            path = os.path.join(self.directory, f"{1000 * seconds:09.1f}ms_{safe_label}_{time.time_ns()}.{extension}")
+            heapq.heappush(self._slowest, (seconds, path))
+            evicted = heapq.heappop(self._slowest)[1] if len(self._slowest) > self.keep else None
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self.engine == "pyinstrument":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.dump_stats(path)
+        if evicted and os.path.exists(evicted):
+            os.remove(evicted)
+        return path
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"ms": round(1000 * seconds, 1), "path": path} for seconds, path in sorted(self._slowest, reverse=True)]
+
+
+def labelled(values: Mapping[str, Any], label: str) -> Iterable[Tuple[Dict[str, Any], Any]]:
+    """``{"a": 1, "b": 2}`` -> пары ``({label: "a"}, 1)`` для :class:`Gauge`."""
+    return [({label: key}, value) for key, value in values.items()]
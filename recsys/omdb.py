@@ -0,0 +1,228 @@
+"""Поиск постеров через OMDb API с кэшем в памяти и на диске.
+
+Результат запроса по IMDb ID хранится в двух уровнях:
+
+* LRU в памяти процесса (``max_entries`` записей);
+* таблица SQLite с временем истечения: найденный постер живёт ``ttl``,
+  ответ «постера нет» (``N/A``, неизвестный фильм) — ``negative_ttl``.
+
+Сетевые ошибки не кэшируются. Все запросы идут через одну
+``requests.Session`` с пулом соединений. Промах на пути запроса
+(:meth:`OMDbClient.get`) не ждёт сети: фильм ставится в очередь фонового
+пула, а ответ сразу получает ``None``; :meth:`OMDbClient.prefetch`
+заполняет кэш для списка фильмов заранее. Одновременные промахи по одному
+фильму (фоновое заполнение, ``get(wait=True)``, ``prefetch``) ждут один и
+тот же запрос к OMDb.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OMDB_URL = "http://www.omdbapi.com/"
+IMDB_ID_RE = re.compile(r"^tt\d+$")
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+
+# Значение «в кэше нет» — в отличие от None («постера нет»).
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS omdb_posters (
+    imdb_id TEXT PRIMARY KEY,
+    poster TEXT,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class PosterStore:
+    """Таблица ``omdb_posters`` (SQLite); соединение у каждого потока своё."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, imdb_id: str) -> Tuple[object, float]:
+        """``(постер или None, время истечения)`` либо ``(_MISSING, 0)``, если записи нет или она истекла."""
+        row = self._connection().execute(
+            "SELECT poster, expires_at FROM omdb_posters WHERE imdb_id = ?", (imdb_id,)).fetchone()
+        if row is None or row[1] < time.time():
+            return _MISSING, 0.0
+        return row[0], row[1]
+
+    def set(self, imdb_id: str, poster: Optional[str], expires_at: float) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO omdb_posters VALUES (?, ?, ?)", (imdb_id, poster, expires_at))
+
+    def purge_expired(self) -> int:
+        connection = self._connection()
+        with connection:
+            return connection.execute("DELETE FROM omdb_posters WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class OMDbClient:
+    """URL постера по IMDb ID (``tt0114709``) с кэшированием.
+
+    Без ``api_key`` клиент ничего не запрашивает и всегда возвращает ``None``.
+    """
+
+    def __init__(self, api_key: Optional[str], store_path: str, base_url: str = OMDB_URL,
+                 ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+                 max_entries: int = 10000, workers: int = 4, timeout: float = 5.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.store = PosterStore(store_path)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omdb")
+
+        self._lru: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        # IMDb ID -> запрос к OMDb, который уже выполняется.
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _remember(self, imdb_id: str, poster: Optional[str], expires_at: float) -> None:
+        with self._lock:
+            self._lru[imdb_id] = (poster, expires_at)
+            self._lru.move_to_end(imdb_id)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def cached(self, imdb_id: str) -> object:
+        """Постер из LRU или SQLite; ``_MISSING``, если кэш не знает ответа."""
+        with self._lock:
+            item = self._lru.get(imdb_id)
+            if item is not None:
+                if item[1] >= time.time():
+                    self._lru.move_to_end(imdb_id)
+                    self.hits += 1
+                    return item[0]
+                del self._lru[imdb_id]
+        poster, expires_at = self.store.get(imdb_id)
+        if poster is _MISSING:
+            with self._lock:
+                self.misses += 1
+            return _MISSING
+        self._remember(imdb_id, poster, expires_at)
+        with self._lock:
+            self.hits += 1
+        return poster
+
+    def fetch(self, imdb_id: str) -> object:
+        """Запрос к OMDb и запись ответа в кэш; при сетевой ошибке — ``_MISSING`` (без кэширования)."""
+        try:
+            response = self.session.get(self.base_url, params={"i": imdb_id, "apikey": self.api_key},
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"[ERROR] Failed to fetch poster for {imdb_id}: {e}")
+            return _MISSING
+
+        poster = data.get("Poster")
+        if data.get("Response") != "True" or not poster or poster == "N/A":
+            poster, ttl = None, self.negative_ttl
+        else:
+            ttl = self.ttl
+        expires_at = time.time() + ttl
+        self.store.set(imdb_id, poster, expires_at)
+        self._remember(imdb_id, poster, expires_at)
+        return poster
+
+    def _fill(self, imdb_id: str) -> object:
+        try:
+            return self.fetch(imdb_id)
+        finally:
+            with self._lock:
+                self._pending.pop(imdb_id, None)
+
+    def _schedule(self, imdb_id: str) -> Future:
+        """Запрос к OMDb в фоновом пуле; если он уже идёт — тот же :class:`Future`."""
+        with self._lock:
+            future = self._pending.get(imdb_id)
+            if future is not None:
+                return future
+            item = self._lru.get(imdb_id)
+            if item is not None and item[1] >= time.time():
+                # Ответ пришёл, пока вызывающий проверял кэш.
+                future = Future()
+                future.set_result(item[0])
+                return future
+            future = self._pending[imdb_id] = self._executor.submit(self._fill, imdb_id)
+        return future
+
+    def get(self, imdb_id: Optional[str], wait: bool = False) -> Optional[str]:
+        """URL постера или ``None``.
+
+        При промахе кэша без ``wait`` запрос уходит в фоновый пул, а сейчас
+        возвращается ``None``; с ``wait=True`` — ждём ответа OMDb.
+        """
+        if not self.enabled or not isinstance(imdb_id, str) or not IMDB_ID_RE.match(imdb_id):
+            return None
+        poster = self.cached(imdb_id)
+        if poster is not _MISSING:
+            return poster
+        future = self._schedule(imdb_id)
+        if wait:
+            poster = future.result()
+            return None if poster is _MISSING else poster
+        return None
+
+    def prefetch(self, imdb_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Заполняет кэш для списка фильмов параллельно и возвращает найденные постеры."""
+        result: Dict[str, Optional[str]] = {}
+        futures = {}
+        for imdb_id in dict.fromkeys(imdb_ids):
+            if not self.enabled or not isinstance(imdb_id, str) or not IMDB_ID_RE.match(imdb_id):
+                continue
+            poster = self.cached(imdb_id)
+            if poster is _MISSING:
+                futures[imdb_id] = self._schedule(imdb_id)
+            else:
+                result[imdb_id] = poster
+        for imdb_id, future in futures.items():
+            poster = future.result()
+            if poster is not _MISSING:
+                result[imdb_id] = poster
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._lru), "pending": len(self._pending), "hits": self.hits,
+                    "misses": self.misses}
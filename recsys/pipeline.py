@@ -0,0 +1,170 @@
+"""Двухэтапная выдача рекомендаций: отбор кандидатов и доранжирование.
+
+1. Генераторы кандидатов (коллаборативный, content-based, популярное,
+   новинки) независимо возвращают по несколько сотен строк каталога со
+   своими оценками.
+2. Доранжирование один раз обрабатывает объединение кандидатов: нормирует
+   оценки каждого источника, смешивает их с весами алгоритма, исключает уже
+   оценённые фильмы и жадно набирает список со штрафом за повтор жанров.
+   Если кандидатов не хватило, список добирается популярными фильмами
+   каталога, поэтому длина выдачи гарантирована.
+
+Время каждого этапа возвращается вместе с результатом (для ``Server-Timing``).
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recsys.topn import top_n_indices
+
+Candidates = Tuple[np.ndarray, np.ndarray]
+Generator = Callable[[int], Candidates]
+
+DEFAULT_POOL_SIZE = 300
+DEFAULT_DIVERSITY = 0.1
+
+
+def normalise(scores: np.ndarray) -> np.ndarray:
+    """Min-max нормировка конечных значений в [0, 1]; ``-inf`` (нет оценки) сохраняется."""
+    result = np.full(scores.shape, -np.inf)
+    finite = np.isfinite(scores)
+    if not finite.any():
+        return result
+    values = scores[finite]
+    low, high = values.min(), values.max()
+    result[finite] = (values - low) / (high - low) if high > low else 1.0
+    return result
+
+
+def genre_matrix(genres: Sequence) -> Tuple[np.ndarray, List[str]]:
+    """Булева матрица «строка каталога × жанр» и список жанров."""
+    names: Dict[str, int] = {}
+    pairs = []
+    for row, value in enumerate(genres):
+        if isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        elif not isinstance(value, (list, tuple, np.ndarray)):
+            value = []
+        for genre in value:
+            pairs.append((row, names.setdefault(str(genre), len(names))))
+    matrix = np.zeros((len(genres), len(names)), dtype=bool)
+    if pairs:
+        rows, cols = np.array(pairs).T
+        matrix[rows, cols] = True
+    return matrix, list(names)
+
+
+def dedupe_candidates(rows: np.ndarray, scores: np.ndarray) -> Candidates:
+    """Одна строка каталога — один кандидат с лучшей оценкой генератора.
+
+    Несколько позиций модели могут вести в одну строку каталога; без этого
+    ``np.add.at`` при смешивании сложил бы их вклады.
+    """
+    order = np.argsort(-scores, kind="stable")
+    unique_rows, first = np.unique(rows[order], return_index=True)
+    if unique_rows.size == rows.size:
+        return rows, scores
+    return unique_rows, scores[order][first]
+
+
+def top_candidates(scores: np.ndarray, item_rows: np.ndarray, depth: int) -> Candidates:
+    """Лучшие ``depth`` позиций вектора оценок в виде строк каталога.
+
+    Позиции без строки каталога (``item_rows[i] = -1``) и с оценкой ``-inf`` отбрасываются.
+    """
+    top = top_n_indices(scores, depth)
+    rows = item_rows[top]
+    valid = (rows >= 0) & np.isfinite(scores[top])
+    return rows[valid], scores[top][valid]
+
+
+class CandidatePipeline:
+    """Отбор кандидатов из генераторов и их доранжирование.
+
+    ``genres`` — матрица жанров по строкам каталога (см. :func:`genre_matrix`),
+    ``fallback_rows`` — строки каталога в порядке популярности для добора.
+    """
+
+    def __init__(self, genres: np.ndarray, fallback_rows: np.ndarray,
+                 pool_size: int = DEFAULT_POOL_SIZE, diversity: float = DEFAULT_DIVERSITY):
+        self.genres = genres
+        self.fallback_rows = np.asarray(fallback_rows, dtype=np.int64)
+        self.pool_size = pool_size
+        self.diversity = diversity
+
+    @property
+    def nbytes(self) -> int:
+        return self.genres.nbytes + self.fallback_rows.nbytes
+
+    def run(self, generators: Mapping[str, Generator], weights: Mapping[str, float], top_n: int = 20,
+            exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict[str, float]]:
+        """Строки каталога итогового списка и время этапов в миллисекундах."""
+        timings: Dict[str, float] = {}
+        exclude_rows = np.unique(np.asarray(exclude_rows if exclude_rows is not None else [], dtype=np.int64))
+        depth = self.pool_size + exclude_rows.size
+
+        sources = []
+        for name, generator in generators.items():
+            weight = float(weights.get(name) or 0.0)
+            if weight <= 0:
+                continue
+            started = time.perf_counter()
+            rows, scores = generator(depth)
+            timings[f"candidates_{name}"] = 1000 * (time.perf_counter() - started)
+            if len(rows):
+                rows, scores = dedupe_candidates(np.asarray(rows, dtype=np.int64), np.asarray(scores, dtype=np.float64))
+                sources.append((rows, scores, weight))
+
+        started = time.perf_counter()
+        selected = self._rerank(sources, top_n, exclude_rows)
+        timings["rerank"] = 1000 * (time.perf_counter() - started)
+        return selected, timings
+
+    def _rerank(self, sources, top_n: int, exclude_rows: np.ndarray) -> np.ndarray:
+        pool = np.unique(np.concatenate([rows for rows, _, _ in sources])) if sources else np.empty(0, np.int64)
+        pool = pool[~np.isin(pool, exclude_rows)]
+
+        blended = np.zeros(pool.size)
+        total_weight = sum(weight for _, _, weight in sources) or 1.0
+        for rows, scores, weight in sources:
+            keep = ~np.isin(rows, exclude_rows)
+            normalised = normalise(scores[keep])
+            finite = np.isfinite(normalised)
+            np.add.at(blended, np.searchsorted(pool, rows[keep][finite]), weight / total_weight * normalised[finite])
+
+        selected = self._diversify(pool, blended, top_n)
+        if len(selected) < top_n:
+            taken = np.concatenate([exclude_rows, np.asarray(selected, dtype=np.int64)])
+            fill = self.fallback_rows[~np.isin(self.fallback_rows, taken)]
+            selected.extend(fill[:top_n - len(selected)].tolist())
+        return np.asarray(selected, dtype=np.int64)
+
+    def _diversify(self, pool: np.ndarray, blended: np.ndarray, top_n: int) -> List[int]:
+        """Жадный отбор: оценка минус штраф за долю уже выбранных фильмов тех же жанров."""
+        if pool.size == 0:
+            return []
+        if self.diversity <= 0 or self.genres.shape[1] == 0:
+            order = np.argsort(-blended, kind="stable")[:top_n]
+            return pool[order].tolist()
+
+        genres = self.genres[pool].astype(np.float64)
+        genre_totals = np.maximum(genres.sum(axis=1), 1.0)
+        counts = np.zeros(genres.shape[1])
+        available = np.ones(pool.size, dtype=bool)
+        selected: List[int] = []
+        for step in range(min(top_n, pool.size)):
+            penalty = (genres @ counts) / (genre_totals * max(step, 1))
+            adjusted = np.where(available, blended - self.diversity * penalty, -np.inf)
+            best = int(np.argmax(adjusted))
+            selected.append(int(pool[best]))
+            available[best] = False
+            counts += genres[best]
+        return selected
+
+
+def server_timing(timings: Mapping[str, float]) -> str:
+    """Значение заголовка ``Server-Timing``."""
+    return ", ".join(f"{name};dur={duration:.2f}" for name, duration in timings.items())
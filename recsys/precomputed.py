@@ -0,0 +1,117 @@
+"""Хранилище заранее посчитанных коллаборативных рекомендаций.
+
+Пакетное задание (``scripts/precompute_recs.py``) раз в период считает top-N
+SVD для всех пользователей и пишет их в SQLite-таблицу, по строке на
+пользователя: ``tmdb_id`` и оценки лежат в BLOB-ах (``int64`` / ``float32``).
+Запись пригодна, пока совпадают версия артефактов модели и отпечаток лайков
+пользователя (:func:`likes_fingerprint`); иначе приложение считает
+рекомендации на лету.
+
+Пользователи приложения и MovieLens хранятся в разных областях (``scope``):
+их идентификаторы пересекаются.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+APP_SCOPE = "app"
+MOVIELENS_SCOPE = "ml"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS precomputed_recs (
+    scope TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    computed_at REAL NOT NULL,
+    tmdb_ids BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    PRIMARY KEY (scope, user_id)
+) WITHOUT ROWID
+"""
+
+
+def likes_fingerprint(likes: Iterable[Tuple[int, int]]) -> str:
+    """Отпечаток набора пар ``(tmdb_id, value)``, не зависящий от порядка."""
+    digest = hashlib.sha1()
+    for tmdb_id, value in sorted((int(tmdb_id), int(value)) for tmdb_id, value in likes):
+        digest.update(f"{tmdb_id}:{value};".encode())
+    return digest.hexdigest()
+
+
+class PrecomputedRecs(NamedTuple):
+    version: str
+    fingerprint: str
+    computed_at: float
+    tmdb_ids: np.ndarray
+    scores: np.ndarray
+
+
+class PrecomputedStore:
+    """Чтение и запись таблицы ``precomputed_recs``.
+
+    Соединения создаются отдельно для каждого потока; пока файла нет,
+    :meth:`get` возвращает ``None``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, scope: str, user_id: int) -> Optional[PrecomputedRecs]:
+        connection = self._connection()
+        if connection is None:
+            return None
+        row = connection.execute(
+            "SELECT version, fingerprint, computed_at, tmdb_ids, scores FROM precomputed_recs "
+            "WHERE scope = ? AND user_id = ?", (scope, int(user_id))).fetchone()
+        if row is None:
+            return None
+        version, fingerprint, computed_at, tmdb_ids, scores = row
+        return PrecomputedRecs(version, fingerprint, computed_at,
+                               np.frombuffer(tmdb_ids, dtype=np.int64), np.frombuffer(scores, dtype=np.float32))
+
+    def write(self, scope: str, version: str,
+              records: Iterable[Tuple[int, str, Sequence[int], Sequence[float]]]) -> int:
+        """Записывает ``(user_id, fingerprint, tmdb_ids, scores)`` одной транзакцией; возвращает число строк."""
+        connection = self._connection(create=True)
+        now = time.time()
+        rows = [
+            (scope, int(user_id), version, fingerprint, now,
+             np.asarray(tmdb_ids, dtype=np.int64).tobytes(), np.asarray(scores, dtype=np.float32).tobytes())
+            for user_id, fingerprint, tmdb_ids, scores in records
+        ]
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO precomputed_recs VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def prune(self, scope: str, before: float) -> int:
+        """Удаляет записи области, посчитанные раньше ``before`` (пользователи, выпавшие из прогона)."""
+        connection = self._connection(create=True)
+        with connection:
+            return connection.execute("DELETE FROM precomputed_recs WHERE scope = ? AND computed_at < ?",
+                                      (scope, before)).rowcount
+
+    def __len__(self) -> int:
+        connection = self._connection()
+        if connection is None:
+            return 0
+        return connection.execute("SELECT COUNT(*) FROM precomputed_recs").fetchone()[0]
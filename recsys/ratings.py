@@ -0,0 +1,181 @@
+"""Оценки MovieLens в CSR-представлении по пользователям.
+
+Оценки упорядочены по пользователю: ``indptr[u]:indptr[u + 1]`` — диапазон
+фильмов (``items``, ``movieId_ml``) и оценок (``values``) пользователя с
+позицией ``u`` в отсортированном ``user_ids``. История пользователя — срез
+без копирования. Множество оценённых фильмов (``rated_items``) нужно только
+сборке подборок: оно сохраняется в выгрузку, а без неё вычисляется при
+первом обращении, чтобы загрузка CSR в процессе сервиса не копировала
+в кучу массив размером со все оценки.
+
+Из CSV структура строится потоково за два прохода (подсчёт, затем
+раскладка по позициям), поэтому пиковая память — размер итоговых массивов,
+а не DataFrame на весь ``ratings.csv``.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ITEM_DTYPE = np.int32
+VALUE_DTYPE = np.float32
+
+
+class RatingsCSR:
+    """Оценки, сгруппированные по пользователям."""
+
+    def __init__(self, user_ids: np.ndarray, indptr: np.ndarray, items: np.ndarray, values: np.ndarray,
+                 rated_items: Optional[np.ndarray] = None):
+        self.user_ids = user_ids
+        self.indptr = indptr
+        self.items = items
+        self.values = values
+        self._rated_items = rated_items
+
+    @property
+    def rated_items(self) -> np.ndarray:
+        """Отсортированные ``movieId_ml`` с хотя бы одной оценкой."""
+        if self._rated_items is None:
+            self._rated_items = np.unique(self.items)
+        return self._rated_items
+
+    @classmethod
+    def from_arrays(cls, user_ids: Sequence[int], item_ids: Sequence[int],
+                    values: Sequence[float]) -> "RatingsCSR":
+        """Строит CSR из трёх столбцов; внутри пользователя порядок строк сохраняется."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        order = np.argsort(user_ids, kind="stable")
+        unique_users, counts = np.unique(user_ids, return_counts=True)
+        indptr = np.zeros(unique_users.size + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(unique_users, indptr,
+                   np.asarray(item_ids, dtype=ITEM_DTYPE)[order],
+                   np.asarray(values, dtype=VALUE_DTYPE)[order])
+
+    @classmethod
+    def from_frame(cls, ratings: pd.DataFrame) -> "RatingsCSR":
+        """Из DataFrame с колонками ``userId``, ``movieId_ml``, ``rating`` (строки с пропусками отбрасываются)."""
+        present = ratings["userId"].notna() & ratings["movieId_ml"].notna()
+        if not present.all():
+            ratings = ratings[present]
+        return cls.from_arrays(ratings["userId"].to_numpy(dtype=np.int64),
+                               ratings["movieId_ml"].to_numpy(dtype=np.int64),
+                               ratings["rating"].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_csv(cls, path: str, chunksize: int = 1_000_000,
+                 item_filter: Optional[Iterable[int]] = None) -> "RatingsCSR":
+        """Потоковое построение из ``ratings.csv`` (``userId,movieId,rating,...``).
+
+        ``item_filter`` — допустимые ``movieId``; остальные оценки пропускаются.
+        """
+        allowed = None if item_filter is None else np.unique(np.asarray(list(item_filter), dtype=np.int64))
+        dtypes = {"userId": np.int64, "movieId": np.int64, "rating": np.float64}
+
+        def chunks():
+            for chunk in pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize):
+                users = chunk["userId"].to_numpy()
+                items = chunk["movieId"].to_numpy()
+                values = chunk["rating"].to_numpy()
+                if allowed is not None:
+                    keep = np.isin(items, allowed)
+                    users, items, values = users[keep], items[keep], values[keep]
+                yield users, items, values
+
+        # Проход 1: число оценок каждого пользователя.
+        counts = np.zeros(0, dtype=np.int64)
+        for users, _, _ in chunks():
+            if users.size:
+                chunk_counts = np.bincount(users)
+                if chunk_counts.size > counts.size:
+                    counts = np.pad(counts, (0, chunk_counts.size - counts.size))
+                counts[:chunk_counts.size] += chunk_counts
+
+        user_ids = np.flatnonzero(counts)
+        indptr = np.zeros(user_ids.size + 1, dtype=np.int64)
+        np.cumsum(counts[user_ids], out=indptr[1:])
+        items_out = np.empty(indptr[-1], dtype=ITEM_DTYPE)
+        values_out = np.empty(indptr[-1], dtype=VALUE_DTYPE)
+
+        # Проход 2: раскладка по позициям; cursor[u] — следующая свободная ячейка пользователя.
+        cursor = np.zeros(counts.size, dtype=np.int64)
+        cursor[user_ids] = indptr[:-1]
+        for users, items, values in chunks():
+            if not users.size:
+                continue
+            order = np.argsort(users, kind="stable")
+            users, items, values = users[order], items[order], values[order]
+            unique_users, starts, chunk_counts = np.unique(users, return_index=True, return_counts=True)
+            rank = np.arange(users.size) - np.repeat(starts, chunk_counts)
+            positions = cursor[users] + rank
+            items_out[positions] = items
+            values_out[positions] = values
+            cursor[unique_users] += chunk_counts
+        return cls(user_ids, indptr, items_out, values_out)
+
+    def save_to(self, writer, prefix: str = "ratings") -> None:
+        """Сохраняет CSR в каталог артефактов (см. ``recsys.artifacts``)."""
+        writer.add_array(f"{prefix}_user_ids", self.user_ids)
+        writer.add_array(f"{prefix}_indptr", self.indptr)
+        writer.add_array(f"{prefix}_items", self.items)
+        writer.add_array(f"{prefix}_values", self.values)
+        writer.add_array(f"{prefix}_rated_items", self.rated_items)
+
+    @classmethod
+    def from_bundle(cls, bundle, prefix: str = "ratings") -> "RatingsCSR":
+        """Открывает CSR из каталога артефактов (без ``rated_items`` — вычисляет их при первом обращении)."""
+        if f"{prefix}_indptr" not in bundle:
+            raise KeyError(f"No CSR ratings in {bundle.root}; re-export the bundle with scripts/export_artifacts.py")
+        rated_items = bundle.array(f"{prefix}_rated_items") if f"{prefix}_rated_items" in bundle else None
+        return cls(bundle.array(f"{prefix}_user_ids"), bundle.array(f"{prefix}_indptr"),
+                   bundle.array(f"{prefix}_items"), bundle.array(f"{prefix}_values"), rated_items)
+
+    @property
+    def n_users(self) -> int:
+        return self.user_ids.size
+
+    def __len__(self) -> int:
+        return self.items.size
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.user_ids, self.indptr, self.items, self.values, self._rated_items)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def user_position(self, user_id: int) -> Optional[int]:
+        pos = int(np.searchsorted(self.user_ids, user_id))
+        if pos < self.user_ids.size and self.user_ids[pos] == user_id:
+            return pos
+        return None
+
+    def user_history(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Фильмы и оценки пользователя (срезы без копирования; пустые — для неизвестного)."""
+        pos = self.user_position(user_id)
+        if pos is None:
+            return self.items[:0], self.values[:0]
+        start, end = self.indptr[pos], self.indptr[pos + 1]
+        return self.items[start:end], self.values[start:end]
+
+    def user_items(self, user_id: int) -> np.ndarray:
+        return self.user_history(user_id)[0]
+
+    def filter_items(self, item_ids: Iterable[int]) -> "RatingsCSR":
+        """Новый CSR только с оценками фильмов из ``item_ids`` (пользователи без оценок удаляются)."""
+        keep = np.isin(self.items, np.asarray(list(item_ids), dtype=np.int64))
+        counts = np.add.reduceat(keep.astype(np.int64), self.indptr[:-1]) if self.items.size else \
+            np.zeros(self.n_users, dtype=np.int64)
+        counts[np.diff(self.indptr) == 0] = 0
+        present = counts > 0
+        indptr = np.zeros(int(present.sum()) + 1, dtype=np.int64)
+        np.cumsum(counts[present], out=indptr[1:])
+        return RatingsCSR(self.user_ids[present], indptr, self.items[keep], self.values[keep])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Плоская таблица ``userId, movieId_ml, rating`` (например, для обучения ``surprise``)."""
+        return pd.DataFrame({
+            "userId": np.repeat(self.user_ids, np.diff(self.indptr)),
+            "movieId_ml": self.items.astype(np.int64),
+            "rating": self.values.astype(np.float64),
+        })
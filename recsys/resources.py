@@ -0,0 +1,325 @@
+"""Реестр ленивых ресурсов (артефактов модели).
+
+Каждый ресурс регистрируется вместе с функцией-загрузчиком и загружается
+при первом обращении через :meth:`ResourceRegistry.get` либо заранее, в
+фоновом потоке (:meth:`ResourceRegistry.start_background_load`). Реестр
+хранит время загрузки и объём каждого ресурса для ``/readyz``.
+
+Один реестр соответствует одной версии артефактов. :class:`ResourceSwitcher`
+держит ссылку на активный реестр и подменяет её целиком, когда новая версия
+полностью загружена; запросы, начатые на старой версии, дорабатывают на ней,
+после чего старый реестр освобождается и закрывается: загрузить в него
+ресурсы снова (например, из ещё работающего фонового потока) нельзя.
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_nbytes(value: Any) -> int:
+    """Приблизительный объём памяти ресурса в байтах."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    return 0
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.value: Any = None
+        self.load_seconds: Optional[float] = None
+        self.nbytes: Optional[int] = None
+        self.error: Optional[str] = None
+
+
+class ResourceRegistry:
+    """Потокобезопасный реестр ресурсов с загрузкой по первому обращению."""
+
+    def __init__(self, version: Optional[str] = None, on_release: Optional[Callable[[], None]] = None,
+                 on_use: Optional[Callable[[], None]] = None):
+        self.version = version
+        self._entries: Dict[str, _Entry] = {}
+        self._background: Optional[threading.Thread] = None
+        self._background_lock = threading.Lock()
+        self._on_release = on_release
+        self._on_use = on_use
+        self.closed = False
+        # Число запросов, закреплённых за реестром (см. ResourceSwitcher).
+        self.in_flight = 0
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        if name in self._entries:
+            raise ValueError(f"Resource {name!r} is already registered")
+        self._entries[name] = _Entry(name, loader)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entries[name].loaded
+
+    def get(self, name: str) -> Any:
+        """Возвращает ресурс, при необходимости загружая его (один раз на процесс)."""
+        entry = self._entries[name]
+        if entry.loaded:
+            return entry.value
+        with entry.lock:
+            if self.closed:
+                raise RuntimeError(f"Resource registry {self.version} is released")
+            if not entry.loaded:
+                started = time.perf_counter()
+                try:
+                    value = entry.loader()
+                except Exception as e:
+                    entry.error = f"{type(e).__name__}: {e}"
+                    raise
+                entry.value = value
+                entry.load_seconds = time.perf_counter() - started
+                entry.nbytes = estimate_nbytes(value)
+                entry.error = None
+                entry.loaded = True
+        return entry.value
+
+    def load_all(self, names: Optional[Iterable[str]] = None) -> None:
+        for name in names or self.names:
+            self.get(name)
+
+    def start_background_load(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Загружает ресурсы по порядку в фоновом потоке; повторный вызов ничего не делает."""
+        if self._background is not None:
+            return self._background
+        with self._background_lock:
+            if self._background is None:
+                order = list(names or self.names)
+
+                def run():
+                    for name in order:
+                        if self.closed:
+                            return
+                        try:
+                            self.get(name)
+                        except Exception:
+                            print(f"[ERROR] Failed to load resource {name!r}")
+                            traceback.print_exc()
+
+                self._background = threading.Thread(target=run, name="resource-loader", daemon=True)
+                self._background.start()
+        return self._background
+
+    def mark_used(self) -> None:
+        """Сообщает, что процесс обслуживает запросы этой версией (например, чтобы взять аренду её файлов).
+
+        Вызывается на каждый закреплённый запрос, поэтому ``on_use`` должен
+        быть идемпотентным; само создание реестра побочных эффектов не имеет.
+        """
+        if self._on_use is not None and not self.closed:
+            self._on_use()
+
+    def release(self) -> None:
+        """Закрывает реестр и сбрасывает ссылки на загруженные значения, чтобы память версии освободилась."""
+        self.closed = True
+        for entry in self._entries.values():
+            # Блокировка дожидается загрузки, начатой до закрытия.
+            with entry.lock:
+                entry.value = None
+                entry.loaded = False
+        if self._on_release is not None:
+            self._on_release()
+
+    @property
+    def ready(self) -> bool:
+        return all(entry.loaded for entry in self._entries.values())
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "loaded": entry.loaded,
+                "load_seconds": round(entry.load_seconds, 4) if entry.load_seconds is not None else None,
+                "bytes": entry.nbytes,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+
+class ResourceSwitcher:
+    """Активный :class:`ResourceRegistry` с атомарной заменой на новую версию.
+
+    Запрос закрепляет текущий реестр через :meth:`acquire` и отпускает его
+    через :meth:`release`; :meth:`get` и остальные методы обращаются к
+    закреплённому реестру, а вне запроса — к активному. :meth:`reload` строит
+    новый реестр фабрикой, загружает все ресурсы в фоне и только потом
+    переключает ссылку. Старый реестр освобождается, когда завершится
+    последний закреплённый за ним запрос.
+    """
+
+    def __init__(self, factory: Callable[[], ResourceRegistry], load_order: Optional[Iterable[str]] = None):
+        self._factory = factory
+        self._load_order = list(load_order) if load_order is not None else None
+        self._lock = threading.Lock()
+        self._active = factory()
+        self._draining: List[ResourceRegistry] = []
+        self._pinned: contextvars.ContextVar = contextvars.ContextVar("pinned_registry", default=None)
+        self._reload_thread: Optional[threading.Thread] = None
+        self._loading_version: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self.last_reload: Dict[str, Any] = {}
+
+    # --- закрепление за запросом ---
+
+    def acquire(self):
+        """Закрепляет активный реестр за текущим контекстом; возвращает токен для :meth:`release`."""
+        with self._lock:
+            registry = self._active
+            registry.in_flight += 1
+        registry.mark_used()
+        return registry, self._pinned.set(registry)
+
+    def release(self, token) -> None:
+        if token is None:
+            return
+        registry, context_token = token
+        try:
+            self._pinned.reset(context_token)
+        except ValueError:  # токен из другого контекста
+            self._pinned.set(None)
+        with self._lock:
+            registry.in_flight -= 1
+            drained = registry in self._draining and registry.in_flight == 0
+            if drained:
+                self._draining.remove(registry)
+        if drained:
+            registry.release()
+
+    @property
+    def current(self) -> ResourceRegistry:
+        return self._pinned.get() or self._active
+
+    # --- интерфейс ResourceRegistry ---
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.current.version
+
+    def get(self, name: str) -> Any:
+        return self.current.get(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return self.current.is_loaded(name)
+
+    def load_all(self, names: Optional[Iterable[str]] = None) -> None:
+        self.current.load_all(names)
+
+    def start_background_load(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        return self._active.start_background_load(names)
+
+    @property
+    def ready(self) -> bool:
+        return self._active.ready
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return self._active.status()
+
+    # --- замена версии ---
+
+    def reload(self, wait: bool = False, version: Optional[str] = None) -> bool:
+        """Загружает новую версию в фоне и переключается на неё.
+
+        ``version`` — ожидаемая версия (для ``last_reload``, если фабрика
+        упадёт раньше, чем её узнает). Возвращает ``False``, если перезагрузка уже идёт.
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(target=self._reload, args=(version,),
+                                                   name="resource-reload", daemon=True)
+            self._reload_thread.start()
+            thread = self._reload_thread
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self, version: Optional[str] = None) -> None:
+        started = time.perf_counter()
+        registry = None
+        try:
+            registry = self._factory()
+            self._loading_version = registry.version
+            registry.mark_used()
+            registry.load_all(self._load_order)
+        except Exception as e:
+            print(f"[ERROR] Failed to load resource version: {type(e).__name__}: {e}")
+            traceback.print_exc()
+            if registry is not None:
+                registry.release()
+            self.last_reload = {"version": self._loading_version or version, "error": f"{type(e).__name__}: {e}",
+                                "seconds": round(time.perf_counter() - started, 3)}
+            self._loading_version = None
+            return
+
+        with self._lock:
+            previous, self._active = self._active, registry
+            drained = previous.in_flight == 0
+            if not drained:
+                self._draining.append(previous)
+        if drained:
+            previous.release()
+        self._loading_version = None
+        self.last_reload = {"version": registry.version, "previous_version": previous.version,
+                            "error": None, "seconds": round(time.perf_counter() - started, 3)}
+        print(f"[INFO] Switched resources from version {previous.version} to {registry.version}")
+
+    def watch(self, probe: Callable[[], Optional[str]], interval: float) -> Optional[threading.Thread]:
+        """Раз в ``interval`` секунд сравнивает ``probe()`` с активной версией и перезагружается при отличии.
+
+        Версия, которую не удалось загрузить, повторно не загружается, пока
+        ``probe()`` не вернёт другую (принудительно — :meth:`reload`).
+        """
+        if interval <= 0 or self._watcher is not None:
+            return self._watcher
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    version = probe()
+                except Exception as e:
+                    print(f"[WARN] Resource version probe failed: {e}")
+                    continue
+                failed = self.last_reload.get("version") if self.last_reload.get("error") else None
+                if version is not None and version not in (self._active.version, self._loading_version, failed):
+                    self.reload(version=version)
+
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=run, name="resource-watcher", daemon=True)
+                self._watcher.start()
+        return self._watcher
+
+    def versions(self) -> Dict[str, Any]:
+        with self._lock:
+            draining = [{"version": registry.version, "in_flight": registry.in_flight}
+                        for registry in self._draining]
+            active = {"version": self._active.version, "in_flight": self._active.in_flight,
+                      "ready": self._active.ready}
+        return {"active": active, "loading": self._loading_version, "draining": draining,
+                "last_reload": self.last_reload}
@@ -0,0 +1,94 @@
+"""Сборка JSON-ответов из заранее закодированных фрагментов.
+
+Для каждого фильма один раз при загрузке вычисляются ``poster_url`` и
+нормализованные поля, и результат кодируется в JSON. Ответ со списком
+фильмов собирается конкатенацией готовых фрагментов, без ``DataFrame.apply``
+и ``to_dict('records')`` на каждый запрос.
+"""
+from __future__ import annotations
+
+import json
+import math
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него используется стандартный json
+    orjson = None
+
+MOVIE_FIELDS = ('title', 'tmdb_id', 'poster_path', 'poster_url', 'poster_srcset', 'overview', 'genres',
+                'release_date', 'vote_average', 'vote_count')
+
+# Значения для колонок, которых нет в исходной таблице (как раньше в /api/popular).
+MISSING_FIELD_DEFAULTS = {'overview': '', 'genres': 'Unknown', 'vote_average': 0.0, 'vote_count': 0}
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _json_value(value: Any) -> Any:
+    """Приводит значение из pandas/NumPy к типу, который однозначно кодируется в JSON."""
+    if isinstance(value, (list, tuple)):
+        return [_json_value(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return [_json_value(item) for item in value.tolist()]
+    if value is None or value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def encode_object(fields: Mapping[str, bytes]) -> bytes:
+    """Собирает JSON-объект из уже закодированных значений."""
+    return b'{' + b','.join(dumps(key) + b':' + value for key, value in fields.items()) + b'}'
+
+
+class MovieFragments:
+    """Закодированные JSON-представления фильмов; ``fragments[i]`` соответствует строке ``i`` таблицы."""
+
+    def __init__(self, fragments: List[bytes]):
+        self.fragments = fragments
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, poster_url: Callable[[Dict[str, Any]], str],
+                   poster_srcset: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                   fields: Sequence[str] = MOVIE_FIELDS) -> "MovieFragments":
+        fragments = []
+        for record in frame.to_dict('records'):
+            record['poster_url'] = poster_url(record)
+            if poster_srcset is not None:
+                record['poster_srcset'] = poster_srcset(record)
+            movie = {}
+            for field in fields:
+                if field in record:
+                    movie[field] = _json_value(record[field])
+                else:
+                    movie[field] = MISSING_FIELD_DEFAULTS.get(field)
+            fragments.append(dumps(movie))
+        return cls(fragments)
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(fragment) for fragment in self.fragments)
+
+    def array(self, rows: Sequence[int]) -> bytes:
+        """JSON-массив фильмов в порядке ``rows``."""
+        fragments = self.fragments
+        return b'[' + b','.join(fragments[row] for row in rows) + b']'
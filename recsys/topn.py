@@ -0,0 +1,25 @@
+"""Выбор top-N элементов по вектору оценок."""
+from __future__ import annotations
+
+import numpy as np
+
+
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Возвращает индексы ``n`` наибольших оценок в порядке убывания.
+
+    Элементы со значением ``-inf`` считаются исключёнными и в ответ не
+    попадают. Используется ``argpartition`` (O(N)) и сортировка только
+    выбранного хвоста (O(n log n)).
+    """
+    if n <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    valid = int(np.count_nonzero(scores > -np.inf))
+    n = min(n, valid)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    if n < scores.size:
+        part = np.argpartition(-scores, n - 1)[:n]
+    else:
+        part = np.arange(scores.size)
+    order = np.argsort(-scores[part], kind="stable")
+    return part[order].astype(np.int64, copy=False)
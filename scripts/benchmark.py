@@ -0,0 +1,473 @@
+#!/usr/bin/env python
+"""benchmark.py
+
+Замеры задержки и пропускной способности рекомендательного API.
+
+Режимы:
+    micro    — функции рекомендаций по отдельности (content по названию и по
+               лайкам, collaborative для пользователя MovieLens и сайта,
+               двухэтапный конвейер, которым идёт и hybrid, ленты) в процессе приложения;
+    load     — нагрузка на ``/api/smart-recommendations``, ``/api/popular``,
+               ``/api/new`` и ``/api/like`` от ``--users`` пользователей в
+               ``--concurrency`` потоков: через Flask test client (по
+               умолчанию) или на запущенный сервер (``--url``);
+    compare  — сравнение двух JSON-результатов.
+
+Для ``micro`` и ``load`` без ``--url`` приложение импортируется с данными из
+``--data-dir`` (например, сгенерированными ``make_bench_data.py``) и
+отдельной SQLite-базой во ``--work-dir``, поэтому рабочая база не
+затрагивается. Отчёт: p50/p95/p99, среднее, запросов в секунду, пиковый RSS
+процесса. ``--save`` пишет JSON, ``--baseline`` сразу сравнивает с прошлым
+прогоном и завершает скрипт с кодом 1 при регрессии больше ``--threshold``.
+
+Запуск:
+    python scripts/make_bench_data.py --out-dir /tmp/bench/data
+    python scripts/benchmark.py micro --data-dir /tmp/bench/data --save bench/micro.json
+    python scripts/benchmark.py load --data-dir /tmp/bench/data --users 200 --concurrency 16 --duration 30
+    python scripts/benchmark.py load --url http://127.0.0.1:5000 --users 20 --duration 30
+    python scripts/benchmark.py compare bench/micro.json /tmp/micro_new.json --threshold 0.15
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BENCH_PASSWORD = "bench-password"
+DEFAULT_MIX = "smart=4,popular=2,new=2,like=1"
+PERCENTILES = (50, 95, 99)
+
+# ---------------------------------------------------------------------------
+# Статистика и отчёт
+# ---------------------------------------------------------------------------
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def summarize(latencies: Sequence[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Перцентили и среднее в миллисекундах, число вызовов и вызовов в секунду."""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    stats = {"count": int(values.size), "errors": errors,
+             "rps": round(values.size / elapsed, 2) if elapsed > 0 else 0.0,
+             "mean_ms": round(float(values.mean()), 3) if values.size else 0.0}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = round(float(np.percentile(values, p)), 3) if values.size else 0.0
+    return stats
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'name':<24}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'rps':>10}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['count']:>8}{stats['errors']:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['mean_ms']:>10.2f}{stats['rps']:>10.1f}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parents[1], check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(kind: str, args, results: Dict[str, Dict[str, float]], extra: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "kind": kind,
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: str(value) for key, value in vars(args).items() if key != "func"},
+        },
+        **extra,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            metric: str = "p95_ms") -> List[str]:
+    """Печатает изменения ``metric`` и возвращает имена замеров, ухудшившихся больше чем на ``threshold``."""
+    regressions = []
+    print(f"{'name':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base.get(metric):
+            print(f"{name:<24}{'-':>12}{stats[metric]:>12.2f}{'new':>10}")
+            continue
+        change = stats[metric] / base[metric] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<24}{base[metric]:>12.2f}{stats[metric]:>12.2f}{change:>+10.1%}{flag}")
+    for key in ("peak_rss_mb", "load_seconds"):
+        if baseline.get(key) and current.get(key):
+            print(f"{key}: {baseline[key]} -> {current[key]}")
+    return regressions
+
+
+def finish(data: Dict[str, Any], args) -> int:
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Результат сохранён: {args.save}")
+    if args.baseline:
+        regressions = compare(json.loads(args.baseline.read_text(encoding="utf-8")), data, args.threshold)
+        if regressions:
+            print(f"[WARN] Регрессия больше {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Приложение и пользователи
+# ---------------------------------------------------------------------------
+
+def import_app(data_dir: Path, work_dir: Path, recs_cache: bool):
+    """Импортирует ``app`` с данными из ``data_dir`` и новой базой в ``work_dir``; возвращает модуль и время загрузки."""
+    work_dir.mkdir(parents=True, exist_ok=True)
+    database = work_dir / "bench.db"
+    if database.exists():
+        database.unlink()
+    os.environ["RECSYS_DATA_DIR"] = str(data_dir.resolve())
+    os.environ["DATABASE_URL"] = f"sqlite:///{database.resolve()}"
+    os.environ["PRECOMPUTED_RECS_PATH"] = str((work_dir / "precomputed_recs.sqlite").resolve())
+    os.environ["RESOURCE_LOADING"] = "eager"
+    os.environ["ARTIFACTS_WATCH_INTERVAL"] = "0"
+    if not recs_cache:
+        os.environ["RECS_CACHE_MAX_ENTRIES"] = "0"
+
+    started = time.perf_counter()
+    import app as application
+    return application, time.perf_counter() - started
+
+
+def data_description(application) -> Optional[Dict[str, Any]]:
+    """Параметры ``make_bench_data.py`` из манифеста артефактов (для реальных данных — ``None``)."""
+    if not application.bundle_dir(application.ARTIFACTS_DIR):
+        return None
+    return application.ArtifactBundle.open(application.ARTIFACTS_DIR).metadata.get("synthetic")
+
+
+def seed_users(application, n_users: int, likes_per_user: int, rng: np.random.Generator) -> List[int]:
+    """Пользователи сайта с лайками и случайным алгоритмом прямо в базе (один хэш пароля на всех)."""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    tmdb_ids = application.resources.get('movies')['tmdb_id'].dropna().to_numpy(dtype=np.int64)
+    algorithms = ['hybrid', 'content', 'collaborative', 'popular']
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    with application.app.app_context():
+        db = application.db
+        users = [application.User(username=f"bench{i}", email=f"bench{i}@example.com", password_hash=password_hash)
+                 for i in range(n_users)]
+        db.session.add_all(users)
+        db.session.flush()
+        user_ids = [user.id for user in users]
+        likes = []
+        for user_id in user_ids:
+            for tmdb_id in rng.choice(tmdb_ids, min(likes_per_user, tmdb_ids.size), replace=False):
+                likes.append({"user_id": user_id, "tmdb_id": int(tmdb_id), "value": 1 if rng.random() < 0.8 else -1})
+        if likes:
+            db.session.execute(insert(application.Like), likes)
+        db.session.add_all([application.UserSettings(user_id=user_id, recommendation_algorithm=str(rng.choice(algorithms)))
+                            for user_id in user_ids])
+        db.session.commit()
+    return user_ids
+
+
+# ---------------------------------------------------------------------------
+# micro
+# ---------------------------------------------------------------------------
+
+def time_calls(func: Callable[[int], Any], iterations: int, warmup: int) -> Tuple[List[float], float]:
+    for i in range(warmup):
+        func(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+def run_micro(args) -> int:
+    application, load_seconds = import_app(args.data_dir, args.work_dir, recs_cache=True)
+    rng = np.random.default_rng(args.seed)
+    user_ids = seed_users(application, args.users, args.likes, rng)
+    resources = application.resources
+
+    movies = resources.get('movies')
+    titles = movies['title'].to_numpy(dtype=object)
+    ml_users = np.asarray(list(resources.get('cf_engine').user_index), dtype=np.int64)
+    with application.app.app_context():
+        likes_by_user = {uid: application.Like.query.filter_by(user_id=uid).all() for uid in user_ids}
+
+    def pick(values, i):
+        return values[(i * 7919 + args.seed) % len(values)]
+
+    def likes_of(i):
+        uid = pick(user_ids, i)
+        return uid, likes_by_user[uid]
+
+    def content_title(i):
+        application.get_content_recommendations(pick(titles, i), top_n=20)
+
+    def content_batch(i):
+        _, likes = likes_of(i)
+        application.get_batch_content_scores([like.tmdb_id for like in likes], [like.value for like in likes])
+
+    def collaborative_ml(i):
+        application.get_collaborative_recommendations(int(pick(ml_users, i)), top_n=20)
+
+    def collaborative_app(i):
+        uid, likes = likes_of(i)
+        application.get_collaborative_recommendations(uid, top_n=20, user_likes=likes)
+
+    hybrid_settings = application.UserSettings(recommendation_algorithm='hybrid', content_weight=0.6,
+                                               collaborative_weight=0.4)
+
+    def pipeline(i):
+        uid, likes = likes_of(i)
+        exclude_rows = resources.get('catalog').rows_for_tmdb_ids([like.tmdb_id for like in likes])
+        resources.get('candidate_pipeline').run(
+            application.candidate_generators(uid, likes),
+            application.smart_recommendation_weights('hybrid', hybrid_settings),
+            top_n=application.SMART_RECS_COUNT, exclude_rows=exclude_rows[exclude_rows >= 0])
+
+    def feed(name):
+        def page(i):
+            resources.get(name).page(offset=(i * 20) % 200, limit=20)
+        return page
+
+    benchmarks = {
+        "content_title": content_title, "content_batch": content_batch,
+        "collaborative_ml": collaborative_ml, "collaborative_app": collaborative_app,
+        "pipeline": pipeline,
+        "feed_popular": feed('popular_feed'), "feed_new": feed('new_feed'),
+    }
+    selected = args.only or list(benchmarks)
+    results = {}
+    with application.app.app_context():
+        for name in selected:
+            latencies, elapsed = time_calls(benchmarks[name], args.iterations, args.warmup)
+            results[name] = summarize(latencies, elapsed)
+
+    print(f"Загрузка приложения: {load_seconds:.2f} с, пиковый RSS: {peak_rss_mb()} MiB")
+    print_table(results)
+    return finish(report("micro", args, results, {"load_seconds": round(load_seconds, 3),
+                                                  "data": data_description(application)}), args)
+
+
+# ---------------------------------------------------------------------------
+# load
+# ---------------------------------------------------------------------------
+
+class ClientActor:
+    """Пользователь, работающий через Flask test client (сессия выставляется без проверки пароля)."""
+
+    def __init__(self, application, user_id: int):
+        self.client = application.app.test_client()
+        with self.client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+            session["_fresh"] = True
+
+    def get(self, path: str) -> int:
+        return self.client.get(path).status_code
+
+    def post(self, path: str, payload: Dict[str, Any]) -> int:
+        return self.client.post(path, json=payload).status_code
+
+
+class HttpActor:
+    """Пользователь запущенного сервера: регистрируется, входит и ставит лайки через API."""
+
+    def __init__(self, base_url: str, username: str, tmdb_ids: Sequence[int], timeout: float = 30.0):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.post(f"{self.base_url}/api/register", timeout=timeout,
+                          json={"username": username, "email": f"{username}@example.com", "password": BENCH_PASSWORD})
+        response = self.session.post(f"{self.base_url}/api/login", timeout=timeout,
+                                     json={"username": username, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        for tmdb_id in tmdb_ids:
+            self.post("/api/like", {"tmdb_id": int(tmdb_id), "value": 1})
+
+    def get(self, path: str) -> int:
+        return self.session.get(self.base_url + path, timeout=self.timeout).status_code
+
+    def post(self, path: str, payload: Dict[str, Any]) -> int:
+        return self.session.post(self.base_url + path, json=payload, timeout=self.timeout).status_code
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {"smart", "popular", "new", "like"}
+    if unknown:
+        raise SystemExit(f"Неизвестные запросы в --mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def run_load(args) -> int:
+    rng = np.random.default_rng(args.seed)
+    extra: Dict[str, Any] = {}
+    if args.url:
+        import requests
+
+        popular = requests.get(f"{args.url.rstrip('/')}/api/popular", params={"limit": 100}, timeout=30).json()
+        tmdb_ids = np.array([movie["tmdb_id"] for movie in popular], dtype=np.int64)
+        prefix = f"bench{int(time.time())}_"
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            actors = list(pool.map(lambda i: HttpActor(args.url, f"{prefix}{i}", rng.choice(tmdb_ids, min(args.likes, tmdb_ids.size), replace=False)),
+                                   range(args.users)))
+    else:
+        application, load_seconds = import_app(args.data_dir, args.work_dir, recs_cache=not args.no_recs_cache)
+        user_ids = seed_users(application, args.users, args.likes, rng)
+        tmdb_ids = application.resources.get('movies')['tmdb_id'].dropna().to_numpy(dtype=np.int64)
+        actors = [ClientActor(application, user_id) for user_id in user_ids]
+        extra["load_seconds"] = round(load_seconds, 3)
+        extra["data"] = data_description(application)
+
+    mix = parse_mix(args.mix)
+    names = list(mix)
+    probabilities = np.array([mix[name] for name in names]) / sum(mix.values())
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    remaining = [args.requests or 0]
+
+    def request(actor, name: str, worker_rng: np.random.Generator) -> int:
+        if name == "smart":
+            return actor.get("/api/smart-recommendations")
+        if name in ("popular", "new"):
+            return actor.get(f"/api/{name}?offset={int(worker_rng.integers(0, 5)) * 20}&limit=20")
+        return actor.post("/api/like", {"tmdb_id": int(worker_rng.choice(tmdb_ids)),
+                                        "value": 1 if worker_rng.random() < 0.8 else -1})
+
+    def worker(index: int) -> None:
+        worker_rng = np.random.default_rng(args.seed + 1 + index)
+        own = actors[index::args.concurrency] or actors
+        i = 0
+        while time.perf_counter() < deadline:
+            if args.requests:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            name = names[worker_rng.choice(len(names), p=probabilities)]
+            started = time.perf_counter()
+            try:
+                status = request(own[i % len(own)], name, worker_rng)
+            except Exception:
+                status = 599
+            latency = time.perf_counter() - started
+            with lock:
+                samples[name].append(latency)
+                if status >= 400:
+                    errors[name] += 1
+            i += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(samples[name], elapsed, errors[name]) for name in names}
+    everything = [latency for name in names for latency in samples[name]]
+    results["total"] = summarize(everything, elapsed, sum(errors.values()))
+    print(f"{args.users} пользователей, {args.concurrency} потоков, {elapsed:.1f} с, "
+          f"пиковый RSS: {peak_rss_mb()} MiB")
+    print_table(results)
+    return finish(report("load", args, results, extra), args)
+
+
+# ---------------------------------------------------------------------------
+# Основной скрипт
+# ---------------------------------------------------------------------------
+
+def run_compare(args) -> int:
+    baseline = json.loads(args.baseline_file.read_text(encoding="utf-8"))
+    current = json.loads(args.current_file.read_text(encoding="utf-8"))
+    regressions = compare(baseline, current, args.threshold, args.metric)
+    if regressions:
+        print(f"[WARN] Регрессия больше {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and load benchmarks for the recommendation API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument("--data-dir", type=Path, default=Path("streamlit_data"),
+                         help="Каталог данных приложения (см. make_bench_data.py)")
+        sub.add_argument("--work-dir", type=Path, default=Path(tempfile.gettempdir()) / "recsys_bench",
+                         help="Куда писать базу пользователей на время замера")
+        sub.add_argument("--users", type=int, default=100, help="Пользователей сайта")
+        sub.add_argument("--likes", type=int, default=20, help="Лайков у каждого пользователя")
+        sub.add_argument("--seed", type=int, default=0)
+        sub.add_argument("--save", type=Path, default=None, help="Сохранить результат в JSON")
+        sub.add_argument("--baseline", type=Path, default=None, help="Сравнить с сохранённым результатом")
+        sub.add_argument("--threshold", type=float, default=0.2, help="Допустимый рост p95 (0.2 = 20%%)")
+
+    micro = subparsers.add_parser("micro", help="Замеры отдельных функций рекомендаций")
+    add_common(micro)
+    micro.add_argument("--iterations", type=int, default=200)
+    micro.add_argument("--warmup", type=int, default=20)
+    micro.add_argument("--only", nargs="+", default=None, help="Запустить только эти замеры")
+    micro.set_defaults(func=run_micro)
+
+    load = subparsers.add_parser("load", help="Нагрузка на HTTP API")
+    add_common(load)
+    load.add_argument("--url", default=None, help="Адрес запущенного сервера (по умолчанию Flask test client)")
+    load.add_argument("--concurrency", type=int, default=8, help="Одновременных пользователей (потоков)")
+    load.add_argument("--duration", type=float, default=20.0, help="Длительность, сек")
+    load.add_argument("--requests", type=int, default=None, help="Остановиться после N запросов")
+    load.add_argument("--mix", default=DEFAULT_MIX, help="Доли запросов: smart, popular, new, like")
+    load.add_argument("--no-recs-cache", action="store_true", help="Отключить кэш рекомендаций (test client)")
+    load.set_defaults(func=run_load)
+
+    cmp_parser = subparsers.add_parser("compare", help="Сравнить два JSON-результата")
+    cmp_parser.add_argument("baseline_file", type=Path)
+    cmp_parser.add_argument("current_file", type=Path)
+    cmp_parser.add_argument("--threshold", type=float, default=0.2)
+    cmp_parser.add_argument("--metric", default="p95_ms", choices=[f"p{p}_ms" for p in PERCENTILES] + ["mean_ms"])
+    cmp_parser.set_defaults(func=run_compare)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
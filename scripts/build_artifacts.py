@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+"""build_artifacts.py
+
+Скриптовая замена ноутбука ``Проект_рексис V1.ipynb``: строит артефакты
+приложения прямо из CSV-файлов датасета The Movies Dataset.
+
+Этапы:
+    parse       — разбор movies_metadata / keywords / credits (пул процессов),
+                  links и ratings;
+    join        — сборка ``movies_df`` и фильтрация оценок;
+    tfidf       — «суп» из описания, жанров, ключевых слов, актёров и режиссёра;
+    neighbours  — top-K соседей по косинусной близости без матрицы N×N;
+    svd         — обучение ``surprise.SVD`` (и кросс-валидация);
+    ann         — IVF-индексы по факторам ``[qi, bi]`` (MIPS) и по tf-idf,
+                  сжатому TruncatedSVD до ``--content-dim``;
+    feeds       — взвешенный рейтинг, «Популярное» и «Новинки»;
+    export      — запись ``streamlit_data/artifacts`` (см. ``recsys/artifacts.py``).
+
+Результат каждого этапа кэшируется в ``<data-dir>/.build_cache`` под ключом
+из хэшей содержимого входных файлов, ключей предыдущих этапов и параметров.
+Если входы не изменились, этап пропускается, поэтому ночная пересборка
+пересчитывает только то, что зависит от изменившихся данных.
+
+Запуск:
+    python scripts/build_artifacts.py --dataset-dir dataset
+    python scripts/build_artifacts.py --dataset-dir dataset --workers 8 --cv-folds 0
+    python scripts/build_artifacts.py --dataset-dir dataset --ratings-file ratings.csv --links-file links.csv
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recsys.ann import IVFIndex, recall_report  # noqa: E402
+from recsys.artifacts import ArtifactBundle, ArtifactWriter, bundle_dir  # noqa: E402
+from recsys.cf_engine import SVDScorer  # noqa: E402
+from recsys.content_index import DEFAULT_K, NeighbourIndex  # noqa: E402
+from recsys.ratings import RatingsCSR  # noqa: E402
+from recsys.topn import top_n_indices  # noqa: E402
+
+# Увеличивается при изменении логики этапов, чтобы не читать старый кэш.
+PIPELINE_VERSION = 3
+
+POPULAR_TOP_N = 50
+NEW_ITEMS_TOP_N = 20
+
+
+# --- Кэш этапов ---
+
+class StageCache:
+    """Результаты этапов в pickle-файлах, адресуемых хэшем входов."""
+
+    def __init__(self, root: Path, force: bool = False):
+        self.root = root
+        self.force = force
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._digests_path = root / "file_digests.json"
+        self._digests = json.loads(self._digests_path.read_text()) if self._digests_path.exists() else {}
+
+    def file_digest(self, path: Path) -> str:
+        """SHA-256 содержимого файла; запоминается по (размер, mtime), чтобы не читать его повторно."""
+        stat = path.stat()
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        cached = self._digests.get(str(path))
+        if cached and cached["stamp"] == stamp:
+            return cached["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self._digests[str(path)] = {"stamp": stamp, "sha256": digest.hexdigest()}
+        self._digests_path.write_text(json.dumps(self._digests, indent=2))
+        return digest.hexdigest()
+
+    def run(self, name: str, key_parts: Dict[str, Any], compute: Callable[[], Any]) -> Tuple[Any, str]:
+        """Возвращает ``(результат, ключ)`` этапа, вычисляя его только при промахе кэша."""
+        key = hashlib.sha256(json.dumps(
+            {"stage": name, "pipeline": PIPELINE_VERSION, **key_parts}, sort_keys=True, default=str,
+        ).encode()).hexdigest()
+        path = self.root / f"{name}-{key[:16]}.pkl"
+        if path.exists() and not self.force:
+            print(f"[{name}] без изменений, из кэша {path.name}")
+            with open(path, "rb") as f:
+                return pickle.load(f), key
+
+        started = time.perf_counter()
+        value = compute()
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        for stale in self.root.glob(f"{name}-*.pkl"):
+            if stale != path:
+                stale.unlink()
+        print(f"[{name}] готово за {time.perf_counter() - started:.1f} с")
+        return value, key
+
+
+# --- parse: функции верхнего уровня, чтобы их можно было передать в пул процессов ---
+
+def safe_literal_eval(val):
+    if pd.isna(val) or not isinstance(val, str):
+        return []
+    try:
+        return ast.literal_eval(val)
+    except (ValueError, SyntaxError, TypeError):
+        return []
+
+
+def _names(items) -> list:
+    return [item['name'] for item in items] if isinstance(items, list) else []
+
+
+def _with_tmdb_id(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk.copy()
+    chunk['id'] = pd.to_numeric(chunk['id'], errors='coerce')
+    chunk = chunk.dropna(subset=['id'])
+    chunk['id'] = chunk['id'].astype(int)
+    return chunk.rename(columns={'id': 'tmdb_id'})
+
+
+def parse_metadata_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = _with_tmdb_id(chunk)
+    chunk['genres'] = [_names(safe_literal_eval(value)) for value in chunk['genres']]
+    for col in ['budget', 'revenue', 'runtime', 'popularity', 'vote_average', 'vote_count']:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce').fillna(0)
+    chunk['release_date'] = pd.to_datetime(chunk['release_date'], errors='coerce')
+    chunk = chunk[['tmdb_id', 'title', 'overview', 'genres', 'release_date',
+                   'popularity', 'vote_average', 'vote_count', 'runtime',
+                   'budget', 'revenue', 'poster_path']]
+    chunk['overview'] = chunk['overview'].fillna('')
+    return chunk
+
+
+def parse_keywords_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = _with_tmdb_id(chunk)
+    chunk['keywords'] = [_names(safe_literal_eval(value)) for value in chunk['keywords']]
+    return chunk[['tmdb_id', 'keywords']]
+
+
+def get_director(crew_list) -> str:
+    for member in crew_list:
+        if member.get('job') == 'Director':
+            return member.get('name', '')
+    return ''
+
+
+def get_top_n_cast(cast_list, n: int = 5) -> list:
+    return [member.get('name', '') for member in cast_list[:n]]
+
+
+def parse_credits_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = _with_tmdb_id(chunk)
+    chunk['director'] = [get_director(safe_literal_eval(value)) for value in chunk['crew']]
+    chunk['cast'] = [get_top_n_cast(safe_literal_eval(value)) for value in chunk['cast']]
+    return chunk[['tmdb_id', 'cast', 'director']]
+
+
+def parse_csv_parallel(path: Path, parse_chunk: Callable[[pd.DataFrame], pd.DataFrame],
+                       workers: int, chunksize: int) -> pd.DataFrame:
+    """Читает CSV кусками и разбирает их параллельно; порядок строк сохраняется."""
+    chunks: Iterable[pd.DataFrame] = pd.read_csv(path, chunksize=chunksize, low_memory=False)
+    if workers <= 1:
+        return pd.concat([parse_chunk(chunk) for chunk in chunks], ignore_index=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_chunk, chunk) for chunk in chunks]
+        return pd.concat([future.result() for future in futures], ignore_index=True)
+
+
+def parse_links(path: Path) -> pd.DataFrame:
+    links_df = pd.read_csv(path)
+    links_df['tmdbId'] = pd.to_numeric(links_df['tmdbId'], errors='coerce')
+    links_df.dropna(subset=['tmdbId'], inplace=True)
+    links_df['tmdbId'] = links_df['tmdbId'].astype('Int64')
+    links_df.rename(columns={'tmdbId': 'tmdb_id', 'movieId': 'movieId_ml'}, inplace=True)
+    return links_df[['movieId_ml', 'tmdb_id']]
+
+
+# --- join / tfidf / neighbours / svd / feeds ---
+
+def join_movies(metadata_df, keywords_df, credits_df, links_df, ratings: RatingsCSR):
+    movies_df = metadata_df.merge(keywords_df, on='tmdb_id', how='left')
+    movies_df = movies_df.merge(credits_df, on='tmdb_id', how='left')
+
+    for col in ['keywords', 'cast', 'genres']:
+        movies_df[col] = movies_df[col].apply(lambda x: x if isinstance(x, list) else [])
+    movies_df['director'] = movies_df['director'].fillna('')
+    movies_df['overview'] = movies_df['overview'].fillna('')
+
+    movies_df = movies_df.merge(links_df, on='tmdb_id', how='left')
+    movies_df.drop_duplicates(subset=['tmdb_id'], inplace=True)
+    movies_df.sort_values(['popularity', 'vote_count'], ascending=[False, False], inplace=True)
+    movies_df.drop_duplicates(subset=['title'], keep='first', inplace=True)
+    movies_df.reset_index(drop=True, inplace=True)
+
+    valid_movie_ids_ml = movies_df['movieId_ml'].dropna().unique()
+    return movies_df, ratings.filter_items(valid_movie_ids_ml)
+
+
+def build_tfidf(movies_df: pd.DataFrame, min_df: int):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    genres_str = movies_df['genres'].apply(lambda x: ' '.join(x) if isinstance(x, list) else '')
+    keywords_str = movies_df['keywords'].apply(lambda x: ' '.join(x) if isinstance(x, list) else '')
+    cast_str = movies_df['cast'].apply(lambda x: ' '.join(member.replace(" ", "") for member in x) if isinstance(x, list) else '')
+    director_str = movies_df['director'].apply(lambda x: x.replace(" ", "") if isinstance(x, str) else '')
+    soup = (movies_df['overview'] + ' ' + genres_str + ' ' + keywords_str + ' '
+            + (cast_str + ' ') * 3 + (director_str + ' ') * 3).fillna('')
+
+    tfidf = TfidfVectorizer(stop_words='english', min_df=min_df)
+    tfidf_matrix = tfidf.fit_transform(soup)
+    return tfidf, tfidf_matrix.astype(np.float32)
+
+
+def train_svd(ratings: RatingsCSR, params: Dict[str, Any], cv_folds: int, workers: int):
+    from surprise import SVD, Dataset, Reader
+    from surprise.model_selection import cross_validate
+
+    reader = Reader(rating_scale=(0.5, 5.0))
+    data_surprise = Dataset.load_from_df(ratings.to_frame(), reader)
+    algo_svd = SVD(**params)
+    algo_svd.fit(data_surprise.build_full_trainset())
+
+    metrics = {}
+    if cv_folds > 1:
+        cv_results = cross_validate(SVD(**params), data_surprise, measures=['RMSE', 'MAE'],
+                                    cv=cv_folds, n_jobs=workers)
+        metrics = {'rmse': float(cv_results['test_rmse'].mean()), 'mae': float(cv_results['test_mae'].mean())}
+    return SVDScorer.from_surprise(algo_svd), metrics
+
+
+def build_feeds(movies_df: pd.DataFrame, ratings: RatingsCSR):
+    movies_df = movies_df.copy()
+    C = movies_df['vote_average'].mean()
+    m = movies_df['vote_count'].quantile(0.90)
+    v, R = movies_df['vote_count'], movies_df['vote_average']
+    movies_df['weighted_rating'] = (v / (v + m) * R) + (m / (v + m) * C)
+
+    popular_movies_df = movies_df.sort_values('weighted_rating', ascending=False)
+    top_popular = popular_movies_df[['title', 'tmdb_id', 'poster_path', 'overview', 'genres',
+                                     'release_date', 'weighted_rating']].head(POPULAR_TOP_N).copy()
+
+    candidate_movies_for_new = movies_df[
+        movies_df['poster_path'].notna() & (movies_df['overview'] != '')
+    ]
+    rated_tmdb_ids = movies_df.loc[movies_df['movieId_ml'].isin(ratings.rated_items), 'tmdb_id'].dropna().unique()
+    new_items_df = candidate_movies_for_new[~candidate_movies_for_new['tmdb_id'].isin(rated_tmdb_ids)]
+    new_items_df = new_items_df.dropna(subset=['release_date']).sort_values(
+        ['release_date', 'weighted_rating', 'popularity'], ascending=[False, False, False])
+    return movies_df, top_popular, new_items_df.head(NEW_ITEMS_TOP_N).copy()
+
+
+def build_ann(scorer: SVDScorer, tfidf_matrix, nlist: Optional[int], content_dim: int, seed: int):
+    """IVF-индексы по факторам SVD и по tf-idf.
+
+    Content-индекс ищет по tf-idf, сжатому TruncatedSVD до ``content_dim``:
+    доранжирование кандидатов точное только в этом пространстве, поэтому даже
+    при просмотре всех кластеров выдача приближает косинус полных tf-idf
+    векторов (см. ``--ann-check``).
+    """
+    from sklearn.decomposition import TruncatedSVD
+
+    cf_ann = IVFIndex.build(scorer.item_vectors(), nlist=nlist, mips=True, seed=seed)
+    n_components = max(1, min(content_dim, tfidf_matrix.shape[1] - 1))
+    reduced = TruncatedSVD(n_components=n_components, random_state=seed).fit_transform(tfidf_matrix)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    content_ann = IVFIndex.build(reduced / np.where(norms > 0, norms, 1.0), nlist=nlist, seed=seed)
+    return cf_ann, content_ann
+
+
+def print_ann_recall(name: str, index: IVFIndex, queries: np.ndarray, exact_scores,
+                     exclude: Optional[np.ndarray] = None) -> None:
+    """``exact_scores(i)`` — эталонные оценки всех элементов для ``queries[i]``."""
+    def exact_top(i):
+        scores = np.asarray(exact_scores(i), dtype=np.float64).ravel()
+        if exclude is not None:
+            scores[exclude[i]] = -np.inf
+        return top_n_indices(scores, 10)
+
+    report = recall_report(index, queries, exact_top, nprobes=[1, 2, 4, 8, 16, 32, index.nlist], exclude=exclude)
+    for row in report:
+        print(f"[ann] {name}: nprobe={row['nprobe']:>4}  recall@10={row['recall']:.3f}  "
+              f"{row['ms_per_query']:.2f} мс/запрос")
+
+
+# --- export ---
+
+def export(out_dir: Path, build_key: str, movies_df, top_popular, new_items_df, ratings: RatingsCSR,
+           neighbours: NeighbourIndex, scorer: SVDScorer, metrics: Dict[str, float],
+           ann_indexes: Optional[Tuple[IVFIndex, IVFIndex]]) -> Dict[str, Any]:
+    writer = ArtifactWriter(str(out_dir))
+    writer.add_frame("movies", movies_df)
+    writer.add_frame("popular_movies", top_popular)
+    writer.add_frame("new_items", new_items_df)
+    writer.add_frame("movies_cb", movies_df[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']])
+    cb_indices = pd.Series(movies_df.index, index=movies_df['title']).drop_duplicates()
+    writer.add_frame("cb_indices", pd.DataFrame({
+        "title": cb_indices.index.astype(str), "cb_index": cb_indices.to_numpy(dtype=np.int64),
+    }))
+    ratings.save_to(writer)
+    scorer.save_to(writer)
+    neighbours.save_to(writer)
+    if ann_indexes is not None:
+        ann_indexes[0].save_to(writer, "cf_ann")
+        ann_indexes[1].save_to(writer, "content_ann")
+    writer.metadata["svd_eval_metrics"] = metrics
+    writer.metadata["build_key"] = build_key
+    return writer.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build app artifacts from the raw Movies Dataset CSV files")
+    parser.add_argument("--dataset-dir", type=Path, default=Path("dataset"),
+                        help="Каталог с CSV датасета (movies_metadata.csv, credits.csv, ...)")
+    parser.add_argument("--data-dir", type=Path, default=Path("streamlit_data"),
+                        help="Каталог артефактов приложения")
+    parser.add_argument("--out-dir", type=Path, default=None,
+                        help="Куда писать артефакты (по умолчанию <data-dir>/artifacts)")
+    parser.add_argument("--cache-dir", type=Path, default=None,
+                        help="Кэш этапов (по умолчанию <data-dir>/.build_cache)")
+    parser.add_argument("--ratings-file", default="ratings_small.csv", help="Файл оценок в --dataset-dir")
+    parser.add_argument("--links-file", default="links_small.csv", help="Файл связей MovieLens↔TMDB в --dataset-dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Размер пула процессов для разбора CSV и кросс-валидации")
+    parser.add_argument("--chunksize", type=int, default=5000,
+                        help="Строк в одном куске при параллельном разборе")
+    parser.add_argument("--min-df", type=int, default=3, help="min_df для TfidfVectorizer")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Число соседей в content-based индексе")
+    parser.add_argument("--svd-factors", type=int, default=100)
+    parser.add_argument("--svd-epochs", type=int, default=30)
+    parser.add_argument("--svd-lr", type=float, default=0.005)
+    parser.add_argument("--svd-reg", type=float, default=0.04)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ann-nlist", type=int, default=None,
+                        help="Кластеров в ANN-индексах (по умолчанию 4·sqrt(N), 0 — не строить)")
+    parser.add_argument("--content-dim", type=int, default=128,
+                        help="Размерность tf-idf после TruncatedSVD для ANN-индекса")
+    parser.add_argument("--ann-check", action="store_true",
+                        help="Напечатать полноту и время поиска ANN для разных nprobe")
+    parser.add_argument("--cv-folds", type=int, default=3, help="Фолды кросс-валидации SVD (0 — не считать)")
+    parser.add_argument("--force", action="store_true", help="Пересчитать все этапы, игнорируя кэш")
+    args = parser.parse_args()
+
+    out_dir = args.out_dir or args.data_dir / "artifacts"
+    cache = StageCache(args.cache_dir or args.data_dir / ".build_cache", force=args.force)
+
+    def source(name):
+        path = args.dataset_dir / name
+        if not path.exists():
+            raise FileNotFoundError(f"Файл {path} не найден. Укажите --dataset-dir.")
+        return path, {"file": name, "sha256": cache.file_digest(path)}
+
+    started = time.perf_counter()
+
+    # parse
+    parsed = {}
+    for name, parse_chunk in (("movies_metadata.csv", parse_metadata_chunk),
+                              ("keywords.csv", parse_keywords_chunk),
+                              ("credits.csv", parse_credits_chunk)):
+        path, digest = source(name)
+        parsed[name] = cache.run(f"parse_{path.stem}", {"input": digest},
+                                 lambda: parse_csv_parallel(path, parse_chunk, args.workers, args.chunksize))
+    links_path, links_digest = source(args.links_file)
+    parsed["links"] = cache.run("parse_links", {"input": links_digest}, lambda: parse_links(links_path))
+    ratings_path, ratings_digest = source(args.ratings_file)
+    # Оценки сразу раскладываются в CSR потоково: полный ratings.csv — 26 млн строк.
+    parsed["ratings"] = cache.run("parse_ratings", {"input": ratings_digest},
+                                  lambda: RatingsCSR.from_csv(str(ratings_path), chunksize=args.chunksize * 200))
+
+    # join
+    (movies_df, ratings), join_key = cache.run(
+        "join", {"inputs": [key for _, key in parsed.values()]},
+        lambda: join_movies(*(value for value, _ in parsed.values())))
+    print(f"Фильмов: {len(movies_df)}, оценок: {len(ratings)}, пользователей: {ratings.n_users}")
+
+    # tfidf -> neighbours
+    (_, tfidf_matrix), tfidf_key = cache.run(
+        "tfidf", {"join": join_key, "min_df": args.min_df},
+        lambda: build_tfidf(movies_df, args.min_df))
+    neighbours, neighbours_key = cache.run(
+        "neighbours", {"tfidf": tfidf_key, "k": args.k},
+        lambda: NeighbourIndex.from_vectors(tfidf_matrix, k=args.k))
+
+    # svd: зависит только от оценок, а не от изменений метаданных фильмов
+    ratings_digest = hashlib.sha256()
+    for array in (ratings.user_ids, ratings.indptr, ratings.items, ratings.values):
+        ratings_digest.update(np.ascontiguousarray(array).tobytes())
+    svd_params = {"n_factors": args.svd_factors, "n_epochs": args.svd_epochs, "lr_all": args.svd_lr,
+                  "reg_all": args.svd_reg, "random_state": args.seed}
+    (scorer, metrics), svd_key = cache.run(
+        "svd", {"ratings": ratings_digest.hexdigest(), "params": svd_params, "cv_folds": args.cv_folds},
+        lambda: train_svd(ratings, svd_params, args.cv_folds, args.workers))
+
+    # feeds
+    (movies_df, top_popular, new_items_df), feeds_key = cache.run(
+        "feeds", {"join": join_key, "top_popular": POPULAR_TOP_N, "top_new": NEW_ITEMS_TOP_N},
+        lambda: build_feeds(movies_df, ratings))
+
+    # ann
+    ann_indexes, ann_key = None, "none"
+    if args.ann_nlist != 0:
+        ann_indexes, ann_key = cache.run(
+            "ann", {"svd": svd_key, "tfidf": tfidf_key, "nlist": args.ann_nlist,
+                    "content_dim": args.content_dim, "seed": args.seed},
+            lambda: build_ann(scorer, tfidf_matrix, args.ann_nlist, args.content_dim, args.seed))
+        if args.ann_check:
+            cf_ann, content_ann = ann_indexes
+            rng = np.random.default_rng(args.seed)
+            users = np.hstack([scorer.pu, np.ones((scorer.pu.shape[0], 1))])
+            item_vectors = scorer.item_vectors()
+            queries = users[rng.choice(len(users), min(200, len(users)), replace=False)]
+            print_ann_recall("cf", cf_ann, queries, lambda i: item_vectors @ queries[i])
+            # Эталон content-индекса — косинус полных tf-idf векторов (как у NeighbourIndex), а не сжатых:
+            # полнота при nprobe = nlist показывает потерю от TruncatedSVD.
+            vectors = content_ann.vectors
+            sample = rng.choice(len(vectors), min(200, len(vectors)), replace=False)
+            print_ann_recall("content/svd", content_ann, vectors[sample], lambda i: vectors @ vectors[sample[i]],
+                             exclude=sample)
+            print_ann_recall("content/tfidf", content_ann, vectors[sample],
+                             lambda i: (tfidf_matrix @ tfidf_matrix[sample[i]].T).toarray(), exclude=sample)
+
+    # export
+    build_key = hashlib.sha256(f"{neighbours_key}:{svd_key}:{feeds_key}:{ann_key}".encode()).hexdigest()
+    if bundle_dir(str(out_dir)) is not None and not args.force:
+        current = ArtifactBundle.open(str(out_dir))
+        if current.metadata.get("build_key") == build_key:
+            print(f"[export] артефакты версии {current.version} актуальны, экспорт пропущен")
+            return
+
+    manifest = export(out_dir, build_key, movies_df, top_popular, new_items_df, ratings,
+                      neighbours, scorer, metrics, ann_indexes)
+    total = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"Готово за {time.perf_counter() - started:.1f} с! Версия {manifest['version']}, "
+          f"{len(manifest['files'])} файлов, {total / 2**20:.1f} MiB -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""build_content_index.py
+
+Строит компактный индекс ближайших соседей для content-based рекомендаций
+из плотной матрицы ``content_similarity_matrix.pkl``, которую сохраняет
+ноутбук.
+
+1. Загружает матрицу косинусной близости N×N.
+2. Для каждого фильма оставляет ``--k`` лучших соседей (без самого фильма).
+3. Сохраняет ``content_neighbours.npz`` (CSR: indptr / indices int32 /
+   scores float32) рядом с остальными артефактами.
+4. С флагом ``--check`` сравнивает top-N индекса с полной сортировкой
+   плотной матрицы на случайной выборке строк.
+
+Запуск:
+    python scripts/build_content_index.py                 # k=100
+    python scripts/build_content_index.py --k 50 --check  # с проверкой
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recsys.content_index import DEFAULT_K, NeighbourIndex, parity_report  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build top-K content neighbour index")
+    parser.add_argument("--data-dir", type=Path, default=Path("streamlit_data"),
+                        help="Каталог с артефактами ноутбука")
+    parser.add_argument("--k", type=int, default=DEFAULT_K,
+                        help="Сколько соседей хранить для каждого фильма")
+    parser.add_argument("--check", action="store_true",
+                        help="Проверить совпадение с плотной матрицей")
+    parser.add_argument("--check-rows", type=int, default=500,
+                        help="Сколько строк проверять (0 — все)")
+    parser.add_argument("--check-top-n", type=int, default=10,
+                        help="Глубина сравнения top-N")
+    args = parser.parse_args()
+
+    dense_path = args.data_dir / "content_similarity_matrix.pkl"
+    if not dense_path.exists():
+        raise FileNotFoundError(f"Файл {dense_path} не найден. Укажите --data-dir.")
+
+    similarity = np.asarray(pd.read_pickle(dense_path))
+    print(f"Плотная матрица: {similarity.shape}, {similarity.nbytes / 2**20:.1f} MiB")
+
+    index = NeighbourIndex.from_dense(similarity, k=args.k)
+    out_path = args.data_dir / "content_neighbours.npz"
+    index.save(str(out_path))
+    print(f"Индекс соседей (k={index.k}): {index.nbytes / 2**20:.1f} MiB -> {out_path}")
+
+    if args.check:
+        n_items = similarity.shape[0]
+        if args.check_rows and args.check_rows < n_items:
+            rows = np.random.default_rng(0).choice(n_items, args.check_rows, replace=False)
+        else:
+            rows = range(n_items)
+        report = parity_report(similarity, index, top_n=min(args.check_top_n, index.k), rows=rows)
+        print(f"Проверка: строк {report['rows_checked']}, "
+              f"точное совпадение {report['exact_match_ratio']:.2%}, "
+              f"среднее пересечение {report['mean_overlap']:.2%}")
+        if report["mean_overlap"] < 1.0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""build_poster_thumbs.py
+
+Готовит уменьшенные копии постеров, скачанных ``fetch_imdb_posters.py``.
+
+1. Читает ``links_with_posters.parquet`` и для каждого фильма с
+   ``local_poster`` открывает исходный файл в ``static/``.
+2. Для каждой ширины из ``--widths`` (высота — по пропорциям) сохраняет
+   WebP и JPEG в ``static/posters/w<ширина>/``. Имя файла содержит хэш
+   содержимого (``tt0114709.3f9c0a1b2d4e5f60.webp``), поэтому однажды
+   опубликованный файл не меняется и отдаётся с ``Cache-Control: immutable``.
+3. Записывает варианты в колонку ``poster_variants`` (JSON-список
+   ``{"width", "format", "path"}``) той же таблицы; приложение выбирает из
+   неё ``poster_url`` и ``poster_srcset``.
+
+Повторный запуск пропускает постеры, у которых не изменился исходный файл
+(колонка ``poster_source_hash``) и на месте все варианты.
+
+Запуск:
+    python scripts/build_poster_thumbs.py
+    python scripts/build_poster_thumbs.py --widths 154 342 500 --workers 8
+    python scripts/build_poster_thumbs.py --links streamlit_data/links_with_posters.parquet --static-dir static
+
+Требует пакета ``Pillow`` (с поддержкой WebP).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    from PIL import Image
+except ImportError:
+    sys.exit("Для уменьшения постеров нужен пакет Pillow: pip install Pillow")
+
+DEFAULT_WIDTHS = (154, 342, 500)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+HASH_LENGTH = 16
+
+# ---------------------------------------------------------------------------
+# Функции
+# ---------------------------------------------------------------------------
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def variants_exist(static_dir: Path, variants_json: Optional[str]) -> bool:
+    if not isinstance(variants_json, str):
+        return False
+    return all((static_dir / variant["path"]).exists() for variant in json.loads(variants_json))
+
+
+def build_variants(source: Path, static_dir: Path, widths: Sequence[int]) -> Tuple[str, List[Dict]]:
+    """Хэш исходника и список записанных вариантов постера (выполняется в процессах пула)."""
+    source_hash = file_hash(source)
+    variants = []
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        for width in widths:
+            # Не увеличиваем: для маленького исходника вариант шире него не нужен.
+            target_width = min(width, image.width)
+            height = max(1, round(image.height * target_width / image.width))
+            resized = image.resize((target_width, height), Image.LANCZOS) if target_width != image.width else image
+            for name, (pil_format, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                content = buffer.getvalue()
+                digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+                relative = Path("posters") / f"w{width}" / f"{source.stem}.{digest}.{EXTENSIONS[name]}"
+                dest = static_dir / relative
+                if not dest.exists():
+                    dest.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = dest.with_name(dest.name + ".part")
+                    tmp.write_bytes(content)
+                    os.replace(tmp, dest)
+                variants.append({"width": target_width, "format": name, "path": relative.as_posix()})
+            if target_width < width:
+                break
+    return source_hash, variants
+
+
+# ---------------------------------------------------------------------------
+# Основной скрипт
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Build resized, content-hashed poster variants")
+    parser.add_argument("--links", type=Path, default=Path("streamlit_data/links_with_posters.parquet"),
+                        help="Таблица с колонкой local_poster (результат fetch_imdb_posters.py)")
+    parser.add_argument("--static-dir", type=Path, default=Path("static"),
+                        help="Каталог статики, относительно которого записан local_poster")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS),
+                        help="Ширины вариантов, px")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not args.links.exists():
+        raise FileNotFoundError(f"Файл {args.links} не найден. Сначала запустите fetch_imdb_posters.py.")
+    links_df = pd.read_parquet(args.links)
+    for column in ("poster_variants", "poster_source_hash"):
+        if column not in links_df.columns:
+            links_df[column] = pd.Series(None, index=links_df.index, dtype=object)
+
+    widths = sorted(set(args.widths))
+    todo = []
+    for idx, local_poster in links_df["local_poster"].dropna().items():
+        source = args.static_dir / local_poster
+        if not source.exists():
+            continue
+        previous_hash = links_df.at[idx, "poster_source_hash"]
+        if isinstance(previous_hash, str) and previous_hash == file_hash(source) and \
+                variants_exist(args.static_dir, links_df.at[idx, "poster_variants"]):
+            continue
+        todo.append((idx, source))
+
+    print(f"Нужно подготовить варианты для {len(todo)} постеров")
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [(idx, pool.submit(build_variants, source, args.static_dir, widths)) for idx, source in todo]
+        for idx, future in futures:
+            try:
+                source_hash, variants = future.result()
+            except OSError as e:
+                print(f"[WARN] Не удалось обработать {links_df.at[idx, 'local_poster']}: {e}")
+                failed += 1
+                continue
+            links_df.at[idx, "poster_source_hash"] = source_hash
+            links_df.at[idx, "poster_variants"] = json.dumps(variants)
+
+    tmp_path = args.links.with_name(args.links.name + ".tmp")
+    links_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, args.links)
+    print(f"Готово за {time.perf_counter() - started:.1f} с! Обработано: {len(todo) - failed}, ошибок: {failed}. "
+          f"Таблица обновлена: {args.links}")
+
+
+if __name__ == "__main__":
+    main()
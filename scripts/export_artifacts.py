@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""export_artifacts.py
+
+Скриптовый аналог ячейки экспорта из ноутбука: переводит pickle-артефакты
+``streamlit_data/*.pkl`` в формат, который приложение открывает через
+memory mapping (см. ``recsys/artifacts.py``).
+
+1. Загружает pickle-файлы, сохранённые ноутбуком.
+2. Извлекает факторы SVD и индекс соседей (``content_neighbours.npz``,
+   либо строит его из плотной матрицы) в ``.npy`` и строит IVF-индекс
+   по факторам (tf-idf ноутбук не сохраняет, content-индекс строит
+   ``build_artifacts.py``).
+3. Оценки сохраняет в CSR по пользователям (``.npy``), таблицы — в Arrow IPC.
+4. Последним пишет ``manifest.json`` в ``streamlit_data/artifacts``.
+
+Запуск:
+    python scripts/export_artifacts.py
+    python scripts/export_artifacts.py --data-dir streamlit_data --out-dir streamlit_data/artifacts
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recsys.ann import IVFIndex  # noqa: E402
+from recsys.artifacts import ArtifactWriter  # noqa: E402
+from recsys.cf_engine import SVDScorer  # noqa: E402
+from recsys.content_index import DEFAULT_K, NeighbourIndex  # noqa: E402
+from recsys.ratings import RatingsCSR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export notebook pickles into the mmap artifact format")
+    parser.add_argument("--data-dir", type=Path, default=Path("streamlit_data"),
+                        help="Каталог с pickle-артефактами ноутбука")
+    parser.add_argument("--out-dir", type=Path, default=None,
+                        help="Куда писать артефакты (по умолчанию <data-dir>/artifacts)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K,
+                        help="Число соседей, если индекс строится из плотной матрицы")
+    parser.add_argument("--ann-nlist", type=int, default=None,
+                        help="Кластеров в ANN-индексе факторов SVD (по умолчанию 4·sqrt(N), 0 — не строить)")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    out_dir = args.out_dir or data_dir / "artifacts"
+
+    def load(name):
+        path = data_dir / name
+        if not path.exists():
+            raise FileNotFoundError(f"Файл {path} не найден. Сначала запустите ноутбук.")
+        return pd.read_pickle(path)
+
+    writer = ArtifactWriter(str(out_dir))
+
+    writer.add_frame("movies", load("movies_data.pkl"))
+    writer.add_frame("popular_movies", load("popular_movies.pkl"))
+    writer.add_frame("new_items", load("new_items_for_cold_start.pkl"))
+    writer.add_frame("movies_cb", load("movies_cb_df.pkl"))
+
+    cb_indices = load("cb_movie_indices.pkl")
+    writer.add_frame("cb_indices", pd.DataFrame({
+        "title": cb_indices.index.astype(str), "cb_index": cb_indices.to_numpy(dtype=np.int64),
+    }))
+
+    RatingsCSR.from_frame(load("ratings_data_filtered.pkl")).save_to(writer)
+    scorer = SVDScorer.from_surprise(load("svd_model.pkl"))
+    scorer.save_to(writer)
+    if args.ann_nlist != 0:
+        IVFIndex.build(scorer.item_vectors(), nlist=args.ann_nlist, mips=True).save_to(writer, "cf_ann")
+
+    neighbours_path = data_dir / "content_neighbours.npz"
+    if neighbours_path.exists():
+        neighbours = NeighbourIndex.load(str(neighbours_path))
+    else:
+        neighbours = NeighbourIndex.from_dense(np.asarray(load("content_similarity_matrix.pkl")), k=args.k)
+    neighbours.save_to(writer)
+
+    writer.metadata["svd_eval_metrics"] = {k: float(v) for k, v in load("svd_evaluation_metrics.pkl").items()}
+
+    manifest = writer.finish()
+    total = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"Готово! Версия {manifest['version']}, {len(manifest['files'])} файлов, "
+          f"{total / 2**20:.1f} MiB -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,79 +9,387 @@
    Если файлы лежат в другом месте, задайте путь через аргумент ``--data-dir``.
 2. Читает колонку ``imdbId`` из ``links.csv``.
 3. Для каждого IMDb ID запрашивает страницу ``https://www.imdb.com/title/tt<id>/``
-   и вытаскивает URL постера из тега ``<meta property="og:image">``.
+   и вытаскивает URL постера из тега ``<meta property="og:image">``: страница
+   читается потоково и регулярным выражением, только до найденного тега или
+   до ``</head>`` (теги после него не учитываются).
 4. Скачивает изображение в ``static/posters/tt<id>.jpg``.
-5. Добавляет колонку ``local_poster`` (относительный путь к картинке),
-   сохраняет расширенную таблицу в ``links_with_posters.parquet``.
+5. Добавляет колонки ``local_poster`` (относительный путь к картинке) и
+   ``poster_status`` и сохраняет таблицу в ``links_with_posters.parquet``.
+
+Запросы выполняются параллельно (``--concurrency``) в пуле потоков или, с
+``--mode async``, через ``asyncio``/``aiohttp``. Общая частота запросов
+ограничена token bucket (``--rate`` запросов в секунду, ``--burst``), ответы
+429/5xx и сетевые ошибки повторяются с экспоненциальной паузой.
+
+Таблица сохраняется каждые ``--checkpoint-every`` фильмов; повторный запуск
+продолжает с места остановки: фильмы со статусом ``ok`` и ``missing``
+(постера на странице нет) пропускаются, ``error`` — запрашиваются снова.
 
 Запуск:
     python scripts/fetch_imdb_posters.py            # пути по умолчанию
     python scripts/fetch_imdb_posters.py --limit 500  # для теста на 500 фильмах
+    python scripts/fetch_imdb_posters.py --mode async --concurrency 32 --rate 20
 
 Примечания:
-- IMDb может ограничить частые запросы. В скрипте есть пауза 0.5 сек между
-  скачиваниями, но этого может быть мало на медленных сетях. При необходимости
-  увеличьте параметр ``--sleep``.
+- IMDb может ограничить частые запросы: при ответах 429 уменьшите ``--rate``.
+- Режим ``async`` требует пакета ``aiohttp``.
 - Постеры используются только в учебных/личных целях. Для публичных проектов
   убедитесь в соответствии с лицензией IMDb.
 """
 from __future__ import annotations
 
 import argparse
+import asyncio
+import html
+import os
+import random
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
 # ---------------------------------------------------------------------------
 # Константы и регулярные выражения
 # ---------------------------------------------------------------------------
+IMDB_BASE_URL = "https://www.imdb.com"
 IMDB_POSTER_RE = re.compile(r"^https://m\.media-amazon\.com/images/.*\.jpg")
+OG_IMAGE_TAG_RE = re.compile(rb"<meta\b[^>]*?property\s*=\s*[\"']og:image[\"'][^>]*>", re.IGNORECASE)
+CONTENT_ATTR_RE = re.compile(rb"content\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+HEAD_END_RE = re.compile(rb"</head\s*>", re.IGNORECASE)
+# Тег og:image находится в <head>; дальше этого страницу не читаем.
+MAX_PAGE_BYTES = 512 * 1024
 HEADERS = {
     "Accept-Language": "en-US,en;q=0.5",
     "User-Agent": "Mozilla/5.0 (compatible; PosterFetcher/1.0)"
 }
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+STATUS_OK = "ok"
+STATUS_MISSING = "missing"
+STATUS_ERROR = "error"
 
 # ---------------------------------------------------------------------------
 # Функции
 # ---------------------------------------------------------------------------
 
-def fetch_poster_url(imdb_id: str, session: requests.Session) -> Optional[str]:
-    """Возвращает URL постера для фильма на IMDb или None."""
-    url = f"https://www.imdb.com/title/tt{imdb_id}/"
+class TokenBucket:
+    """Ограничение частоты: ``rate`` запросов в секунду, не более ``burst`` подряд.
+
+    Общий для всех потоков и корутин: :meth:`reserve` под блокировкой
+    резервирует токен и возвращает, сколько секунд нужно подождать.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class TemporaryError(Exception):
+    """Ответ, после которого запрос стоит повторить (429, 5xx, сетевая ошибка)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_delay(attempt: int, backoff: float, error: TemporaryError) -> float:
+    """Пауза перед повтором: ``Retry-After`` сервера или ``backoff · 2^attempt`` со случайной добавкой."""
+    if error.retry_after is not None:
+        return error.retry_after
+    return backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
     try:
-        resp = session.get(url, headers=HEADERS, timeout=10)
-        resp.raise_for_status()
-    except requests.RequestException:
+        return float(value) if value else None
+    except ValueError:
         return None
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    meta = soup.find("meta", property="og:image")
-    if meta and meta.get("content") and IMDB_POSTER_RE.match(meta["content" ]):
-        return meta["content"]
+
+def extract_og_image(chunk: bytes) -> Optional[str]:
+    """URL из ``<meta property="og:image" content="...">`` в начале страницы или None."""
+    tag = OG_IMAGE_TAG_RE.search(chunk)
+    if not tag:
+        return None
+    content = CONTENT_ATTR_RE.search(tag.group(0))
+    return html.unescape(content.group(1).decode("utf-8", "replace")) if content else None
+
+
+def poster_url_pattern(base_url: str) -> re.Pattern:
+    """Допустимые URL постеров: CDN IMDb, а для другого ``--base-url`` ещё и его собственные."""
+    if base_url == IMDB_BASE_URL:
+        return IMDB_POSTER_RE
+    return re.compile(f"{IMDB_POSTER_RE.pattern}|^{re.escape(base_url)}/")
+
+
+def poster_from_page(page_head: bytes, pattern: re.Pattern = IMDB_POSTER_RE) -> Optional[str]:
+    poster_url = extract_og_image(page_head)
+    if poster_url and pattern.match(poster_url):
+        return poster_url
     return None
 
 
-def download_file(url: str, dest_path: Path, session: requests.Session) -> bool:
+def scan_page_head(page: bytes, pattern: re.Pattern = IMDB_POSTER_RE) -> Tuple[Optional[str], bool]:
+    """URL постера из прочитанного начала страницы и признак, что дальше читать не нужно."""
+    head_end = HEAD_END_RE.search(page)
+    if head_end:
+        return poster_from_page(page[:head_end.start()], pattern), True
+    poster_url = poster_from_page(page, pattern)
+    return poster_url, bool(poster_url) or len(page) >= MAX_PAGE_BYTES
+
+
+def write_atomic(dest_path: Path, content: bytes) -> None:
+    tmp_path = dest_path.with_name(dest_path.name + ".part")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, dest_path)
+
+
+def relative_poster_path(dest_path: Path) -> str:
+    # Относительный путь (например, posters/tt1234567.jpg)
+    return dest_path.relative_to(dest_path.parents[1]).as_posix()
+
+
+# --- Пул потоков (requests) -------------------------------------------------
+
+_thread_local = threading.local()
+
+
+def thread_session() -> requests.Session:
+    # requests.Session не потокобезопасна: у каждого потока своя.
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+        session.headers.update(HEADERS)
+    return session
+
+
+def _check_response(resp: requests.Response) -> None:
+    if resp.status_code in RETRY_STATUSES:
+        raise TemporaryError(f"HTTP {resp.status_code}", parse_retry_after(resp.headers.get("Retry-After")))
+    resp.raise_for_status()
+
+
+def fetch_poster_url(imdb_id: str, base_url: str, timeout: float) -> Optional[str]:
+    """Возвращает URL постера для фильма на IMDb или None."""
+    url = f"{base_url}/title/tt{imdb_id}/"
+    pattern = poster_url_pattern(base_url)
+    try:
+        with thread_session().get(url, timeout=timeout, stream=True) as resp:
+            if resp.status_code == 404:
+                return None
+            _check_response(resp)
+            head = b""
+            for chunk in resp.iter_content(chunk_size=16384):
+                head += chunk
+                poster_url, done = scan_page_head(head, pattern)
+                if done:
+                    return poster_url
+            return scan_page_head(head, pattern)[0]
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise TemporaryError(str(e)) from e
+
+
+def download_file(url: str, dest_path: Path, timeout: float) -> bool:
     """Скачивает файл и сохраняет в dest_path. Возвращает True при успехе."""
     try:
-        r = session.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-    except requests.RequestException:
-        return False
+        r = thread_session().get(url, timeout=timeout)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise TemporaryError(str(e)) from e
+    _check_response(r)
 
     content_type = r.headers.get("Content-Type", "")
     if not content_type.startswith("image"):
         return False
-    dest_path.write_bytes(r.content)
+    write_atomic(dest_path, r.content)
     return True
 
 
+def fetch_one(imdb_id: str, dest_path: Path, args, bucket: TokenBucket) -> Tuple[str, Optional[str]]:
+    """Статус и относительный путь постера для одного фильма (пул потоков)."""
+    for attempt in range(args.retries + 1):
+        try:
+            bucket.acquire()
+            poster_url = fetch_poster_url(imdb_id, args.base_url, args.timeout)
+            if not poster_url:
+                return STATUS_MISSING, None
+            if not dest_path.exists():
+                bucket.acquire()
+                if not download_file(poster_url, dest_path, args.timeout):
+                    return STATUS_MISSING, None
+            return STATUS_OK, relative_poster_path(dest_path)
+        except TemporaryError as e:
+            if attempt == args.retries:
+                return STATUS_ERROR, None
+            time.sleep(retry_delay(attempt, args.backoff, e))
+        except requests.RequestException:
+            return STATUS_ERROR, None
+    return STATUS_ERROR, None
+
+
+def run_threads(todo, args, progress: "Progress") -> None:
+    bucket = TokenBucket(args.rate, args.burst)
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    try:
+        futures = {pool.submit(fetch_one, imdb_id, dest_path, args, bucket): idx for idx, imdb_id, dest_path in todo}
+        for future in tqdm(as_completed(futures), total=len(futures), unit="film"):
+            progress.record(futures[future], *future.result())
+    finally:
+        # При прерывании не ждём оставшиеся в очереди фильмы.
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# --- asyncio (aiohttp) --------------------------------------------------------
+
+async def _fetch_one_async(session, imdb_id: str, dest_path: Path, args,
+                           bucket: TokenBucket) -> Tuple[str, Optional[str]]:
+    import aiohttp
+
+    async def get(url: str):
+        await bucket.acquire_async()
+        resp = await session.get(url)
+        if resp.status in RETRY_STATUSES:
+            resp.release()
+            raise TemporaryError(f"HTTP {resp.status}", parse_retry_after(resp.headers.get("Retry-After")))
+        return resp
+
+    for attempt in range(args.retries + 1):
+        try:
+            resp = await get(f"{args.base_url}/title/tt{imdb_id}/")
+            async with resp:
+                if resp.status == 404:
+                    return STATUS_MISSING, None
+                resp.raise_for_status()
+                head, poster_url = b"", None
+                async for chunk in resp.content.iter_chunked(16384):
+                    head += chunk
+                    poster_url, done = scan_page_head(head, poster_url_pattern(args.base_url))
+                    if done:
+                        break
+            if not poster_url:
+                return STATUS_MISSING, None
+            if not dest_path.exists():
+                resp = await get(poster_url)
+                async with resp:
+                    resp.raise_for_status()
+                    if not resp.headers.get("Content-Type", "").startswith("image"):
+                        return STATUS_MISSING, None
+                    write_atomic(dest_path, await resp.read())
+            return STATUS_OK, relative_poster_path(dest_path)
+        except (TemporaryError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == args.retries:
+                return STATUS_ERROR, None
+            error = e if isinstance(e, TemporaryError) else TemporaryError(str(e))
+            await asyncio.sleep(retry_delay(attempt, args.backoff, error))
+        except aiohttp.ClientError:
+            return STATUS_ERROR, None
+    return STATUS_ERROR, None
+
+
+async def _run_async(todo, args, progress: "Progress") -> None:
+    import aiohttp
+
+    bucket = TokenBucket(args.rate, args.burst)
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in todo:
+        queue.put_nowait(item)
+    bar = tqdm(total=len(todo), unit="film")
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        async def worker():
+            while not queue.empty():
+                idx, imdb_id, dest_path = queue.get_nowait()
+                progress.record(idx, *await _fetch_one_async(session, imdb_id, dest_path, args, bucket))
+                bar.update()
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    bar.close()
+
+
+def run_async(todo, args, progress: "Progress") -> None:
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        raise SystemExit("Режим --mode async требует пакета aiohttp: pip install aiohttp")
+    asyncio.run(_run_async(todo, args, progress))
+
+
+# --- Прогресс -----------------------------------------------------------------
+
+class Progress:
+    """Результаты по фильмам и периодическое сохранение таблицы (атомарная замена файла)."""
+
+    def __init__(self, links_df: pd.DataFrame, out_path: Path, checkpoint_every: int):
+        self.links_df = links_df
+        self.out_path = out_path
+        self.checkpoint_every = checkpoint_every
+        self.pending = 0
+        self.counts = {STATUS_OK: 0, STATUS_MISSING: 0, STATUS_ERROR: 0}
+
+    def record(self, idx, status: str, local_poster: Optional[str]) -> None:
+        self.links_df.at[idx, "poster_status"] = status
+        if local_poster:
+            self.links_df.at[idx, "local_poster"] = local_poster
+        self.counts[status] += 1
+        self.pending += 1
+        if self.checkpoint_every and self.pending >= self.checkpoint_every:
+            self.save()
+
+    def save(self) -> None:
+        tmp_path = self.out_path.with_name(self.out_path.name + ".tmp")
+        self.links_df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.out_path)
+        self.pending = 0
+
+
+def load_links(links_csv: Path, out_path: Path) -> pd.DataFrame:
+    """``links.csv`` с результатами предыдущего запуска, если он был."""
+    links_df = pd.read_csv(links_csv)
+    links_df["imdbId"] = links_df["imdbId"].astype(str).str.zfill(7)
+    links_df["local_poster"] = pd.Series(pd.NA, index=links_df.index, dtype=object)
+    links_df["poster_status"] = pd.Series(pd.NA, index=links_df.index, dtype=object)
+
+    if out_path.exists():
+        previous = pd.read_parquet(out_path)
+        previous["imdbId"] = previous["imdbId"].astype(str).str.zfill(7)
+        if "poster_status" not in previous.columns:
+            previous["poster_status"] = previous["local_poster"].notna().map({True: STATUS_OK, False: pd.NA})
+        previous = previous.drop_duplicates("imdbId").set_index("imdbId")
+        links_df["local_poster"] = links_df["imdbId"].map(previous["local_poster"])
+        links_df["poster_status"] = links_df["imdbId"].map(previous["poster_status"])
+    return links_df
+
+
 # ---------------------------------------------------------------------------
 # Основной скрипт
 # ---------------------------------------------------------------------------
@@ -92,59 +400,60 @@ def main():
                         help="Каталог, где лежит links.csv")
     parser.add_argument("--out-dir", type=Path, default=Path("static/posters"),
                         help="Куда сохранять постеры")
-    parser.add_argument("--sleep", type=float, default=0.5,
-                        help="Пауза между запросами, сек")
+    parser.add_argument("--mode", choices=["thread", "async"], default="thread",
+                        help="Пул потоков (requests) или asyncio (aiohttp)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Одновременных запросов")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Не больше запросов в секунду (0 — без ограничения)")
+    parser.add_argument("--burst", type=int, default=5,
+                        help="Запросов подряд без ожидания")
+    parser.add_argument("--retries", type=int, default=4,
+                        help="Повторов при 429/5xx и сетевых ошибках")
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="Первая пауза перед повтором, сек (дальше удваивается)")
+    parser.add_argument("--timeout", type=float, default=15.0,
+                        help="Таймаут запроса, сек")
+    parser.add_argument("--checkpoint-every", type=int, default=200,
+                        help="Сохранять таблицу каждые N фильмов")
+    parser.add_argument("--base-url", default=IMDB_BASE_URL,
+                        help="Адрес сайта IMDb (например, локальная заглушка для проверки)")
     parser.add_argument("--limit", type=int, default=None,
                         help="Ограничить количество фильмов (для отладки)")
     args = parser.parse_args()
+    args.base_url = args.base_url.rstrip("/")
 
-    links_csv = args.data_dir / r"C:\Users\adam4\.cache\kagglehub\datasets\rounakbanik\the-movies-dataset\versions\7\links.csv"
+    links_csv = args.data_dir / "links.csv"
     if not links_csv.exists():
         raise FileNotFoundError(f"Файл {links_csv} не найден. Укажите --data-dir.")
 
-    # Читаем таблицу ссылок
-    links_df = pd.read_csv(links_csv)
-    links_df["imdbId"] = links_df["imdbId"].astype(str).str.zfill(7)
-
-    # Добавляем колонку, если её нет
-    if "local_poster" not in links_df.columns:
-        links_df["local_poster"] = pd.NA
+    out_path = args.data_dir / "links_with_posters.parquet"
+    links_df = load_links(links_csv, out_path)
 
     # Создаём выходную директорию
     args.out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Определяем, какие фильмы ещё без постера
-    todo_idx = links_df[links_df["local_poster"].isna()].index
+    # Определяем, какие фильмы ещё не обработаны (или завершились ошибкой)
+    todo_idx = links_df.index[~links_df["poster_status"].isin([STATUS_OK, STATUS_MISSING])]
     if args.limit:
         todo_idx = todo_idx[: args.limit]
+    todo = [(idx, links_df.at[idx, "imdbId"], args.out_dir / f"tt{links_df.at[idx, 'imdbId']}.jpg")
+            for idx in todo_idx]
 
-    session = requests.Session()
-
-    print(f"Нужно скачать постеры для {len(todo_idx)} фильмов")
-    for idx in tqdm(todo_idx, unit="film"):
-        imdb_id = links_df.at[idx, "imdbId"]
-
-        poster_url = fetch_poster_url(imdb_id, session=session)
-        if not poster_url:
-            continue
-
-        local_filename = f"tt{imdb_id}.jpg"
-        dest_path = args.out_dir / local_filename
-
-        if dest_path.exists():
-            links_df.at[idx, "local_poster"] = dest_path.relative_to(dest_path.parents[1]).as_posix()
-            continue
-
-        if download_file(poster_url, dest_path, session=session):
-            # Относительный путь (например, posters/tt1234567.jpg)
-            links_df.at[idx, "local_poster"] = dest_path.relative_to(dest_path.parents[1]).as_posix()
-            time.sleep(args.sleep)
+    progress = Progress(links_df, out_path, args.checkpoint_every)
+    print(f"Нужно скачать постеры для {len(todo)} фильмов")
+    started = time.perf_counter()
+    try:
+        (run_async if args.mode == "async" else run_threads)(todo, args, progress)
+    finally:
+        # Сохраняем расширенную таблицу (в том числе при прерывании)
+        progress.save()
 
-    # Сохраняем расширенную таблицу
-    out_path = args.data_dir / "links_with_posters.parquet"
-    links_df.to_parquet(out_path, index=False)
-    print("Готово! Таблица с локальными путями сохранена:", out_path)
+    counts = progress.counts
+    print(f"Готово за {time.perf_counter() - started:.1f} с! Постеров: {counts[STATUS_OK]}, "
+          f"без постера: {counts[STATUS_MISSING]}, ошибок: {counts[STATUS_ERROR]}. "
+          f"Таблица с локальными путями сохранена: {out_path}")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""make_bench_data.py
+
+Синтетические данные для ``scripts/benchmark.py``: каталог, оценки и
+артефакты приложения заданного размера без обучения моделей.
+
+1. Каталог из ``--movies`` фильмов: жанры, даты выхода, голоса,
+   ``weighted_rating``; у части фильмов нет ``movieId_ml`` (как в реальных
+   данных, не всё есть в MovieLens).
+2. ``--ratings`` оценок ``--users`` пользователей MovieLens; популярность
+   фильмов распределена по степенному закону.
+3. Случайные факторы SVD ``--factors`` и top-``--k`` соседей (соседи
+   выбираются в основном среди фильмов того же первого жанра).
+4. Запись в ``<out-dir>/artifacts`` тем же ``ArtifactWriter``, что и у
+   ``build_artifacts.py``; с ``--ann`` — также IVF-индексы.
+
+Данные воспроизводимы при одинаковых ``--seed`` и параметрах.
+
+Запуск:
+    python scripts/make_bench_data.py --out-dir /tmp/bench/streamlit_data
+    python scripts/make_bench_data.py --movies 1000000 --users 200000 --ratings 10000000 --out-dir /tmp/bench_1m
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recsys.ann import IVFIndex  # noqa: E402
+from recsys.artifacts import ArtifactWriter  # noqa: E402
+from recsys.cf_engine import SVDScorer  # noqa: E402
+from recsys.content_index import DEFAULT_K, NeighbourIndex  # noqa: E402
+from recsys.ratings import RatingsCSR  # noqa: E402
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family', 'Fantasy',
+          'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Science Fiction', 'Thriller', 'War', 'Western']
+WORDS = np.array([f"word{i}" for i in range(500)])
+POPULAR_TOP_N = 50
+NEW_ITEMS_TOP_N = 20
+# Доля фильмов каталога, которых нет в MovieLens.
+NO_ML_SHARE = 0.1
+
+# ---------------------------------------------------------------------------
+# Генераторы
+# ---------------------------------------------------------------------------
+
+def make_movies(n_movies: int, rng: np.random.Generator) -> pd.DataFrame:
+    n_genres = rng.integers(1, 4, n_movies)
+    first_genre = rng.integers(0, len(GENRES), n_movies)
+    genres = [[GENRES[(g + j * 5) % len(GENRES)] for j in range(n)] for g, n in zip(first_genre, n_genres)]
+    vote_count = rng.pareto(1.2, n_movies).astype(np.int64) * 10
+    vote_average = np.round(np.clip(rng.normal(6.2, 1.1, n_movies), 0, 10), 1)
+    ml_ids = np.arange(1, n_movies + 1)
+    movies = pd.DataFrame({
+        'tmdb_id': np.arange(1, n_movies + 1, dtype=np.int64),
+        'title': [f"Movie {i}" for i in range(n_movies)],
+        'overview': [' '.join(words) for words in WORDS[rng.integers(0, WORDS.size, (n_movies, 8))]],
+        'genres': genres,
+        'release_date': pd.Timestamp('1950-01-01') + pd.to_timedelta(rng.integers(0, 27000, n_movies), unit='D'),
+        'popularity': rng.gamma(2.0, 5.0, n_movies),
+        'vote_average': vote_average,
+        'vote_count': vote_count,
+        'runtime': rng.integers(70, 180, n_movies).astype(np.float64),
+        'budget': 0.0,
+        'revenue': 0.0,
+        'poster_path': [f"/p{i}.jpg" for i in range(n_movies)],
+        'keywords': [[] for _ in range(n_movies)],
+        'cast': [[] for _ in range(n_movies)],
+        'director': '',
+        'movieId_ml': pd.array(np.where(rng.random(n_movies) < NO_ML_SHARE, -1, ml_ids), dtype='Int64'),
+    })
+    movies.loc[movies['movieId_ml'] < 0, 'movieId_ml'] = pd.NA
+
+    c = movies['vote_average'].mean()
+    m = movies['vote_count'].quantile(0.9)
+    v = movies['vote_count']
+    movies['weighted_rating'] = v / (v + m) * movies['vote_average'] + m / (v + m) * c
+    return movies
+
+
+def make_ratings(movies: pd.DataFrame, n_users: int, n_ratings: int, rng: np.random.Generator) -> RatingsCSR:
+    ml_ids = movies['movieId_ml'].dropna().to_numpy(dtype=np.int64)
+    popularity = 1.0 / np.arange(1, ml_ids.size + 1) ** 0.8
+    popularity /= popularity.sum()
+    items = rng.permutation(ml_ids)[rng.choice(ml_ids.size, n_ratings, p=popularity)]
+    users = rng.integers(1, n_users + 1, n_ratings)
+    values = np.clip(np.round(rng.normal(3.6, 1.0, n_ratings) * 2) / 2, 0.5, 5.0)
+    return RatingsCSR.from_arrays(users, items, values)
+
+
+def make_scorer(ratings: RatingsCSR, n_factors: int, rng: np.random.Generator) -> SVDScorer:
+    item_ids = ratings.rated_items.astype(np.int64)
+    return SVDScorer(
+        pu=rng.normal(0, 0.1, (ratings.n_users, n_factors)), qi=rng.normal(0, 0.1, (item_ids.size, n_factors)),
+        bu=rng.normal(0, 0.3, ratings.n_users), bi=rng.normal(0, 0.3, item_ids.size),
+        global_mean=3.5, user_ids=ratings.user_ids.tolist(), item_ids=item_ids,
+    )
+
+
+def make_neighbours(movies: pd.DataFrame, k: int, rng: np.random.Generator) -> NeighbourIndex:
+    """Top-k соседей: 80% — случайные фильмы того же первого жанра, остальные — любые."""
+    n_items = len(movies)
+    k = max(0, min(k, n_items - 1))
+    first_genre = pd.Series([genres[0] for genres in movies['genres']]).astype('category').cat.codes.to_numpy()
+    order = np.argsort(first_genre, kind='stable')
+    starts = np.searchsorted(first_genre[order], np.arange(first_genre.max() + 2))
+    group_start, group_size = starts[first_genre], np.diff(starts)[first_genre]
+
+    same_genre = int(k * 0.8)
+    indices = np.empty((n_items, k), dtype=np.int32)
+    indices[:, :same_genre] = order[group_start[:, None] + rng.integers(0, 2 ** 62, (n_items, same_genre))
+                                    % group_size[:, None]]
+    indices[:, same_genre:] = rng.integers(0, n_items, (n_items, k - same_genre))
+    scores = -np.sort(-rng.random((n_items, k)).astype(np.float32), axis=1)
+    return NeighbourIndex(np.arange(n_items + 1, dtype=np.int64) * k, indices.ravel(), scores.ravel())
+
+
+# ---------------------------------------------------------------------------
+# Основной скрипт
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark artifacts")
+    parser.add_argument("--out-dir", type=Path, required=True,
+                        help="Каталог данных приложения (артефакты пишутся в <out-dir>/artifacts)")
+    parser.add_argument("--movies", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=5_000, help="Пользователей MovieLens")
+    parser.add_argument("--ratings", type=int, default=500_000)
+    parser.add_argument("--factors", type=int, default=100, help="Размерность факторов SVD")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Соседей в content-based индексе")
+    parser.add_argument("--ann", action="store_true", help="Построить IVF-индексы (cf_ann, content_ann)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(args.seed)
+    movies = make_movies(args.movies, rng)
+    ratings = make_ratings(movies, args.users, args.ratings, rng)
+    scorer = make_scorer(ratings, args.factors, rng)
+    neighbours = make_neighbours(movies, args.k, rng)
+    print(f"Фильмов: {len(movies)}, оценок: {len(ratings)}, пользователей: {ratings.n_users} "
+          f"({time.perf_counter() - started:.1f} с)")
+
+    writer = ArtifactWriter(str(args.out_dir / "artifacts"))
+    writer.add_frame("movies", movies)
+    writer.add_frame("popular_movies", movies.nlargest(POPULAR_TOP_N, 'weighted_rating')[
+        ['title', 'tmdb_id', 'poster_path', 'overview', 'genres', 'release_date', 'weighted_rating']])
+    writer.add_frame("new_items", movies.nlargest(NEW_ITEMS_TOP_N, 'release_date'))
+    writer.add_frame("movies_cb", movies[['title', 'tmdb_id', 'poster_path', 'overview', 'genres']])
+    writer.add_frame("cb_indices", pd.DataFrame({
+        "title": movies['title'].astype(str), "cb_index": np.arange(len(movies), dtype=np.int64),
+    }))
+    ratings.save_to(writer)
+    scorer.save_to(writer)
+    neighbours.save_to(writer)
+    if args.ann:
+        IVFIndex.build(scorer.item_vectors(), mips=True).save_to(writer, "cf_ann")
+        content_vectors = rng.normal(0, 1, (len(movies), 64)).astype(np.float32)
+        IVFIndex.build(content_vectors).save_to(writer, "content_ann")
+    writer.metadata["svd_eval_metrics"] = {"rmse": 0.0, "mae": 0.0}
+    writer.metadata["synthetic"] = {key: value for key, value in vars(args).items() if key != "out_dir"}
+    manifest = writer.finish()
+
+    total = sum(entry["bytes"] for entry in manifest["files"].values())
+    print(f"Готово за {time.perf_counter() - started:.1f} с! Версия {manifest['version']}, "
+          f"{total / 2**20:.1f} MiB -> {args.out_dir / 'artifacts'}")
+
+
+if __name__ == "__main__":
+    main()
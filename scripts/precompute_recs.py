@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+"""precompute_recs.py
+
+Пакетный расчёт коллаборативных рекомендаций для всех пользователей вне
+пути запроса (см. ``recsys/precomputed.py``).
+
+1. Загружает факторы SVD из активной версии артефактов (или из pickle
+   ноутбука) и строит векторы пользователей:
+   * ``app`` — каждый пользователь приложения хотя бы с одним лайком
+     (fold-in по лайкам, как в ``recsys/foldin.py``);
+   * ``ml`` — пользователи MovieLens из обучающей выборки модели.
+2. Делит пользователей на блоки и в пуле процессов считает
+   ``P_блок @ [qi, bi]ᵀ``, маскирует уже оценённые фильмы и фильмы без
+   метаданных и выбирает top-N через ``argpartition``.
+3. Пишет результат в SQLite-хранилище с версией артефактов и отпечатком
+   лайков; ``/api/smart-recommendations`` берёт из него список за один
+   запрос по ключу, а для новых и изменившихся пользователей считает на лету.
+
+Запуск:
+    python scripts/precompute_recs.py
+    python scripts/precompute_recs.py --users all --workers 8 --chunk-size 2048
+    python scripts/precompute_recs.py --database-url sqlite:///instance/database.db --out streamlit_data/precomputed_recs.sqlite
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recsys.artifacts import ArtifactBundle, bundle_dir  # noqa: E402
+from recsys.cf_engine import SVDScorer  # noqa: E402
+from recsys.foldin import UserFoldIn  # noqa: E402
+from recsys.precomputed import APP_SCOPE, MOVIELENS_SCOPE, PrecomputedStore, likes_fingerprint  # noqa: E402
+from recsys.ratings import RatingsCSR  # noqa: E402
+
+DEFAULT_TOP_N = 100
+
+# ---------------------------------------------------------------------------
+# Скоринг блока пользователей (выполняется в процессах пула)
+# ---------------------------------------------------------------------------
+
+_ITEMS: Dict[str, object] = {}
+
+
+def _init_worker(item_vectors: np.ndarray, candidates: np.ndarray, rating_scale: Tuple[float, float],
+                 top_n: int) -> None:
+    _ITEMS.update(vectors=item_vectors, candidates=candidates, rating_scale=rating_scale, top_n=top_n)
+
+
+def score_chunk(queries: np.ndarray, offsets: np.ndarray, exclude_indptr: np.ndarray,
+                exclude_positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-N позиций фильмов и оценок для блока пользователей (недобор дополняется ``-1``).
+
+    ``queries`` — строки ``[pu, 1]``, ``offsets`` — ``mu + bu``; уже оценённые
+    фильмы пользователя ``i`` — ``exclude_positions[exclude_indptr[i]:exclude_indptr[i + 1]]``.
+    """
+    vectors, candidates = _ITEMS["vectors"], _ITEMS["candidates"]
+    lower, upper = _ITEMS["rating_scale"]
+    top_n = min(_ITEMS["top_n"], vectors.shape[0])
+
+    scores = queries @ vectors.T
+    scores += offsets[:, None]
+    np.clip(scores, lower, upper, out=scores)
+    scores[:, ~candidates] = -np.inf
+    user_rows = np.repeat(np.arange(queries.shape[0]), np.diff(exclude_indptr))
+    scores[user_rows, exclude_positions] = -np.inf
+
+    part = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    top = np.take_along_axis(part, order, axis=1)
+    top_scores = np.take_along_axis(part_scores, order, axis=1)
+    top[~np.isfinite(top_scores)] = -1
+    return top.astype(np.int32), top_scores.astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Пользователи
+# ---------------------------------------------------------------------------
+
+class UserBatch:
+    """Векторы пользователей области и их уже оценённые фильмы (CSR по позициям модели)."""
+
+    def __init__(self, user_ids: np.ndarray, queries: np.ndarray, offsets: np.ndarray,
+                 exclude_indptr: np.ndarray, exclude_positions: np.ndarray, fingerprints: List[str]):
+        self.user_ids = user_ids
+        self.queries = queries
+        self.offsets = offsets
+        self.exclude_indptr = exclude_indptr
+        self.exclude_positions = exclude_positions
+        self.fingerprints = fingerprints
+
+    def chunks(self, chunk_size: int) -> Iterator[Tuple[slice, tuple]]:
+        for start in range(0, self.user_ids.size, chunk_size):
+            block = slice(start, min(start + chunk_size, self.user_ids.size))
+            lo, hi = self.exclude_indptr[block.start], self.exclude_indptr[block.stop]
+            yield block, (self.queries[block], self.offsets[block],
+                          self.exclude_indptr[block.start:block.stop + 1] - lo, self.exclude_positions[lo:hi])
+
+
+def _exclusion_csr(positions_per_user: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    indptr = np.zeros(len(positions_per_user) + 1, dtype=np.int64)
+    np.cumsum([p.size for p in positions_per_user], out=indptr[1:])
+    positions = np.concatenate(positions_per_user) if positions_per_user else np.empty(0, np.int64)
+    return indptr, positions.astype(np.int64)
+
+
+def app_users(scorer: SVDScorer, tmdb_to_position: pd.Series, database_url: str, reg: float) -> UserBatch:
+    """Пользователи приложения хотя бы с одним лайком; векторы — fold-in по лайкам."""
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        likes = pd.read_sql(text('SELECT user_id, tmdb_id, value FROM "like"'), connection)
+    engine.dispose()
+
+    foldin = UserFoldIn(scorer, reg=reg, max_users=0)
+    likes["position"] = tmdb_to_position.reindex(likes["tmdb_id"].to_numpy()).fillna(-1).to_numpy(dtype=np.int64)
+    user_ids, queries, offsets, excluded, fingerprints = [], [], [], [], []
+    for user_id, user_likes in likes.groupby("user_id", sort=True):
+        known = user_likes[user_likes["position"] >= 0]
+        pu, bu = foldin.build(int(user_id), known["position"].to_numpy(), known["value"].to_numpy(), generation=0)
+        user_ids.append(int(user_id))
+        queries.append(np.append(pu, 1.0))
+        offsets.append(scorer.global_mean + bu)
+        excluded.append(known["position"].to_numpy(dtype=np.int64))
+        fingerprints.append(likes_fingerprint(zip(user_likes["tmdb_id"], user_likes["value"])))
+
+    indptr, positions = _exclusion_csr(excluded)
+    return UserBatch(np.asarray(user_ids, dtype=np.int64), np.asarray(queries).reshape(len(user_ids), -1),
+                     np.asarray(offsets, dtype=np.float64), indptr, positions, fingerprints)
+
+
+def movielens_users(scorer: SVDScorer, ratings: RatingsCSR) -> UserBatch:
+    """Пользователи MovieLens из обучающей выборки; исключаются фильмы из их истории оценок."""
+    user_ids = np.asarray(list(scorer.user_index), dtype=np.int64)
+    queries = np.hstack([scorer.pu, np.ones((scorer.pu.shape[0], 1))])
+    offsets = scorer.global_mean + scorer.bu
+    indptr, positions = _exclusion_csr([scorer.item_positions(ratings.user_items(int(uid))) for uid in user_ids])
+    return UserBatch(user_ids, queries, offsets, indptr, positions, [""] * user_ids.size)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def load_model(data_dir: Path) -> Tuple[str, SVDScorer, RatingsCSR, pd.DataFrame]:
+    """Версия, факторы, оценки и каталог — из артефактов или, если их нет, из pickle ноутбука."""
+    artifacts_dir = str(data_dir / "artifacts")
+    if bundle_dir(artifacts_dir):
+        bundle = ArtifactBundle.open(artifacts_dir)
+        return bundle.version, SVDScorer.from_bundle(bundle), RatingsCSR.from_bundle(bundle), bundle.frame("movies")
+    return ("pickle", SVDScorer.from_surprise(pd.read_pickle(data_dir / "svd_model.pkl")),
+            RatingsCSR.from_frame(pd.read_pickle(data_dir / "ratings_data_filtered.pkl")),
+            pd.read_pickle(data_dir / "movies_data.pkl"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute top-N collaborative recommendations for all users")
+    parser.add_argument("--data-dir", type=Path, default=Path("streamlit_data"),
+                        help="Каталог с артефактами (artifacts/) или pickle-файлами ноутбука")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="SQLite-файл хранилища (по умолчанию <data-dir>/precomputed_recs.sqlite)")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", "sqlite:///instance/database.db"),
+                        help="База приложения с таблицей like")
+    parser.add_argument("--users", choices=["app", "ml", "all"], default="app",
+                        help="Кого считать: пользователей приложения, MovieLens или всех")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N)
+    parser.add_argument("--chunk-size", type=int, default=1024, help="Пользователей в одном блоке")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--foldin-reg", type=float, default=float(os.environ.get("CF_FOLDIN_REG", "0.1")),
+                        help="Регуляризация fold-in (должна совпадать с CF_FOLDIN_REG приложения)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    version, scorer, ratings, movies = load_model(args.data_dir)
+
+    # Позиция фильма модели -> tmdb_id (фильмы без строки каталога не рекомендуются, как в приложении).
+    ml_to_tmdb = movies.dropna(subset=["movieId_ml", "tmdb_id"]).drop_duplicates("movieId_ml")
+    ml_to_tmdb = pd.Series(ml_to_tmdb["tmdb_id"].to_numpy(dtype=np.int64),
+                           index=ml_to_tmdb["movieId_ml"].to_numpy(dtype=np.int64))
+    item_tmdb_ids = ml_to_tmdb.reindex(scorer.item_ids).fillna(-1).to_numpy(dtype=np.int64)
+    candidates = item_tmdb_ids >= 0
+    tmdb_to_position = pd.Series(np.flatnonzero(candidates), index=item_tmdb_ids[candidates])
+    tmdb_to_position = tmdb_to_position[~tmdb_to_position.index.duplicated()]
+
+    batches = {}
+    if args.users in ("app", "all"):
+        batches[APP_SCOPE] = app_users(scorer, tmdb_to_position, args.database_url, args.foldin_reg)
+    if args.users in ("ml", "all"):
+        batches[MOVIELENS_SCOPE] = movielens_users(scorer, ratings)
+
+    store = PrecomputedStore(str(args.out or args.data_dir / "precomputed_recs.sqlite"))
+    init_args = (scorer.item_vectors(), candidates, scorer.rating_scale, args.top_n)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=init_args) as pool:
+        for scope, batch in batches.items():
+            run_started = time.time()
+            blocks = list(batch.chunks(args.chunk_size))
+            futures = [pool.submit(score_chunk, *chunk) for _, chunk in blocks]
+            written = 0
+            for (block, _), future in zip(blocks, futures):
+                top, top_scores = future.result()
+                records = []
+                for user_id, fingerprint, positions, scores in zip(batch.user_ids[block], batch.fingerprints[block],
+                                                                   top, top_scores):
+                    valid = positions >= 0
+                    records.append((user_id, fingerprint, item_tmdb_ids[positions[valid]], scores[valid]))
+                written += store.write(scope, version, records)
+            pruned = store.prune(scope, run_started)
+            print(f"[{scope}] пользователей: {written}, удалено устаревших записей: {pruned}")
+
+    print(f"Готово за {time.perf_counter() - started:.1f} с! Версия {version}, top-{args.top_n} в {store.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""serve.py
+
+Боевой запуск приложения на нескольких ядрах (prefork).
+
+1. Мастер-процесс импортирует ``app`` с ``RESOURCE_LOADING=eager``: все
+   артефакты загружаются один раз. Массивы выгрузки (факторы SVD, индекс
+   соседей, CSR оценок, IVF) открыты через ``mmap`` и лежат в страничном
+   кэше ОС, поэтому общие для всех процессов при любом их числе.
+2. Перед ``fork`` закрываются соединения с БД и вызывается ``gc.freeze()``:
+   сборщик мусора не трогает заголовки загруженных объектов, и страницы
+   мастера остаются общими (copy-on-write) в worker-процессах.
+3. ``--workers`` процессов принимают соединения с одного слушающего сокета;
+   каждый обслуживает запросы в потоках. ``--scoring-threads`` — ограничитель
+   параллельности: не больше K потоков процесса одновременно считают
+   рекомендации (``SCORING_THREADS``), остальные ждут в своём потоке запроса.
+4. Мастер перезапускает упавшие процессы; SIGTERM/SIGINT завершает всех,
+   SIGUSR1 печатает RSS/PSS процессов (Linux).
+5. Процессы сохраняют снимки метрик в ``--metrics-dir``
+   (``METRICS_MULTIPROC_DIR``), и ``/metrics`` любого процесса отдаёт сумму
+   по всем процессам, а не счётчики случайного из них.
+
+Кэш рекомендаций в памяти и векторы fold-in у каждого процесса свои; они
+сверяются с лайками из БД, так что лайк, обработанный другим процессом, не
+даёт устаревшей выдачи. Общий кэш — ``RECS_CACHE_BACKEND=redis``.
+
+Запуск:
+    python serve.py --port 8000 --workers 4
+    python serve.py --workers 8 --scoring-threads 2 --access-log
+
+На Windows (нет ``fork``) запускается один процесс.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+# Процесс, упавший быстрее, перезапускается с задержкой, чтобы не крутиться в цикле.
+MIN_WORKER_LIFETIME = 5.0
+RESTART_DELAY = 1.0
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Память процессов
+# ---------------------------------------------------------------------------
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """RSS и PSS процесса в КиБ из ``/proc/<pid>/smaps_rollup`` (пусто вне Linux)."""
+    result = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    result[key.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return result
+
+
+def print_memory_report(master_pid: int, workers: List[int]) -> None:
+    total_pss = 0
+    for role, pid in [("master", master_pid)] + [("worker", pid) for pid in workers]:
+        memory = process_memory(pid)
+        if not memory:
+            print("[WARN] Отчёт о памяти доступен только в Linux")
+            return
+        total_pss += memory["pss"]
+        print(f"  {role:<7}{pid:>8}  RSS {memory['rss'] / 1024:8.1f} MiB  PSS {memory['pss'] / 1024:8.1f} MiB")
+    print(f"  Всего PSS: {total_pss / 1024:.1f} MiB")
+
+
+# ---------------------------------------------------------------------------
+# Процессы
+# ---------------------------------------------------------------------------
+
+def run_worker(application, listener: socket.socket, access_log: bool) -> None:
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, application, threaded=True, fd=listener.fileno(),
+                         request_handler=None if access_log else QuietRequestHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def prepare_for_fork(app_module) -> None:
+    """Закрывает пулы соединений и замораживает объекты мастера для сборщика мусора."""
+    with app_module.app.app_context():
+        for engine in app_module.db.engines.values():
+            engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+def serve_prefork(app_module, listener: socket.socket, n_workers: int, access_log: bool) -> None:
+    master_pid = os.getpid()
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(app_module.app, listener, access_log)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 0
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                try:
+                    app_module.flush_metrics()
+                finally:
+                    # Не выполняем atexit-обработчики мастера в дочернем процессе.
+                    os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print_memory_report(master_pid, list(workers)))
+
+    for _ in range(n_workers):
+        spawn()
+    print(f"Запущено {n_workers} процессов на http://{listener.getsockname()[0]}:{listener.getsockname()[1]} "
+          f"(мастер {master_pid})")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"[WARN] Процесс {pid} завершился (код {os.waitstatus_to_exitcode(status)}), перезапуск")
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            time.sleep(RESTART_DELAY)
+        spawn()
+    print("Все процессы остановлены")
+
+
+# ---------------------------------------------------------------------------
+# Основной скрипт
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefork production server for the recommendation API")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)),
+                        help="Число процессов (по умолчанию — число ядер)")
+    parser.add_argument("--scoring-threads", type=int, default=None,
+                        help="Сколько запросов процесса одновременно считают рекомендации (SCORING_THREADS; 0 — без ограничения)")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Не загружать артефакты в мастере: каждый процесс загрузит свои копии")
+    parser.add_argument("--access-log", action="store_true", help="Печатать строку на каждый запрос")
+    parser.add_argument("--metrics-dir", default=os.environ.get("METRICS_MULTIPROC_DIR"),
+                        help="Каталог снимков метрик процессов (по умолчанию — временный)")
+    args = parser.parse_args()
+
+    os.environ["RESOURCE_LOADING"] = "background" if args.no_preload else "eager"
+    if args.metrics_dir:
+        # Снимки прошлого запуска не должны попасть в счётчики нового.
+        os.makedirs(args.metrics_dir, exist_ok=True)
+        for name in os.listdir(args.metrics_dir):
+            if name.startswith("metrics-"):
+                os.remove(os.path.join(args.metrics_dir, name))
+        metrics_dir, own_metrics_dir = args.metrics_dir, False
+    else:
+        metrics_dir, own_metrics_dir = tempfile.mkdtemp(prefix="recsys-metrics-"), True
+    os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+    if args.scoring_threads is not None:
+        os.environ["SCORING_THREADS"] = str(args.scoring_threads)
+
+    master_pid = os.getpid()
+    started = time.perf_counter()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    if not args.no_preload:
+        print(f"Артефакты версии {app_module.resources.version} загружены за {time.perf_counter() - started:.1f} с")
+
+    try:
+        listener = socket.create_server((args.host, args.port), backlog=args.backlog, reuse_port=False)
+        listener.set_inheritable(True)
+
+        if not hasattr(os, "fork"):
+            print("[WARN] fork недоступен, запускается один процесс")
+            run_worker(app_module.app, listener, args.access_log)
+            return
+
+        if app_module.recommendation_cache.backend.__class__.__name__ == "InProcessBackend" and args.workers > 1:
+            print("[INFO] Кэш рекомендаций у каждого процесса свой; общий — RECS_CACHE_BACKEND=redis")
+        prepare_for_fork(app_module)
+        serve_prefork(app_module, listener, max(1, args.workers), args.access_log)
+    finally:
+        if own_metrics_dir and os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Общие фикстуры тестов: пути импорта, локальный HTTP-сервер-заглушка и приложение на синтетических данных."""
+from __future__ import annotations
+
+import itertools
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# (статус, заголовки, тело); тело-список отправляется по частям.
+StubResponse = Tuple[int, Dict[str, str], Union[bytes, List[bytes]]]
+Responder = Callable[["StubRequest"], StubResponse]
+
+
+class StubRequest:
+    def __init__(self, path: str, query: Dict[str, List[str]], at: float):
+        self.path = path
+        self.query = query
+        self.at = at
+
+    def param(self, name: str) -> Optional[str]:
+        values = self.query.get(name)
+        return values[0] if values else None
+
+
+class StubServer:
+    """HTTP-сервер на ``127.0.0.1`` со сценариями ответов по пути запроса.
+
+    :meth:`route` задаёт для пути функцию ответа или последовательность
+    ответов (последний повторяется). Все запросы записываются в
+    :attr:`requests` вместе со временем прихода.
+    """
+
+    def __init__(self):
+        self.routes: Dict[str, Union[Responder, List[StubResponse]]] = {}
+        self.requests: List[StubRequest] = []
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                request = StubRequest(parts.path, parse_qs(parts.query), time.monotonic())
+                with server._lock:
+                    server.requests.append(request)
+                status, headers, body = server._respond(request)
+                chunks = body if isinstance(body, list) else [body]
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(sum(len(chunk) for chunk in chunks)))
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # Клиент дочитал, сколько ему нужно, и закрыл соединение.
+                    self.close_connection = True
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, path: str, *responses: Union[Responder, StubResponse]) -> None:
+        if len(responses) == 1 and callable(responses[0]):
+            self.routes[path] = responses[0]
+        else:
+            self.routes[path] = list(responses)
+
+    def hits(self, path: Optional[str] = None) -> List[StubRequest]:
+        with self._lock:
+            return [request for request in self.requests if path is None or request.path == path]
+
+    def _respond(self, request: StubRequest) -> StubResponse:
+        if self.delay:
+            time.sleep(self.delay)
+        route = self.routes.get(request.path)
+        if route is None:
+            return 404, {"Content-Type": "text/plain"}, b"not found"
+        if callable(route):
+            return route(request)
+        with self._lock:
+            return route.pop(0) if len(route) > 1 else route[0]
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def app_data_dir(tmp_path_factory) -> Path:
+    """Маленький синтетический каталог данных (``make_bench_data.py``) во временной папке."""
+    import make_bench_data
+
+    data_dir = tmp_path_factory.mktemp("streamlit_data")
+    argv = sys.argv
+    sys.argv = ["make_bench_data.py", "--out-dir", str(data_dir), "--movies", "300", "--users", "60",
+                "--ratings", "3000", "--factors", "8", "--k", "20"]
+    try:
+        make_bench_data.main()
+    finally:
+        sys.argv = argv
+    return data_dir
+
+
+@pytest.fixture(scope="session")
+def app_module(app_data_dir, tmp_path_factory):
+    """Модуль ``app`` с данными из :func:`app_data_dir` и новой базой SQLite; импортируется один раз."""
+    from benchmark import import_app
+
+    application, _ = import_app(app_data_dir, tmp_path_factory.mktemp("app"), recs_cache=True)
+    return application
+
+
+_usernames = itertools.count()
+
+
+@pytest.fixture
+def client(app_module):
+    """Клиент Flask, вошедший под новым пользователем."""
+    test_client = app_module.app.test_client()
+    username = f"user{next(_usernames)}"
+    test_client.post("/api/register", json={"username": username, "email": f"{username}@example.com",
+                                            "password": "secret"})
+    response = test_client.post("/api/login", json={"username": username, "password": "secret"})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    with app_module.app.app_context():
+        test_client.user_id = app_module.User.query.filter_by(username=username).one().id
+    return test_client
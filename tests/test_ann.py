@@ -0,0 +1,54 @@
+"""Тесты recsys/ann.py: точный поиск при nprobe = nlist и отчёт о полноте."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from recsys.ann import IVFIndex, recall_report
+from recsys.topn import top_n_indices
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    vectors = np.random.default_rng(0).normal(size=(300, 8)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_full_probe_is_exact(vectors):
+    index = IVFIndex.build(vectors, nlist=16, seed=0)
+    for i in range(0, 300, 37):
+        found, scores = index.search(vectors[i], top_n=10, nprobe=index.nlist, exclude=np.array([i]))
+        expected = vectors @ vectors[i]
+        expected[i] = -np.inf
+        assert set(found.tolist()) == set(top_n_indices(expected, 10).tolist())
+        assert i not in found
+        assert scores == pytest.approx(vectors[found] @ vectors[i], abs=1e-6)
+
+
+def test_mips_matches_inner_product():
+    items = np.random.default_rng(1).normal(size=(200, 6)) * np.random.default_rng(2).uniform(0.2, 3, (200, 1))
+    index = IVFIndex.build(items, nlist=8, mips=True, seed=0)
+    query = np.random.default_rng(3).normal(size=6)
+    found, _ = index.search(query, top_n=5, nprobe=index.nlist)
+    assert found.tolist() == top_n_indices(items @ query, 5).tolist()
+
+
+def test_recall_report_uses_external_truth(vectors):
+    index = IVFIndex.build(vectors, nlist=16, seed=0)
+    sample = np.arange(0, 300, 10)
+    queries = vectors[sample]
+
+    def exact_top(i):
+        scores = vectors @ queries[i]
+        scores[sample[i]] = -np.inf
+        return top_n_indices(scores, 10)
+
+    report = recall_report(index, queries, exact_top, nprobes=[1, index.nlist], exclude=sample)
+    assert [row["nprobe"] for row in report] == [1, 16]
+    assert report[0]["recall"] < 1.0 and report[1]["recall"] == 1.0
+
+    # Эталон из другого пространства (например, полный tf-idf) при полном просмотре даёт полноту ниже 1.
+    other = np.random.default_rng(4).normal(size=vectors.shape)
+    report = recall_report(index, queries, lambda i: top_n_indices(other @ other[sample[i]], 10),
+                           nprobes=[index.nlist])
+    assert report[0]["recall"] < 0.5
@@ -0,0 +1,167 @@
+"""Тесты recsys/cache.py: хранилища, версии пользователей и ключи с версией артефактов."""
+from __future__ import annotations
+
+import json
+import sys
+import time
+import types
+
+import pytest
+
+from recsys.cache import InProcessBackend, RecommendationCache, RedisBackend, make_backend
+from recsys.precomputed import likes_fingerprint
+
+
+class FakeRedis:
+    """Минимальный клиент Redis: значения — байты, ``INCR`` хранит число строкой, как сервер."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    @classmethod
+    def from_url(cls, url):
+        client = cls()
+        client.url = url
+        return client
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        assert isinstance(value, bytes)
+        self.data[key] = value
+        self.ttls[key] = ex
+
+    def incr(self, key):
+        value = int(self.data.get(key, b"0")) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(Redis=FakeRedis))
+    return make_backend("redis", "redis://cache:6379/0")
+
+
+# --- Хранилища ------------------------------------------------------------------------
+
+def test_in_process_lru_and_ttl():
+    backend = InProcessBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+    backend.set("c", 3)
+    assert (backend.get("b"), backend.evictions) == (None, 1)
+
+    backend.set("short", 4, ttl=0.05)
+    time.sleep(0.06)
+    assert (backend.get("short"), backend.expirations) == (None, 1)
+
+
+def test_in_process_counters_are_never_evicted():
+    backend = InProcessBackend(max_entries=1)
+    assert backend.get_counter("ver:1") == 0
+    assert backend.incr("ver:1") == 1
+    for i in range(5):
+        backend.set(f"k{i}", i)
+    assert backend.get_counter("ver:1") == 1
+
+
+def test_redis_round_trip(redis_backend):
+    value = json.dumps({"movies": [{"tmdb_id": 1, "title": "Фильм"}], "total_count": 1}).encode()
+    redis_backend.set("recs:1", value, ttl=600)
+    assert redis_backend.get("recs:1") == value
+    assert redis_backend._client.ttls["recsys:recs:1"] == 600
+    assert redis_backend.get("missing") is None
+
+    redis_backend.set("obj", {"rows": [3, 1, 2], "meta": ("a", 1.5)})
+    assert redis_backend.get("obj") == {"rows": [3, 1, 2], "meta": ("a", 1.5)}
+
+
+def test_redis_counters_are_plain_integers(redis_backend):
+    assert redis_backend.get_counter("ver:7") == 0
+    assert redis_backend.incr("ver:7") == 1
+    assert redis_backend.incr("ver:7") == 2
+    assert redis_backend._client.data["recsys:ver:7"] == b"2"
+    assert redis_backend.get_counter("ver:7") == 2
+
+
+def test_make_backend_validation():
+    assert isinstance(make_backend("memory"), InProcessBackend)
+    with pytest.raises(ValueError):
+        make_backend("redis")
+    with pytest.raises(ValueError):
+        make_backend("memcached")
+
+
+# --- Версии и ключи -------------------------------------------------------------------
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, monkeypatch):
+    if request.param == "redis":
+        monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(Redis=FakeRedis))
+        return RecommendationCache(RedisBackend("redis://cache"))
+    return RecommendationCache(InProcessBackend())
+
+
+def test_invalidate_hides_old_entries(cache):
+    key = cache.key_for(1, "hybrid", (0.6, 0.4), namespace="v1")
+    cache.set(key, b"old")
+    assert cache.get(cache.key_for(1, "hybrid", (0.6, 0.4), namespace="v1")) == b"old"
+
+    cache.invalidate(1)
+    new_key = cache.key_for(1, "hybrid", (0.6, 0.4), namespace="v1")
+    assert new_key != key
+    assert cache.get(new_key) is None
+    # Другой пользователь не затронут.
+    assert cache.version(2) == 0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 1, 1)
+
+
+def test_namespace_separates_bundle_versions_and_likes(cache):
+    liked = likes_fingerprint([(10, 1), (20, -1)])
+    assert liked == likes_fingerprint([(20, -1), (10, 1)])
+    keys = {
+        cache.key_for(1, "hybrid", (0.6, 0.4), namespace=f"{version}:{fingerprint}")
+        for version in ("v1", "v2")
+        for fingerprint in (liked, likes_fingerprint([(10, 1)]))
+    }
+    assert len(keys) == 4
+    assert cache.key_for(1, "content", (0.6, 0.4)) != cache.key_for(1, "hybrid", (0.6, 0.4))
+    assert cache.key_for(1, "hybrid", (0.5, 0.5)) != cache.key_for(1, "hybrid", (0.6, 0.4))
+
+
+# --- Приложение -----------------------------------------------------------------------
+
+def smart_recommendations(client):
+    response = client.get("/api/smart-recommendations")
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_like_and_unlike_invalidate_user_cache(app_module, client):
+    cache = app_module.recommendation_cache
+    tmdb_ids = app_module.resources.get("movies")["tmdb_id"].dropna().astype(int).tolist()
+    user_id = client.user_id
+
+    assert client.post("/api/like", json={"tmdb_id": tmdb_ids[0], "value": 1}).status_code == 200
+    version = cache.version(user_id)
+    first = smart_recommendations(client)
+    hits = cache.hits
+    assert smart_recommendations(client) == first
+    assert cache.hits == hits + 1
+
+    assert client.post("/api/like", json={"tmdb_id": tmdb_ids[1], "value": -1}).status_code == 200
+    assert cache.version(user_id) == version + 1
+    misses = cache.misses
+    smart_recommendations(client)
+    assert cache.misses == misses + 1
+
+    assert client.post("/api/unlike", json={"tmdb_id": tmdb_ids[1]}).status_code == 200
+    assert cache.version(user_id) == version + 2
+    # Повторное удаление ничего не меняет и версию не увеличивает.
+    assert client.post("/api/unlike", json={"tmdb_id": tmdb_ids[1]}).status_code == 404
+    assert cache.version(user_id) == version + 2
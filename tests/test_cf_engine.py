@@ -0,0 +1,86 @@
+"""Совпадение SVDScorer с ``surprise.SVD.predict`` на маленькой обученной модели."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recsys.artifacts import ArtifactBundle, ArtifactWriter
+from recsys.cf_engine import SVDScorer
+
+surprise = pytest.importorskip("surprise")
+
+
+@pytest.fixture(scope="module")
+def trained_svd():
+    rng = np.random.default_rng(0)
+    n_users, n_items = 30, 40
+    pairs = {(int(u), int(i)) for u, i in zip(rng.integers(1, n_users + 1, 600), rng.integers(1, n_items + 1, 600))}
+    ratings = pd.DataFrame(sorted(pairs), columns=["userId", "movieId"])
+    # Смещения пользователей и фильмов, чтобы прогнозы упирались в границы шкалы.
+    ratings["rating"] = np.clip(np.round(2 * (3 + (ratings["userId"] % 5 - 2) + (ratings["movieId"] % 7 - 3) * 0.6
+                                              + rng.normal(0, 0.3, len(ratings)))) / 2, 0.5, 5.0)
+    data = surprise.Dataset.load_from_df(ratings[["userId", "movieId", "rating"]],
+                                         surprise.Reader(rating_scale=(0.5, 5.0)))
+    algo = surprise.SVD(n_factors=8, n_epochs=30, lr_all=0.01, reg_all=0.02, random_state=0)
+    algo.fit(data.build_full_trainset())
+    return algo
+
+
+def expected_scores(algo, user_id, item_ids):
+    return np.array([algo.predict(user_id, int(item_id)).est for item_id in item_ids])
+
+
+def test_known_user_matches_predict(trained_svd):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    for user_id in (1, 7, 30):
+        assert scorer.user_scores(user_id) == pytest.approx(expected_scores(trained_svd, user_id, scorer.item_ids),
+                                                           abs=1e-9)
+
+
+def test_scores_are_clipped_to_rating_scale(trained_svd):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    scores = np.concatenate([scorer.user_scores(user_id) for user_id in range(1, 31)])
+    assert scores.min() >= 0.5 and scores.max() <= 5.0
+    # Обрезка действительно срабатывает: иначе тест не проверял бы её.
+    assert (scores == 5.0).any() or (scores == 0.5).any()
+
+
+def test_unknown_user_gets_item_baseline(trained_svd):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    expected = expected_scores(trained_svd, 10_000, scorer.item_ids)
+    assert scorer.user_scores(10_000) == pytest.approx(expected, abs=1e-9)
+    assert scorer.factors_for(10_000) is None
+
+
+def test_unknown_items_are_dropped(trained_svd):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    positions = scorer.item_positions([5, 999, 1, -3])
+    assert scorer.item_ids[positions].tolist() == [5, 1]
+    assert scorer.item_positions([]).size == 0
+
+
+def test_masked_scores_and_recommend(trained_svd):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    exclude = scorer.item_positions([1, 2, 3])
+    candidates = np.ones(scorer.n_items, dtype=bool)
+    candidates[scorer.item_positions([4])] = False
+    scores = scorer.masked_scores(7, exclude=exclude, candidates=candidates)
+    assert np.isneginf(scores[exclude]).all()
+    assert np.isneginf(scores[scorer.item_positions([4])]).all()
+
+    top, top_scores = scorer.recommend(7, top_n=5, exclude=exclude, candidates=candidates)
+    allowed = {int(item_id) for item_id in scorer.item_ids} - {1, 2, 3, 4}
+    predicted = sorted(((trained_svd.predict(7, item_id).est, item_id) for item_id in allowed), reverse=True)
+    assert top_scores == pytest.approx([est for est, _ in predicted[:5]], abs=1e-9)
+    assert set(scorer.item_ids[top].tolist()) <= allowed
+
+
+def test_bundle_round_trip(trained_svd, tmp_path):
+    scorer = SVDScorer.from_surprise(trained_svd)
+    writer = ArtifactWriter(str(tmp_path))
+    scorer.save_to(writer)
+    writer.finish()
+    restored = SVDScorer.from_bundle(ArtifactBundle.open(str(tmp_path)))
+    assert restored.user_scores(7) == pytest.approx(scorer.user_scores(7), abs=1e-12)
+    assert restored.user_scores(10_000) == pytest.approx(scorer.user_scores(10_000), abs=1e-12)
@@ -0,0 +1,152 @@
+"""Тесты recsys/content_index.py: совпадение с полной сортировкой плотной матрицы."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from recsys.content_index import NeighbourIndex, parity_report
+
+
+def dense_cosine(n_items: int = 40, dim: int = 6, seed: int = 0) -> np.ndarray:
+    """Косинусная близость, округлённая до 0.1: много равных значений в каждой строке."""
+    vectors = np.random.default_rng(seed).random((n_items, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarity = np.round(vectors @ vectors.T, 1)
+    # Близость к себе строго больше остальных, как у разных фильмов с tf-idf.
+    similarity = np.minimum(similarity, 0.9)
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
+
+
+def full_sort(similarity: np.ndarray, i: int, top_n: int) -> list:
+    """Прежний алгоритм: ``sorted(enumerate(row), reverse=True)[1:top_n + 1]``."""
+    ranked = sorted(enumerate(similarity[i]), key=lambda x: x[1], reverse=True)
+    return [j for j, _ in ranked[1:top_n + 1]]
+
+
+@pytest.mark.parametrize("k,top_n", [(10, 10), (10, 5), (39, 20), (100, 39)])
+def test_top_n_matches_full_sort_with_ties(k, top_n):
+    similarity = dense_cosine()
+    assert any(len(set(row)) < len(row) for row in similarity)
+    index = NeighbourIndex.from_dense(similarity, k=k)
+    for i in range(similarity.shape[0]):
+        neighbours, scores = index.neighbours(i)
+        assert neighbours[:top_n].tolist() == full_sort(similarity, i, top_n)[:min(top_n, index.k)]
+        assert scores[:top_n] == pytest.approx(similarity[i, neighbours[:top_n]])
+
+
+def test_k_smaller_than_top_n_returns_k_neighbours():
+    similarity = dense_cosine()
+    index = NeighbourIndex.from_dense(similarity, k=3)
+    assert index.k == 3
+    for i in range(similarity.shape[0]):
+        assert index.neighbours(i)[0].tolist() == full_sort(similarity, i, 3)
+
+
+def test_from_vectors_matches_from_dense():
+    vectors = np.random.default_rng(1).random((25, 5))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    dense = NeighbourIndex.from_dense(vectors @ vectors.T, k=7)
+    blocked = NeighbourIndex.from_vectors(vectors, k=7, batch_size=4)
+    assert np.array_equal(dense.indices, blocked.indices)
+    assert blocked.scores == pytest.approx(dense.scores)
+
+
+def test_movie_itself_is_excluded_even_when_tied():
+    # Фильмы 0 и 1 совпадают: у строки 1 первой идёт строка 0, а не сам фильм.
+    similarity = np.array([[1.0, 1.0, 0.2], [1.0, 1.0, 0.3], [0.2, 0.3, 1.0]])
+    index = NeighbourIndex.from_dense(similarity, k=2)
+    assert index.neighbours(1)[0].tolist() == [0, 2]
+    assert all(i not in index.neighbours(i)[0] for i in range(3))
+
+
+def test_parity_report():
+    similarity = dense_cosine()
+    assert parity_report(similarity, NeighbourIndex.from_dense(similarity, k=10), top_n=10) == {
+        "rows_checked": 40, "exact_match_ratio": 1.0, "mean_overlap": 1.0}
+    report = parity_report(similarity, NeighbourIndex.from_dense(similarity, k=5), top_n=10, rows=[0, 1])
+    assert report["rows_checked"] == 2
+    assert report["exact_match_ratio"] == 0.0
+    assert report["mean_overlap"] == pytest.approx(0.5)
+
+
+# --- Сводная близость по нескольким источникам ---------------------------------------
+
+def reference_aggregate(similarity: np.ndarray, index: NeighbourIndex, seeds, weights, reducer: str) -> np.ndarray:
+    """Поэлементный эталон ``aggregate``: близость берётся только у соседей из индекса."""
+    n_items = similarity.shape[0]
+    per_seed = np.zeros((len(seeds), n_items))
+    known = np.zeros((len(seeds), n_items), dtype=bool)
+    for s, seed in enumerate(seeds):
+        neighbours = index.neighbours(seed)[0]
+        per_seed[s, neighbours] = similarity[seed, neighbours]
+        known[s, neighbours] = True
+    weights = np.asarray(weights, dtype=np.float64)
+    likes, dislikes = weights > 0, weights < 0
+    expected = np.empty(n_items)
+    for j in range(n_items):
+        pos = per_seed[likes, j] * weights[likes]
+        neg = -per_seed[dislikes, j] * weights[dislikes]
+        if reducer == "max":
+            expected[j] = pos.max(initial=0.0) - neg.max(initial=0.0)
+        elif reducer == "mean":
+            expected[j] = pos.sum() / max(likes.sum(), 1) - neg.sum() / max(dislikes.sum(), 1)
+        else:
+            expected[j] = (per_seed[:, j] * weights).sum() / np.abs(weights).sum()
+    expected[~known[likes].any(axis=0)] = -np.inf
+    return expected
+
+
+@pytest.mark.parametrize("reducer", ["max", "mean", "weighted"])
+def test_aggregate_reducers_subtract_dislikes(reducer):
+    similarity = dense_cosine(seed=3)
+    index = NeighbourIndex.from_dense(similarity, k=8)
+    seeds, weights = [0, 5, 9, 17], [1.0, 2.0, -1.0, -1.0]
+    got = index.aggregate(np.array(seeds), np.array(weights), reducer=reducer)
+    expected = reference_aggregate(similarity, index, seeds, weights, reducer)
+    assert np.array_equal(np.isinf(got), np.isinf(expected))
+    finite = np.isfinite(expected)
+    assert got[finite] == pytest.approx(expected[finite], abs=1e-6)
+
+
+def test_dislikes_lower_scores_and_never_reach_items():
+    similarity = dense_cosine(seed=4)
+    index = NeighbourIndex.from_dense(similarity, k=6)
+    liked = index.aggregate(np.array([2]), np.array([1.0]))
+    with_dislike = index.aggregate(np.array([2, 7]), np.array([1.0, -1.0]))
+    assert np.all(with_dislike <= liked)
+    # Соседи одного лишь дизлайка не становятся кандидатами.
+    only_disliked = np.setdiff1d(index.neighbours(7)[0], index.neighbours(2)[0])
+    assert np.all(np.isneginf(with_dislike[only_disliked]))
+    assert np.all(np.isneginf(index.aggregate(np.array([7]), np.array([-1.0]))))
+
+
+def test_aggregate_rejects_unknown_reducer():
+    index = NeighbourIndex.from_dense(dense_cosine(), k=3)
+    with pytest.raises(ValueError):
+        index.aggregate(np.array([0]), reducer="median")
+
+
+def test_recommend_excludes_seeds_and_exclusions():
+    similarity = dense_cosine(seed=5)
+    index = NeighbourIndex.from_dense(similarity, k=10)
+    seeds = np.array([1, 3])
+    top, scores = index.recommend(seeds, top_n=5, exclude=np.array([index.neighbours(1)[0][0]]))
+    assert not set(top) & {1, 3, int(index.neighbours(1)[0][0])}
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_app_content_scores_are_the_single_batch_entry_point(app_module):
+    catalog = app_module.resources.get("catalog")
+    movies = app_module.resources.get("movies")
+    tmdb_ids = movies["tmdb_id"].dropna().astype(int).tolist()
+    known = [tmdb_id for tmdb_id in tmdb_ids
+             if catalog.row_to_cb[catalog.rows_for_tmdb_ids([tmdb_id])[0]] >= 0][:3]
+    assert app_module.get_batch_content_scores(known[:1], [-1]) is None
+    assert app_module.get_batch_content_scores([-12345], [1]) is None
+
+    scores = app_module.get_batch_content_scores(known + [-12345], [1, 1, -1, 1], reducer="mean")
+    seeds = catalog.row_to_cb[catalog.rows_for_tmdb_ids(known)]
+    expected = app_module.resources.get("content_neighbours").aggregate(seeds, np.array([1.0, 1.0, -1.0]),
+                                                                        reducer="mean")
+    assert np.array_equal(scores, expected)
@@ -0,0 +1,145 @@
+"""Тесты recsys/database.py и пакетной записи оценок: upsert, миграция старой базы, /api/likes/batch."""
+from __future__ import annotations
+
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, UniqueConstraint, create_engine, select
+from sqlalchemy.dialects import postgresql
+
+from recsys.database import dedupe_last, ensure_unique_key, has_unique_key, upsert
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def like_table(metadata: MetaData, unique: bool = True) -> Table:
+    constraints = [UniqueConstraint("user_id", "tmdb_id", name="unique_user_movie_like")] if unique else []
+    return Table("like", metadata, Column("id", Integer, primary_key=True), Column("user_id", Integer),
+                 Column("tmdb_id", Integer), Column("value", Integer), Column("timestamp", DateTime), *constraints)
+
+
+def rows(engine, table):
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(
+            select(table.c.user_id, table.c.tmdb_id, table.c.value).order_by(table.c.user_id, table.c.tmdb_id))]
+
+
+# --- upsert ---------------------------------------------------------------------------
+
+def test_upsert_inserts_then_updates():
+    engine = create_engine("sqlite://")
+    table = like_table(MetaData())
+    table.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(upsert(table, [{"user_id": 1, "tmdb_id": 10, "value": 1},
+                                          {"user_id": 1, "tmdb_id": 11, "value": 1},
+                                          {"user_id": 2, "tmdb_id": 10, "value": -1}],
+                                  ("user_id", "tmdb_id"), ("value",), "sqlite"))
+        connection.execute(upsert(table, [{"user_id": 1, "tmdb_id": 10, "value": -1},
+                                          {"user_id": 1, "tmdb_id": 12, "value": 1}],
+                                  ("user_id", "tmdb_id"), ("value",), "sqlite"))
+    assert rows(engine, table) == [(1, 10, -1), (1, 11, 1), (1, 12, 1), (2, 10, -1)]
+
+
+def test_upsert_dialects():
+    table = like_table(MetaData())
+    statement = upsert(table, [{"user_id": 1, "tmdb_id": 2, "value": 1}], ("user_id", "tmdb_id"), ("value",),
+                       "postgresql")
+    statement = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (user_id, tmdb_id) DO UPDATE SET value = excluded.value" in statement
+    with pytest.raises(ValueError):
+        upsert(table, [{"user_id": 1}], ("user_id",), ("value",), "mysql")
+
+
+def test_dedupe_last_keeps_last_value_in_first_position():
+    items = [{"tmdb_id": 1, "value": 1}, {"tmdb_id": 2, "value": 1}, {"tmdb_id": 1, "value": 0}]
+    assert dedupe_last(items, ("tmdb_id",)) == [{"tmdb_id": 1, "value": 0}, {"tmdb_id": 2, "value": 1}]
+
+
+# --- Миграция -------------------------------------------------------------------------
+
+def test_ensure_unique_key_removes_duplicates_once():
+    engine = create_engine("sqlite://")
+    table = like_table(MetaData(), unique=False)
+    table.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(table.insert(), [{"user_id": 1, "tmdb_id": 10, "value": 1},
+                                            {"user_id": 1, "tmdb_id": 10, "value": -1},
+                                            {"user_id": 2, "tmdb_id": 10, "value": 1}])
+    assert not has_unique_key(engine, "like", ("user_id", "tmdb_id"))
+
+    ensure_unique_key(engine, table, ("user_id", "tmdb_id"), "uq_like_user_movie")
+    assert has_unique_key(engine, "like", ("user_id", "tmdb_id"))
+    # Остаётся последняя (с наибольшим id) строка ключа.
+    assert rows(engine, table) == [(1, 10, -1), (2, 10, 1)]
+    ensure_unique_key(engine, table, ("user_id", "tmdb_id"), "uq_like_user_movie")
+    assert rows(engine, table) == [(1, 10, -1), (2, 10, 1)]
+
+
+def test_import_leaves_legacy_database_to_migrate_db(app_data_dir, tmp_path):
+    database = tmp_path / "legacy.db"
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE like (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                           "tmdb_id INTEGER NOT NULL, value INTEGER NOT NULL, timestamp DATETIME)")
+        connection.executemany("INSERT INTO like (user_id, tmdb_id, value) VALUES (?, ?, ?)",
+                               [(1, 10, 1), (1, 10, -1), (1, 11, 1)])
+    code = """
+import sqlite3, sys
+import app
+count = lambda: sqlite3.connect(sys.argv[1]).execute("SELECT COUNT(*) FROM like").fetchone()[0]
+assert count() == 3, count()
+result = app.app.test_cli_runner().invoke(args=["migrate-db"])
+assert result.exit_code == 0, result.output
+print(result.output)
+assert count() == 2, count()
+"""
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "RECSYS_DATA_DIR": str(app_data_dir),
+           "DATABASE_URL": f"sqlite:///{database}", "RESOURCE_LOADING": "background", "ARTIFACTS_WATCH_INTERVAL": "0"}
+    result = subprocess.run([sys.executable, "-c", code, str(database)], cwd=tmp_path, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert "migrate-db" in result.stdout and "[INFO] Схема базы обновлена" in result.stdout
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT user_id, tmdb_id, value FROM like ORDER BY tmdb_id").fetchall() == \
+            [(1, 10, -1), (1, 11, 1)]
+
+
+# --- /api/likes/batch -----------------------------------------------------------------
+
+def user_likes(client) -> dict:
+    return {like["tmdb_id"]: like["value"] for like in client.get("/api/user-likes").get_json()["likes"]}
+
+
+def test_likes_batch_applies_last_value_per_movie(app_module, client):
+    response = client.post("/api/likes/batch", json={"likes": [
+        {"tmdb_id": 10, "value": 1}, {"tmdb_id": 11, "value": 1}, {"tmdb_id": 10, "value": -1},
+    ]})
+    assert response.get_json() == {"status": "success", "updated": 2, "removed": 0}
+    assert user_likes(client) == {10: -1, 11: 1}
+
+    response = client.post("/api/likes/batch", json={"likes": [
+        {"tmdb_id": 11, "value": 0}, {"tmdb_id": 12, "value": 1}, {"tmdb_id": 12, "value": 0},
+        {"tmdb_id": 10, "value": 1},
+    ]})
+    assert response.get_json() == {"status": "success", "updated": 1, "removed": 1}
+    assert user_likes(client) == {10: 1}
+    with app_module.app.app_context():
+        assert app_module.Like.query.filter_by(user_id=client.user_id, tmdb_id=10).count() == 1
+
+    # Одиночный лайк того же фильма обновляет строку, а не добавляет вторую.
+    assert client.post("/api/like", json={"tmdb_id": 10, "value": -1}).status_code == 200
+    with app_module.app.app_context():
+        assert [like.value for like in app_module.Like.query.filter_by(user_id=client.user_id).all()] == [-1]
+
+
+@pytest.mark.parametrize("payload", [
+    {}, {"likes": []}, {"likes": [{"tmdb_id": "10", "value": 1}]}, {"likes": [{"tmdb_id": 10, "value": 2}]},
+    {"likes": [{"tmdb_id": i, "value": 1} for i in range(501)]},
+])
+def test_likes_batch_rejects_invalid_payload(client, payload):
+    assert client.post("/api/likes/batch", json=payload).status_code == 400
+    assert user_likes(client) == {}
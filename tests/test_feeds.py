@@ -0,0 +1,108 @@
+"""Тесты подборок /api/popular и /api/new: страницы, жанры и условные запросы."""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from werkzeug.http import http_date
+
+from recsys.feeds import Feed
+from recsys.serialization import MovieFragments
+
+CREATED = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+
+def make_feed(**options) -> Feed:
+    fragments = MovieFragments([json.dumps({"id": i}).encode() for i in range(6)])
+    genres = [["Drama"], "Comedy, Drama", [], ["Action", "Comedy"], None, np.array(["drama"])]
+    return Feed("test", np.array([5, 3, 1, 0, 2, 4]), fragments, genres, last_modified=CREATED, **options)
+
+
+def ids(payload: bytes) -> list:
+    return [movie["id"] for movie in json.loads(payload)]
+
+
+# --- Feed -----------------------------------------------------------------------------
+
+def test_pages_follow_feed_order():
+    feed = make_feed(default_limit=4)
+    assert ids(feed.page()[0]) == [5, 3, 1, 0]
+    assert ids(feed.page(offset=2, limit=3)[0]) == [1, 0, 2]
+    assert ids(feed.page(offset=5, limit=10)[0]) == [4]
+    assert ids(feed.page(offset=-3, limit=1)[0]) == [5]
+    assert ids(feed.page(limit=0)[0]) == []
+
+
+def test_genre_filter_is_case_insensitive():
+    feed = make_feed()
+    assert ids(feed.page(genre="drama")[0]) == [5, 1, 0]
+    assert ids(feed.page(genre="COMEDY", limit=1)[0]) == [3]
+    assert ids(feed.page(genre="Western")[0]) == []
+
+
+def test_validators_depend_only_on_content():
+    payload, etag = make_feed().page(limit=3)
+    assert etag == hashlib.sha1(payload).hexdigest()
+    # Та же подборка после «перезапуска» получает тот же ETag.
+    assert make_feed().page(limit=3) == (payload, etag)
+    assert make_feed().page(limit=2)[1] != etag
+    assert make_feed().last_modified == CREATED
+
+
+# --- Эндпоинты ------------------------------------------------------------------------
+
+@pytest.fixture
+def anonymous(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("path", ["/api/popular", "/api/new"])
+def test_feed_headers(app_module, anonymous, path):
+    response = anonymous.get(path)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{hashlib.sha1(response.data).hexdigest()}"'
+    bundle = app_module.ArtifactBundle.open(app_module.ARTIFACTS_DIR)
+    assert response.last_modified == bundle.created_at
+    assert response.cache_control.public and response.cache_control.max_age == app_module.FEED_MAX_AGE
+
+    again = anonymous.get(path)
+    assert again.headers["ETag"] == response.headers["ETag"]
+    assert again.headers["Last-Modified"] == response.headers["Last-Modified"]
+
+
+@pytest.mark.parametrize("path", ["/api/popular", "/api/new"])
+def test_conditional_requests(anonymous, path):
+    first = anonymous.get(path)
+    etag, last_modified = first.headers["ETag"], first.last_modified
+
+    assert anonymous.get(path, headers={"If-None-Match": etag}).status_code == 304
+    assert anonymous.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+    assert anonymous.get(path, headers={"If-Modified-Since": http_date(last_modified)}).status_code == 304
+    older = http_date(last_modified - timedelta(days=1))
+    assert anonymous.get(path, headers={"If-Modified-Since": older}).status_code == 200
+    # Другая страница — другое тело и ETag: старый валидатор её не подтверждает.
+    other_page = anonymous.get(f"{path}?offset=1&limit=3", headers={"If-None-Match": etag})
+    assert other_page.status_code == 200 and other_page.headers["ETag"] != etag
+
+
+def test_popular_pagination_and_genre(app_module, anonymous):
+    full = anonymous.get("/api/popular?limit=1000").get_json()
+    assert len(full) == min(len(app_module.resources.get("popular_movies")), app_module.FEED_MAX_LIMIT)
+    page = anonymous.get("/api/popular?offset=2&limit=5").get_json()
+    assert [movie["tmdb_id"] for movie in page] == [movie["tmdb_id"] for movie in full[2:7]]
+
+    genre = full[0]["genres"][0] if isinstance(full[0]["genres"], list) else full[0]["genres"].split(",")[0]
+    filtered = anonymous.get(f"/api/popular?genre={genre.upper()}&limit=100").get_json()
+    assert filtered and all(genre in str(movie["genres"]) for movie in filtered)
+    expected = [movie["tmdb_id"] for movie in full if genre in str(movie["genres"])]
+    assert [movie["tmdb_id"] for movie in filtered] == expected
+    assert anonymous.get("/api/popular?genre=no-such-genre").get_json() == []
+
+
+def test_new_feed_is_sorted_by_release_date(anonymous):
+    movies = anonymous.get("/api/new?limit=20").get_json()
+    dates = [movie["release_date"] for movie in movies]
+    assert dates == sorted(dates, reverse=True)
@@ -0,0 +1,231 @@
+"""Тесты scripts/fetch_imdb_posters.py против локальной заглушки IMDb."""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from typing import Optional
+
+import pandas as pd
+import pytest
+
+import fetch_imdb_posters as fetcher
+
+IMAGE = b"\xff\xd8\xff\xe0 fake jpeg"
+
+
+def has_aiohttp() -> bool:
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+MODES = ["thread", pytest.param("async", marks=pytest.mark.skipif(not has_aiohttp(), reason="needs aiohttp"))]
+
+
+def page(poster_url: Optional[str] = None, body: bytes = b"<p>plot</p>") -> bytes:
+    meta = f'<meta property="og:image" content="{poster_url}">' if poster_url else ""
+    return f"<html><head><title>Film</title>{meta}</head><body>".encode() + body + b"</body></html>"
+
+
+def serve_film(stub, imdb_id: str, *page_responses) -> None:
+    """Страница фильма (по умолчанию с постером на заглушке) и сам постер."""
+    poster_url = f"{stub.url}/img/tt{imdb_id}.jpg"
+    stub.route(f"/title/tt{imdb_id}/", *(page_responses or [(200, {"Content-Type": "text/html"}, page(poster_url))]))
+    stub.route(f"/img/tt{imdb_id}.jpg", (200, {"Content-Type": "image/jpeg"}, IMAGE))
+
+
+def write_links(data_dir, imdb_ids) -> None:
+    data_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "movieId": range(1, len(imdb_ids) + 1),
+        "imdbId": [int(imdb_id) for imdb_id in imdb_ids],
+        "tmdbId": range(101, 101 + len(imdb_ids)),
+    }).to_csv(data_dir / "links.csv", index=False)
+
+
+def run_fetcher(monkeypatch, tmp_path, stub, *extra) -> pd.DataFrame:
+    data_dir, out_dir = tmp_path / "data", tmp_path / "static" / "posters"
+    argv = ["fetch_imdb_posters.py", "--data-dir", str(data_dir), "--out-dir", str(out_dir),
+            "--base-url", stub.url, "--rate", "0", "--timeout", "5", *extra]
+    monkeypatch.setattr(sys, "argv", argv)
+    fetcher.main()
+    result = pd.read_parquet(data_dir / "links_with_posters.parquet")
+    return result.set_index("imdbId")
+
+
+def film_args(stub, **overrides) -> argparse.Namespace:
+    options = {"base_url": stub.url, "timeout": 5.0, "retries": 3, "backoff": 30.0}
+    options.update(overrides)
+    return argparse.Namespace(**options)
+
+
+# --- Разбор страницы -----------------------------------------------------------
+
+def test_og_image_after_head_is_ignored():
+    poster = "https://m.media-amazon.com/images/M/poster.jpg"
+    in_body = b'</head><body><meta property="og:image" content="' + poster.encode() + b'">'
+    assert fetcher.scan_page_head(b"<html><head><title>x</title>" + in_body) == (None, True)
+    assert fetcher.scan_page_head(page(poster)) == (poster, True)
+
+
+def test_scan_continues_until_head_is_complete():
+    poster_url, done = fetcher.scan_page_head(b"<html><head><title>x</title>")
+    assert (poster_url, done) == (None, False)
+
+
+def test_fetch_poster_url_stops_reading_at_head_end(stub_server):
+    poster_url = f"{stub_server.url}/img/tt0000001.jpg"
+    late_tag = f'<meta property="og:image" content="{poster_url}">'.encode()
+    # Тег после </head> в том же пакете и в конце длинного тела не должен найтись.
+    body = [b"<html><head><title>x</title></head><body>" + late_tag, b"x" * 200_000, late_tag]
+    stub_server.route("/title/tt0000001/", (200, {"Content-Type": "text/html"}, body))
+    stub_server.route("/title/tt0000002/", (200, {"Content-Type": "text/html"},
+                                            [page(poster_url), b"x" * 200_000]))
+
+    assert fetcher.fetch_poster_url("0000001", stub_server.url, 5) is None
+    assert fetcher.fetch_poster_url("0000002", stub_server.url, 5) == poster_url
+
+
+def test_foreign_poster_host_is_rejected(stub_server):
+    stub_server.route("/title/tt0000003/", (200, {"Content-Type": "text/html"},
+                                            page("https://evil.example/poster.jpg")))
+    assert fetcher.fetch_poster_url("0000003", stub_server.url, 5) is None
+
+
+# --- Повторы --------------------------------------------------------------------
+
+def test_retry_after_is_honoured(stub_server, tmp_path):
+    serve_film(stub_server, "0000010",
+               (429, {"Retry-After": "0.2"}, b""),
+               (503, {"Retry-After": "0.2"}, b""),
+               (200, {"Content-Type": "text/html"}, page(f"{stub_server.url}/img/tt0000010.jpg")))
+    dest = tmp_path / "posters" / "tt0000010.jpg"
+    dest.parent.mkdir()
+
+    started = time.monotonic()
+    # backoff=30: без Retry-After тест ждал бы десятки секунд.
+    status = fetcher.fetch_one("0000010", dest, film_args(stub_server), fetcher.TokenBucket(0))
+    assert status == (fetcher.STATUS_OK, "posters/tt0000010.jpg")
+    assert time.monotonic() - started < 5
+    hits = stub_server.hits("/title/tt0000010/")
+    assert len(hits) == 3
+    assert all(later.at - earlier.at >= 0.19 for earlier, later in zip(hits, hits[1:]))
+    assert dest.read_bytes() == IMAGE
+
+
+def test_retries_exhausted_is_error(stub_server, tmp_path):
+    serve_film(stub_server, "0000011", (500, {}, b""))
+    status = fetcher.fetch_one("0000011", tmp_path / "tt0000011.jpg",
+                               film_args(stub_server, retries=2, backoff=0.01), fetcher.TokenBucket(0))
+    assert status == (fetcher.STATUS_ERROR, None)
+    assert len(stub_server.hits("/title/tt0000011/")) == 3
+
+
+def test_client_error_is_not_retried(stub_server, tmp_path):
+    serve_film(stub_server, "0000012", (403, {}, b""))
+    status = fetcher.fetch_one("0000012", tmp_path / "tt0000012.jpg", film_args(stub_server), fetcher.TokenBucket(0))
+    assert status == (fetcher.STATUS_ERROR, None)
+    assert len(stub_server.hits("/title/tt0000012/")) == 1
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_retry_after_in_both_modes(stub_server, tmp_path, monkeypatch, mode):
+    write_links(tmp_path / "data", ["0000020"])
+    serve_film(stub_server, "0000020",
+               (429, {"Retry-After": "0.2"}, b""),
+               (200, {"Content-Type": "text/html"}, page(f"{stub_server.url}/img/tt0000020.jpg")))
+
+    started = time.monotonic()
+    result = run_fetcher(monkeypatch, tmp_path, stub_server, "--mode", mode, "--backoff", "30")
+    assert time.monotonic() - started < 5
+    assert result.loc["0000020", "poster_status"] == fetcher.STATUS_OK
+    hits = stub_server.hits("/title/tt0000020/")
+    assert len(hits) == 2 and hits[1].at - hits[0].at >= 0.19
+
+
+# --- Ограничение частоты -------------------------------------------------------------
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = fetcher.TokenBucket(rate=10, burst=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[3] == pytest.approx(0.2, abs=0.02)
+
+
+def test_token_bucket_refills_over_time():
+    bucket = fetcher.TokenBucket(rate=20, burst=1)
+    assert bucket.reserve() == 0.0
+    time.sleep(0.06)
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = fetcher.TokenBucket(rate=0)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_rate_limit_spans_concurrent_workers(stub_server, tmp_path, monkeypatch, mode):
+    imdb_ids = [f"{i:07d}" for i in range(30, 36)]
+    write_links(tmp_path / "data", imdb_ids)
+    for imdb_id in imdb_ids:
+        serve_film(stub_server, imdb_id)
+
+    rate = 20.0
+    result = run_fetcher(monkeypatch, tmp_path, stub_server, "--mode", mode, "--concurrency", "6",
+                         "--rate", str(rate), "--burst", "1")
+    assert (result["poster_status"] == fetcher.STATUS_OK).all()
+    hits = sorted(request.at for request in stub_server.hits())
+    # Страница и постер каждого фильма: 12 запросов не быстрее 20 в секунду.
+    assert len(hits) == 12
+    assert hits[-1] - hits[0] >= (len(hits) - 1) / rate * 0.9
+
+
+# --- Продолжение после остановки ---------------------------------------------------
+
+@pytest.mark.parametrize("mode", MODES)
+def test_resume_skips_finished_and_retries_errors(stub_server, tmp_path, monkeypatch, mode):
+    done, missing, failed, new = "0000041", "0000042", "0000043", "0000044"
+    data_dir = tmp_path / "data"
+    write_links(data_dir, [done, missing, failed, new])
+    pd.DataFrame({
+        "movieId": [1, 2, 3],
+        "imdbId": [done, missing, failed],
+        "tmdbId": [101, 102, 103],
+        "local_poster": [f"posters/tt{done}.jpg", None, None],
+        "poster_status": [fetcher.STATUS_OK, fetcher.STATUS_MISSING, fetcher.STATUS_ERROR],
+    }).to_parquet(data_dir / "links_with_posters.parquet", index=False)
+    for imdb_id in (done, missing, failed, new):
+        serve_film(stub_server, imdb_id)
+
+    result = run_fetcher(monkeypatch, tmp_path, stub_server, "--mode", mode)
+
+    requested = {request.path for request in stub_server.hits() if request.path.startswith("/title/")}
+    assert requested == {f"/title/tt{failed}/", f"/title/tt{new}/"}
+    assert result.loc[done, "local_poster"] == f"posters/tt{done}.jpg"
+    assert result.loc[missing, "poster_status"] == fetcher.STATUS_MISSING
+    assert result.loc[failed, "poster_status"] == fetcher.STATUS_OK
+    assert result.loc[new, "poster_status"] == fetcher.STATUS_OK
+    assert (tmp_path / "static" / "posters" / f"tt{new}.jpg").read_bytes() == IMAGE
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_missing_poster_and_errors_are_recorded(stub_server, tmp_path, monkeypatch, mode):
+    write_links(tmp_path / "data", ["0000051", "0000052"])
+    serve_film(stub_server, "0000051", (200, {"Content-Type": "text/html"}, page()))
+    serve_film(stub_server, "0000052", (500, {}, b""))
+
+    result = run_fetcher(monkeypatch, tmp_path, stub_server, "--mode", mode, "--retries", "1", "--backoff", "0.01")
+    assert result.loc["0000051", "poster_status"] == fetcher.STATUS_MISSING
+    assert result.loc["0000052", "poster_status"] == fetcher.STATUS_ERROR
+
+    # Следующий запуск запрашивает только фильм с ошибкой.
+    serve_film(stub_server, "0000052")
+    stub_server.requests.clear()
+    result = run_fetcher(monkeypatch, tmp_path, stub_server, "--mode", mode)
+    assert {request.path for request in stub_server.hits()} == {"/title/tt0000052/", "/img/tt0000052.jpg"}
+    assert result.loc["0000052", "poster_status"] == fetcher.STATUS_OK
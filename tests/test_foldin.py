@@ -0,0 +1,87 @@
+"""Тесты recsys/foldin.py: обновления ранга 1 дают то же решение, что и задача с нуля."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from recsys.cf_engine import SVDScorer
+from recsys.foldin import UserFoldIn
+
+N_ITEMS, N_FACTORS, REG = 30, 5, 0.1
+
+
+@pytest.fixture
+def scorer():
+    rng = np.random.default_rng(0)
+    return SVDScorer(pu=rng.normal(0, 0.3, (4, N_FACTORS)), qi=rng.normal(0, 0.3, (N_ITEMS, N_FACTORS)),
+                     bu=rng.normal(0, 0.2, 4), bi=rng.normal(0, 0.5, N_ITEMS), global_mean=3.5,
+                     user_ids=[1, 2, 3, 4], item_ids=np.arange(100, 100 + N_ITEMS))
+
+
+def closed_form(scorer: SVDScorer, values: dict, reg: float = REG):
+    """Гребневая регрессия ``min ‖Xw - y‖² + λ‖w‖²`` с ``x = [qi, 1]`` и ``w = [pu, bu]``."""
+    positions = np.array(sorted(values), dtype=np.int64)
+    features = np.hstack([scorer.qi[positions], np.ones((positions.size, 1))])
+    lower, upper = scorer.rating_scale
+    ratings = np.array([upper if values[position] == 1 else lower for position in positions])
+    target = ratings - scorer.global_mean - scorer.bi[positions]
+    solution = np.linalg.solve(features.T @ features + reg * np.eye(N_FACTORS + 1), features.T @ target)
+    return solution[:-1], solution[-1]
+
+
+def assert_factors(factors, expected):
+    assert factors[0] == pytest.approx(expected[0], abs=1e-10)
+    assert factors[1] == pytest.approx(expected[1], abs=1e-10)
+
+
+def test_build_matches_closed_form(scorer):
+    foldin = UserFoldIn(scorer, reg=REG)
+    values = {0: 1, 3: -1, 7: 1, 12: 1}
+    factors = foldin.build(42, np.array(list(values)), list(values.values()), foldin.generation(42))
+    assert_factors(factors, closed_form(scorer, values))
+    assert_factors(foldin.factors(42, values), closed_form(scorer, values))
+
+
+def test_rank_one_updates_match_closed_form(scorer):
+    foldin = UserFoldIn(scorer, reg=REG)
+    values = {0: 1, 5: 1}
+    foldin.build(7, np.array(list(values)), list(values.values()), foldin.generation(7))
+
+    # Лайк, дизлайк, смена лайка на дизлайк, отмена и повторный лайк того же фильма.
+    events = [(9, 1), (14, -1), (5, -1), (0, None), (21, 1), (14, None), (0, 1), (9, 1)]
+    for position, value in events:
+        foldin.update(7, position, value)
+        if value is None:
+            values.pop(position)
+        else:
+            values[position] = value
+        assert_factors(foldin.factors(7, values), closed_form(scorer, values))
+
+
+def test_stale_state_is_rebuilt(scorer):
+    foldin = UserFoldIn(scorer, reg=REG)
+    foldin.build(7, np.array([0, 1]), [1, 1], foldin.generation(7))
+    # Лайк обработал другой процесс: состояние не совпадает с лайками из БД.
+    assert foldin.factors(7, {0: 1, 1: 1, 2: -1}) is None
+
+    # Лайк пришёл, пока состояние строилось по старым лайкам: результат не кэшируется.
+    generation = foldin.generation(9)
+    foldin.update(9, 4, 1)
+    foldin.build(9, np.array([0]), [1], generation)
+    assert foldin.factors(9) is None
+
+
+def test_unknown_movie_only_bumps_generation(scorer):
+    foldin = UserFoldIn(scorer, reg=REG)
+    foldin.build(7, np.array([0]), [1], foldin.generation(7))
+    foldin.update(7, None, 1)
+    assert foldin.generation(7) == 1
+    assert_factors(foldin.factors(7, {0: 1}), closed_form(scorer, {0: 1}))
+
+
+def test_lru_eviction(scorer):
+    foldin = UserFoldIn(scorer, reg=REG, max_users=2)
+    for user_id in (1, 2, 3):
+        foldin.build(user_id, np.array([user_id]), [1], foldin.generation(user_id))
+    assert len(foldin) == 2
+    assert foldin.factors(1) is None and foldin.factors(3) is not None
@@ -0,0 +1,93 @@
+"""Тесты объединения метрик процессов (recsys/metrics.py) и счётчика ошибок эндпоинтов."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from recsys.metrics import MetricsRegistry, MultiprocessMetrics
+
+
+def make_registry(ready: float):
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("endpoint",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.gauge("ready", "Ready", lambda: ready)
+    return registry, requests, latency
+
+
+def sample(text: str, name: str) -> list:
+    return sorted(line for line in text.splitlines() if line.startswith(name))
+
+
+def test_counters_and_histograms_are_summed_across_processes():
+    other, other_requests, other_latency = make_registry(ready=0)
+    other_requests.inc(endpoint="/a", amount=3)
+    other_latency.observe(0.05)
+    snapshot = dict(other.snapshot(), pid=os.getpid() + 1, alive=False)
+
+    registry, requests, latency = make_registry(ready=1)
+    requests.inc(endpoint="/a")
+    requests.inc(endpoint="/b")
+    latency.observe(0.5)
+
+    text = registry.render([snapshot])
+    assert sample(text, "requests_total{") == ['requests_total{endpoint="/a"} 4', 'requests_total{endpoint="/b"} 1']
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert "latency_seconds_count 2" in text
+    # Gauge завершившегося процесса не выводится, у живого — метка pid.
+    assert sample(text, "ready{") == [f'ready{{pid="{os.getpid()}"}} 1']
+
+
+def test_snapshots_are_shared_through_directory(tmp_path):
+    worker, worker_requests, _ = make_registry(ready=1)
+    worker_requests.inc(endpoint="/a", amount=2)
+    worker_files = MultiprocessMetrics(worker, str(tmp_path), interval=60)
+    worker_files.start()
+    worker_files.write()
+
+    # Второй процесс видит снимок первого, но не свой собственный файл.
+    reader, reader_requests, _ = make_registry(ready=1)
+    reader_requests.inc(endpoint="/a")
+    reader_files = MultiprocessMetrics(reader, str(tmp_path), interval=60)
+    assert len(reader_files.snapshots()) == 1
+    assert 'requests_total{endpoint="/a"} 3' in reader_files.render()
+    assert worker_files.snapshots() == []
+
+
+# --- Ошибки эндпоинтов ----------------------------------------------------------------
+
+def broken(*args, **kwargs):
+    raise RuntimeError("boom")
+
+
+@pytest.mark.parametrize("path,endpoint", [("/api/popular", "popular"), ("/api/new", "new")])
+def test_feed_errors_are_logged_and_counted(app_module, monkeypatch, caplog, path, endpoint):
+    monkeypatch.setattr(app_module, "feed_response", broken)
+    before = app_module.request_errors.value(endpoint=endpoint)
+    response = app_module.app.test_client().get(path)
+    assert response.status_code == 500
+    assert app_module.request_errors.value(endpoint=endpoint) == before + 1
+    record = next(record for record in caplog.records if record.getMessage() == f"Error in api_{endpoint}")
+    assert record.levelname == "ERROR" and record.exc_info[1].args == ("boom",)
+    assert f'recsys_errors_total{{endpoint="{endpoint}"}}' in app_module.metrics.render()
+
+
+def test_smart_recommendations_errors_fall_back_and_are_counted(app_module, client, monkeypatch, caplog):
+    monkeypatch.setattr(app_module, "load_settings_and_likes", broken)
+    before = app_module.request_errors.value(endpoint="smart_recommendations")
+    data = client.get("/api/smart-recommendations").get_json()
+    assert data["algorithm_used"] == "popular" and data["movies"] and "error" in data
+    assert app_module.request_errors.value(endpoint="smart_recommendations") == before + 1
+    assert any(record.getMessage() == "Error in smart recommendations" and record.exc_info
+               for record in caplog.records)
+
+    # Упал и запасной путь: 500, отдельный счётчик.
+    real_get = app_module.resources.get
+    monkeypatch.setattr(app_module.resources, "get",
+                        lambda name: broken() if name == "popular_fragments" else real_get(name))
+    before = app_module.request_errors.value(endpoint="smart_recommendations_fallback")
+    assert client.get("/api/smart-recommendations").status_code == 500
+    assert app_module.request_errors.value(endpoint="smart_recommendations_fallback") == before + 1
+    assert any(record.getMessage() == "Error in smart recommendations fallback" for record in caplog.records)
@@ -0,0 +1,216 @@
+"""Тесты recsys/omdb.py против локальной заглушки OMDb."""
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import pytest
+
+from recsys.omdb import _MISSING, OMDbClient
+
+POSTER = "https://m.media-amazon.com/images/M/{}.jpg"
+
+
+def omdb_answer(posters):
+    """Ответ OMDb по параметру ``i``: постер, ``"N/A"``, неизвестный фильм или HTTP-ошибка (число)."""
+    def respond(request):
+        value = posters.get(request.param("i"))
+        if isinstance(value, int):
+            return value, {}, b""
+        if value is None:
+            body = {"Response": "False", "Error": "Incorrect IMDb ID."}
+        else:
+            body = {"Response": "True", "Poster": value}
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode()
+    return respond
+
+
+@pytest.fixture
+def posters(stub_server):
+    answers = {"tt0000001": POSTER.format(1), "tt0000002": POSTER.format(2), "tt0000003": "N/A"}
+    stub_server.route("/", omdb_answer(answers))
+    return answers
+
+
+@pytest.fixture
+def make_client(stub_server, tmp_path):
+    clients = []
+
+    def make(**options):
+        client = OMDbClient("key", str(tmp_path / "omdb.sqlite"), base_url=f"{stub_server.url}/", **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client._executor.shutdown(wait=True)
+
+
+def upstream_calls(stub_server, imdb_id=None):
+    return [request for request in stub_server.hits("/") if imdb_id is None or request.param("i") == imdb_id]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+# --- LRU и SQLite ---------------------------------------------------------------
+
+def test_lru_miss_then_hit(stub_server, posters, make_client):
+    client = make_client()
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert len(upstream_calls(stub_server)) == 1
+    stats = client.stats()
+    assert (stats["misses"], stats["hits"], stats["entries"]) == (1, 1, 1)
+
+
+def test_lru_eviction_falls_back_to_store(stub_server, posters, make_client):
+    client = make_client(max_entries=1)
+    client.get("tt0000001", wait=True)
+    client.get("tt0000002", wait=True)
+    assert list(client._lru) == ["tt0000002"]
+
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert len(upstream_calls(stub_server)) == 2
+    assert list(client._lru) == ["tt0000001"]
+
+
+def test_store_survives_restart(stub_server, posters, make_client):
+    make_client().get("tt0000001", wait=True)
+    make_client().get("tt0000003", wait=True)
+    assert len(upstream_calls(stub_server)) == 2
+
+    restarted = make_client()
+    assert restarted.get("tt0000001") == POSTER.format(1)
+    assert restarted.get("tt0000003") is None
+    assert restarted.cached("tt0000003") is None
+    assert len(upstream_calls(stub_server)) == 2
+
+
+def test_invalid_ids_and_missing_key_never_hit_network(stub_server, posters, make_client, tmp_path):
+    client = make_client()
+    assert client.get("0000001", wait=True) is None
+    assert client.get(None, wait=True) is None
+    disabled = OMDbClient(None, str(tmp_path / "other.sqlite"), base_url=f"{stub_server.url}/")
+    assert disabled.get("tt0000001", wait=True) is None
+    assert disabled.prefetch(["tt0000001"]) == {}
+    assert upstream_calls(stub_server) == []
+
+
+# --- TTL ----------------------------------------------------------------------------
+
+def test_poster_expires_after_ttl(stub_server, posters, make_client):
+    client = make_client(ttl=0.3, negative_ttl=60)
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert len(upstream_calls(stub_server)) == 1
+
+    time.sleep(0.35)
+    assert client.cached("tt0000001") is _MISSING
+    posters["tt0000001"] = POSTER.format("1-new")
+    assert client.get("tt0000001", wait=True) == POSTER.format("1-new")
+    assert len(upstream_calls(stub_server)) == 2
+
+
+@pytest.mark.parametrize("imdb_id", ["tt0000003", "tt0000404"])
+def test_negative_answer_uses_negative_ttl(stub_server, posters, make_client, imdb_id):
+    client = make_client(ttl=60, negative_ttl=0.3)
+    assert client.get(imdb_id, wait=True) is None
+    assert client.cached(imdb_id) is None
+    assert client.get(imdb_id, wait=True) is None
+    assert len(upstream_calls(stub_server)) == 1
+
+    time.sleep(0.35)
+    assert client.cached(imdb_id) is _MISSING
+    posters[imdb_id] = POSTER.format("late")
+    assert client.get(imdb_id, wait=True) == POSTER.format("late")
+    assert len(upstream_calls(stub_server)) == 2
+
+
+def test_errors_are_not_cached(stub_server, posters, make_client):
+    posters["tt0000001"] = 500
+    client = make_client()
+    assert client.get("tt0000001", wait=True) is None
+    assert client.cached("tt0000001") is _MISSING
+
+    posters["tt0000001"] = POSTER.format(1)
+    assert client.get("tt0000001", wait=True) == POSTER.format(1)
+    assert len(upstream_calls(stub_server)) == 2
+
+
+# --- Фоновое заполнение и prefetch ---------------------------------------------------
+
+def test_miss_returns_immediately_and_fills_in_background(stub_server, posters, make_client):
+    stub_server.delay = 0.3
+    client = make_client()
+
+    started = time.monotonic()
+    assert client.get("tt0000001") is None
+    assert time.monotonic() - started < 0.2
+
+    wait_for(lambda: client.stats()["pending"] == 0 and "tt0000001" in client._lru)
+    assert client.get("tt0000001") == POSTER.format(1)
+    assert len(upstream_calls(stub_server)) == 1
+
+
+def test_prefetch_fills_cache(stub_server, posters, make_client):
+    posters["tt0000004"] = 503
+    client = make_client()
+    client.get("tt0000001", wait=True)
+
+    result = client.prefetch(["tt0000001", "tt0000002", "tt0000003", "tt0000004", "tt0000002", "bad"])
+    assert result == {"tt0000001": POSTER.format(1), "tt0000002": POSTER.format(2), "tt0000003": None}
+    assert sorted(request.param("i") for request in upstream_calls(stub_server)) == \
+        ["tt0000001", "tt0000002", "tt0000003", "tt0000004"]
+
+    # Из prefetch — без сети; ошибка tt0000004 не закэширована.
+    assert client.get("tt0000002") == POSTER.format(2)
+    assert client.cached("tt0000004") is _MISSING
+    assert len(upstream_calls(stub_server)) == 4
+
+
+# --- Один запрос на фильм -----------------------------------------------------------
+
+def test_concurrent_lookups_share_one_upstream_call(stub_server, posters, make_client):
+    stub_server.delay = 0.3
+    client = make_client(workers=4)
+    results = []
+    start = threading.Barrier(9)
+
+    def waiting_lookup():
+        start.wait()
+        results.append(client.get("tt0000001", wait=True))
+
+    def background_lookup():
+        start.wait()
+        client.get("tt0000001")
+
+    def prefetch():
+        start.wait()
+        results.append(client.prefetch(["tt0000001"])["tt0000001"])
+
+    threads = [threading.Thread(target=waiting_lookup) for _ in range(6)]
+    threads += [threading.Thread(target=background_lookup) for _ in range(2)]
+    threads.append(threading.Thread(target=prefetch))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == [POSTER.format(1)] * 7
+    assert len(upstream_calls(stub_server, "tt0000001")) == 1
+    assert client.stats()["pending"] == 0
+
+
+def test_repeated_background_misses_schedule_once(stub_server, posters, make_client):
+    stub_server.delay = 0.2
+    client = make_client()
+    for _ in range(20):
+        assert client.get("tt0000002") is None
+    wait_for(lambda: client.stats()["pending"] == 0)
+    assert len(upstream_calls(stub_server, "tt0000002")) == 1
@@ -0,0 +1,137 @@
+"""Тесты recsys/pipeline.py: длина выдачи, исключения, разнообразие жанров и смешивание источников."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from recsys.pipeline import CandidatePipeline, dedupe_candidates, genre_matrix, normalise, top_candidates
+
+GENRES = [["Drama"]] * 10 + [["Comedy"]] * 10 + [["Action", "Drama"]] * 5 + [[]] * 5
+
+
+def make_pipeline(diversity: float = 0.0, pool_size: int = 50) -> CandidatePipeline:
+    return CandidatePipeline(genre_matrix(GENRES)[0], fallback_rows=np.arange(29, -1, -1),
+                             pool_size=pool_size, diversity=diversity)
+
+
+def fixed(rows, scores):
+    rows, scores = np.asarray(rows, dtype=np.int64), np.asarray(scores, dtype=np.float64)
+    return lambda depth: (rows[:depth], scores[:depth])
+
+
+def test_count_is_guaranteed_by_fallback():
+    pipeline = make_pipeline()
+    selected, timings = pipeline.run({"content": fixed([3, 4], [0.9, 0.5])}, {"content": 1.0}, top_n=8,
+                                     exclude_rows=np.array([29, 28]))
+    assert selected.tolist() == [3, 4, 27, 26, 25, 24, 23, 22]
+    assert set(timings) == {"candidates_content", "rerank"}
+
+    # Без генераторов (новый пользователь) список целиком из популярного.
+    selected, _ = pipeline.run({}, {}, top_n=5)
+    assert selected.tolist() == [29, 28, 27, 26, 25]
+
+
+def test_rated_items_are_excluded():
+    pipeline = make_pipeline()
+    rows = np.arange(20)
+    selected, _ = pipeline.run({"collaborative": fixed(rows, 20.0 - rows)}, {"collaborative": 1.0}, top_n=10,
+                               exclude_rows=np.array([0, 2, 4, 29]))
+    assert selected.tolist() == [1, 3, 5, 6, 7, 8, 9, 10, 11, 12]
+
+    # Исключённые строки не возвращаются и при доборе популярным.
+    selected, _ = pipeline.run({"collaborative": fixed([1], [1.0])}, {"collaborative": 1.0}, top_n=4,
+                               exclude_rows=np.array([29, 28, 1]))
+    assert selected.tolist() == [27, 26, 25, 24]
+
+
+def test_generator_depth_covers_exclusions():
+    depths = []
+
+    def generator(depth):
+        depths.append(depth)
+        return np.arange(depth) % 30, np.linspace(1, 0, depth)
+
+    make_pipeline(pool_size=7).run({"content": generator}, {"content": 1.0}, top_n=3, exclude_rows=np.array([1, 1, 2]))
+    assert depths == [9]
+
+
+def test_zero_weight_generators_are_skipped():
+    calls = []
+
+    def generator(depth):
+        calls.append(depth)
+        return np.array([5]), np.array([1.0])
+
+    selected, timings = make_pipeline().run({"content": generator, "new": generator}, {"content": 0.0}, top_n=1)
+    assert calls == [] and "candidates_content" not in timings
+    assert selected.tolist() == [29]
+
+
+def test_genre_diversity_limits_repeated_genres():
+    # Десять драм с высокими оценками и десять комедий чуть ниже.
+    rows = np.arange(20)
+    scores = np.r_[np.linspace(1.0, 0.9, 10), np.linspace(0.85, 0.75, 10)]
+    generators, weights = {"content": fixed(rows, scores)}, {"content": 1.0}
+
+    plain, _ = make_pipeline(diversity=0.0).run(generators, weights, top_n=6)
+    assert plain.tolist() == [0, 1, 2, 3, 4, 5]
+
+    # После нормировки драмы в [0.6, 1], комедии в [0, 0.4]: штраф за повтор жанра поднимает комедии.
+    diverse, _ = make_pipeline(diversity=1.0).run(generators, weights, top_n=6)
+    assert diverse.tolist() == [0, 10, 1, 2, 3, 11]
+    strong, _ = make_pipeline(diversity=3.0).run(generators, weights, top_n=6)
+    assert strong.tolist() == [0, 10, 1, 11, 2, 12]
+
+
+def test_duplicate_rows_from_one_generator_are_not_double_counted():
+    # Строка 7 пришла из генератора дважды (две позиции модели — один фильм каталога).
+    duplicated = fixed([7, 7, 8, 9], [0.6, 0.6, 0.8, 0.0])
+    selected, _ = make_pipeline().run({"collaborative": duplicated}, {"collaborative": 1.0}, top_n=3)
+    assert selected.tolist() == [8, 7, 9]
+
+    # Тот же фильм из двух разных генераторов по-прежнему суммируется.
+    selected, _ = make_pipeline().run({"collaborative": fixed([7, 8], [1.0, 0.0]),
+                                       "content": fixed([8, 7], [1.0, 0.9])},
+                                      {"collaborative": 0.5, "content": 0.5}, top_n=2)
+    assert selected.tolist() == [7, 8]
+
+
+def test_dedupe_keeps_best_score():
+    rows, scores = dedupe_candidates(np.array([4, 2, 4, 3, 2]), np.array([0.1, 0.5, 0.9, 0.3, 0.2]))
+    assert rows.tolist() == [2, 3, 4]
+    assert scores.tolist() == [0.5, 0.3, 0.9]
+
+    unique = np.array([5, 1, 3])
+    assert dedupe_candidates(unique, np.array([0.1, 0.2, 0.3]))[0] is unique
+
+
+def test_top_candidates_and_normalise():
+    scores = np.array([0.5, -np.inf, 0.9, 0.7, 0.8])
+    rows, top_scores = top_candidates(scores, np.array([10, 11, -1, 13, 14]), depth=4)
+    assert rows.tolist() == [14, 13, 10]
+    assert top_scores.tolist() == [0.8, 0.7, 0.5]
+
+    assert normalise(np.array([2.0, -np.inf, 4.0])).tolist() == [0.0, -np.inf, 1.0]
+    assert normalise(np.array([3.0, 3.0])).tolist() == [1.0, 1.0]
+    assert normalise(np.array([-np.inf])).tolist() == [-np.inf]
+
+
+def test_genre_matrix_parses_lists_and_strings():
+    matrix, names = genre_matrix([["Drama", "Comedy"], "Comedy, Horror", None, np.array(["Drama"])])
+    assert names == ["Drama", "Comedy", "Horror"]
+    assert matrix.tolist() == [[True, True, False], [False, True, True], [False, False, False],
+                               [True, False, False]]
+
+
+@pytest.mark.parametrize("algorithm", ["hybrid", "content", "collaborative", "popular"])
+def test_smart_recommendations_exclude_likes_and_fill_list(app_module, client, algorithm):
+    tmdb_ids = app_module.resources.get("movies")["tmdb_id"].dropna().astype(int).tolist()
+    liked = tmdb_ids[:5]
+    response = client.post("/api/likes/batch", json={"likes": [{"tmdb_id": t, "value": 1} for t in liked]})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert client.post("/api/user-settings", json={"recommendation_algorithm": algorithm}).status_code == 200
+
+    data = client.get("/api/smart-recommendations").get_json()
+    recommended = [movie["tmdb_id"] for movie in data["movies"]]
+    assert len(recommended) == app_module.SMART_RECS_COUNT == len(set(recommended))
+    assert not set(recommended) & set(liked)
@@ -0,0 +1,78 @@
+"""Тесты recsys/ratings.py: CSR совпадает с группировкой pandas."""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recsys.artifacts import ArtifactBundle, ArtifactWriter
+from recsys.ratings import RatingsCSR
+
+
+@pytest.fixture
+def ratings() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({
+        "userId": rng.integers(1, 40, n),
+        "movieId_ml": rng.choice(np.arange(1, 1000, 7), n),
+        "rating": rng.integers(1, 11, n) / 2,
+    })
+
+
+def assert_matches_groupby(csr: RatingsCSR, ratings: pd.DataFrame) -> None:
+    assert np.array_equal(csr.rated_items, ratings.groupby("movieId_ml").size().index.to_numpy())
+    assert csr.rated_items.dtype.kind == "i"
+    assert np.array_equal(csr.user_ids, ratings.groupby("userId").size().index.to_numpy())
+    for user_id, group in ratings.groupby("userId"):
+        items, values = csr.user_history(user_id)
+        assert items.tolist() == group["movieId_ml"].tolist()
+        assert values.tolist() == group["rating"].tolist()
+
+
+def test_from_frame_matches_groupby(ratings):
+    with_gaps = pd.concat([ratings, pd.DataFrame({"userId": [np.nan], "movieId_ml": [5.0], "rating": [3.0]})])
+    assert_matches_groupby(RatingsCSR.from_frame(with_gaps), ratings)
+
+
+def test_from_csv_matches_groupby(ratings, tmp_path):
+    path = tmp_path / "ratings.csv"
+    ratings.rename(columns={"movieId_ml": "movieId"}).assign(timestamp=0).to_csv(path, index=False)
+    csr = RatingsCSR.from_csv(str(path), chunksize=37)
+    assert_matches_groupby(csr, ratings)
+
+    allowed = ratings["movieId_ml"].unique()[:10]
+    filtered = RatingsCSR.from_csv(str(path), chunksize=37, item_filter=allowed)
+    assert_matches_groupby(filtered, ratings[ratings["movieId_ml"].isin(allowed)])
+
+
+@pytest.mark.parametrize("with_rated_items", [True, False])
+def test_bundle_round_trip(ratings, tmp_path, with_rated_items):
+    csr = RatingsCSR.from_frame(ratings)
+    writer = ArtifactWriter(str(tmp_path))
+    csr.save_to(writer)
+    if not with_rated_items:
+        del writer.files["ratings_rated_items"]
+    writer.finish()
+
+    loaded = RatingsCSR.from_bundle(ArtifactBundle.open(str(tmp_path)))
+    assert (loaded._rated_items is not None) == with_rated_items
+    assert_matches_groupby(loaded, ratings)
+
+
+def test_bundle_without_csr_is_rejected(ratings, tmp_path):
+    writer = ArtifactWriter(str(tmp_path))
+    writer.add_array("ratings_userId", ratings["userId"].to_numpy())
+    writer.finish()
+    with pytest.raises(KeyError):
+        RatingsCSR.from_bundle(ArtifactBundle.open(str(tmp_path)))
+
+
+def test_filter_items_and_to_frame(ratings):
+    csr = RatingsCSR.from_frame(ratings)
+    allowed = ratings["movieId_ml"].unique()[::3]
+    expected = ratings[ratings["movieId_ml"].isin(allowed)]
+    assert_matches_groupby(csr.filter_items(allowed), expected)
+    frame = csr.to_frame()
+    assert frame.sort_values(["userId", "movieId_ml", "rating"]).to_numpy().tolist() == \
+        ratings.sort_values(["userId", "movieId_ml", "rating"]).to_numpy().tolist()
@@ -0,0 +1,187 @@
+"""Тесты горячей замены артефактов: аренды версий, ResourceSwitcher и /admin/bundle."""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from recsys.artifacts import (CURRENT_NAME, LEASES_DIR, MANIFEST_NAME, VERSIONS_DIR, ArtifactBundle,
+                              ArtifactWriter, active_version, leased)
+from recsys.resources import ResourceRegistry, ResourceSwitcher
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def publish(root: Path, version: str, value: float, keep: int = 1) -> None:
+    writer = ArtifactWriter(str(root), version=version, keep=keep)
+    writer.add_array("scores", np.full(4, value))
+    writer.finish()
+
+
+def bundle_factory(root: Path):
+    """Фабрика реестров, как ``build_resource_registry`` в app.py."""
+    def factory() -> ResourceRegistry:
+        bundle = ArtifactBundle.open(str(root))
+        registry = ResourceRegistry(version=bundle.version, on_release=bundle.release_lease,
+                                    on_use=bundle.acquire_lease)
+        registry.register("scores", lambda: bundle.array("scores"))
+        return registry
+    return factory
+
+
+def version_dir(root: Path, version: str) -> Path:
+    return root / VERSIONS_DIR / version
+
+
+# --- Аренды и удаление старых версий --------------------------------------------------
+
+def test_prune_keeps_leased_versions(tmp_path):
+    publish(tmp_path, "v1", 1.0)
+    bundle = ArtifactBundle.open(str(tmp_path))
+    bundle.acquire_lease()
+    bundle.acquire_lease()
+    assert len(os.listdir(version_dir(tmp_path, "v1") / LEASES_DIR)) == 1
+
+    publish(tmp_path, "v2", 2.0)
+    assert (version_dir(tmp_path, "v1") / MANIFEST_NAME).exists()
+    bundle.release_lease()
+    assert not leased(str(version_dir(tmp_path, "v1")))
+    publish(tmp_path, "v3", 3.0)
+    assert sorted(os.listdir(tmp_path / VERSIONS_DIR)) == ["v3"]
+
+
+def test_lease_of_dead_process_is_ignored(tmp_path):
+    publish(tmp_path, "v1", 1.0)
+    leases = version_dir(tmp_path, "v1") / LEASES_DIR
+    leases.mkdir()
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                          capture_output=True, text=True, check=True)
+    (leases / "dead").write_text(json.dumps({"host": socket.gethostname(), "pid": int(dead.stdout)}))
+    (leases / "broken").write_text("{")
+
+    assert not leased(str(version_dir(tmp_path, "v1")))
+    assert os.listdir(leases) == []
+    publish(tmp_path, "v2", 2.0)
+    assert not version_dir(tmp_path, "v1").exists()
+
+
+def test_registry_takes_lease_only_when_used(tmp_path):
+    publish(tmp_path, "v1", 1.0)
+    registry = bundle_factory(tmp_path)()
+    registry.get("scores")
+    assert not (version_dir(tmp_path, "v1") / LEASES_DIR).exists()
+    registry.mark_used()
+    assert leased(str(version_dir(tmp_path, "v1")))
+    registry.release()
+    assert not leased(str(version_dir(tmp_path, "v1")))
+    # Закрытый реестр аренду снова не берёт.
+    registry.mark_used()
+    assert not leased(str(version_dir(tmp_path, "v1")))
+
+
+# --- Замена версии во время запроса ---------------------------------------------------
+
+def test_swap_keeps_old_files_until_request_finishes(tmp_path):
+    publish(tmp_path, "v1", 1.0)
+    switcher = ResourceSwitcher(bundle_factory(tmp_path), ["scores"])
+    token = switcher.acquire()
+    old = switcher.current
+    assert switcher.get("scores")[0] == 1.0
+
+    publish(tmp_path, "v2", 2.0)
+    assert switcher.reload(wait=True)
+    # Запрос по-прежнему видит v1, новые запросы — v2.
+    assert switcher.get("scores")[0] == 1.0
+    assert switcher.versions()["draining"] == [{"version": "v1", "in_flight": 1}]
+    other = switcher.acquire()
+    assert switcher.version == "v2"
+    switcher.release(other)
+
+    # Следующая выгрузка не удаляет v1: у неё аренда незавершённого запроса.
+    publish(tmp_path, "v3", 3.0)
+    assert (version_dir(tmp_path, "v1") / "scores.npy").exists()
+    assert not old.closed
+
+    switcher.release(token)
+    assert old.closed and switcher.versions()["draining"] == []
+    with pytest.raises(RuntimeError):
+        old.get("scores")
+    publish(tmp_path, "v4", 4.0)
+    assert not version_dir(tmp_path, "v1").exists()
+
+
+def test_failed_reload_keeps_active_version(tmp_path):
+    publish(tmp_path, "v1", 1.0)
+    factory = bundle_factory(tmp_path)
+    calls = []
+
+    def flaky():
+        registry = factory()
+        if calls:
+            registry.register("broken", lambda: 1 / 0)
+        calls.append(registry)
+        return registry
+
+    switcher = ResourceSwitcher(flaky, ["scores", "broken"])
+    publish(tmp_path, "v2", 2.0, keep=2)
+    switcher.reload(wait=True)
+    assert switcher.version == "v1"
+    assert switcher.last_reload["version"] == "v2" and "ZeroDivisionError" in switcher.last_reload["error"]
+    # Реестр неудачной версии закрыт и аренду не держит.
+    assert calls[1].closed and not leased(str(version_dir(tmp_path, "v2")))
+
+
+# --- Приложение -----------------------------------------------------------------------
+
+def test_importing_app_writes_no_leases(app_data_dir, tmp_path):
+    data_dir = tmp_path / "data"
+    shutil.copytree(app_data_dir, data_dir, ignore=shutil.ignore_patterns(LEASES_DIR))
+    code = ("import sys; from pathlib import Path; from benchmark import import_app; "
+            "import_app(Path(sys.argv[1]), Path(sys.argv[2]), recs_cache=True)")
+    subprocess.run([sys.executable, "-c", code, str(data_dir), str(tmp_path / "work")], check=True,
+                   cwd=ROOT, env={**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT), str(ROOT / "scripts")])},
+                   capture_output=True)
+    assert not list(data_dir.rglob(LEASES_DIR))
+
+
+def test_admin_bundle_reload(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    assert client.get("/admin/bundle").status_code == 403
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    assert client.get("/admin/bundle", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    root = Path(app_module.ARTIFACTS_DIR)
+    old_version = active_version(str(root))
+    status = client.get("/admin/bundle", headers=headers).get_json()
+    assert status["on_disk"] == status["active"]["version"] == old_version
+
+    # Новая версия с теми же данными: остальные тесты сессии видят прежний каталог.
+    new_version = f"{old_version}-reloaded"
+    shutil.copytree(version_dir(root, old_version), version_dir(root, new_version),
+                    ignore=shutil.ignore_patterns(LEASES_DIR))
+    manifest_path = version_dir(root, new_version) / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] = new_version
+    manifest_path.write_text(json.dumps(manifest))
+    (root / CURRENT_NAME).write_text(new_version)
+
+    response = client.post("/admin/bundle", headers=headers)
+    assert response.status_code == 202 and response.get_json()["status"] in ("reloading", "busy")
+    deadline = time.monotonic() + 30
+    while client.get("/admin/bundle", headers=headers).get_json()["active"]["version"] != new_version:
+        assert time.monotonic() < deadline, app_module.resources.versions()
+        time.sleep(0.05)
+    status = client.get("/admin/bundle", headers=headers).get_json()
+    assert status["last_reload"]["previous_version"] == old_version and status["last_reload"]["error"] is None
+    assert client.get("/api/popular").status_code == 200
+    # Прежняя версия освобождена: её аренды больше нет.
+    assert not leased(str(version_dir(root, old_version)))
@@ -0,0 +1,93 @@
+"""Тесты serve.py: подготовка мастера к fork и перезапуск упавших процессов."""
+from __future__ import annotations
+
+import gc
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+import serve
+
+ROOT = Path(__file__).resolve().parents[1]
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork требует fork")
+
+
+def test_prepare_for_fork_closes_pools_and_freezes_gc(app_module, client):
+    assert client.get("/api/user-likes").status_code == 200
+    with app_module.app.app_context():
+        engine = app_module.db.engine
+    assert engine.pool.checkedin() > 0
+    try:
+        serve.prepare_for_fork(app_module)
+        assert engine.pool.checkedin() == 0
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    # После dispose пул открывает новые соединения.
+    assert client.get("/api/user-likes").status_code == 200
+
+
+def children(pid: int) -> set:
+    """Дочерние процессы ``pid`` по ``/proc/<pid>/stat``."""
+    found = set()
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Поле 4 (ppid) идёт после имени процесса в скобках.
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.add(int(entry))
+    return found
+
+
+def wait_for(predicate, timeout: float = 30.0, message: str = ""):
+    deadline = time.monotonic() + timeout
+    while True:
+        value = predicate()
+        if value:
+            return value
+        assert time.monotonic() < deadline, message
+        time.sleep(0.1)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="нужен /proc")
+def test_failed_worker_is_restarted(app_data_dir, tmp_path):
+    env = {**os.environ, "RECSYS_DATA_DIR": str(app_data_dir), "DATABASE_URL": f"sqlite:///{tmp_path / 'serve.db'}",
+           "ARTIFACTS_WATCH_INTERVAL": "0", "PYTHONUNBUFFERED": "1"}
+    log_path = tmp_path / "serve.log"
+    with open(log_path, "w") as log:
+        master = subprocess.Popen([sys.executable, str(ROOT / "serve.py"), "--host", "127.0.0.1", "--port", "0",
+                                   "--workers", "2", "--metrics-dir", str(tmp_path / "metrics")],
+                                  cwd=tmp_path, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        started = wait_for(lambda: re.search(r"http://127\.0\.0\.1:(\d+)", log_path.read_text()), 60,
+                           "сервер не запустился")
+        url = f"http://127.0.0.1:{started.group(1)}/healthz"
+        workers = wait_for(lambda: len(children(master.pid)) == 2 and children(master.pid))
+
+        victim = min(workers)
+        os.kill(victim, signal.SIGKILL)
+        replaced = wait_for(lambda: len(children(master.pid) - {victim}) == 2 and children(master.pid),
+                            message="упавший процесс не перезапущен")
+        assert victim not in replaced and len(replaced & workers) == 1
+        assert f"Процесс {victim} завершился" in log_path.read_text()
+        for _ in range(4):
+            with urllib.request.urlopen(url, timeout=10) as response:
+                assert response.status == 200
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+    assert "Все процессы остановлены" in log_path.read_text()
+    assert not children(master.pid)